@@ -1,46 +1,51 @@
-import fitz  # PyMuPDF
-import pytesseract
-from PIL import Image
-import io
+import os
+import sys
 import json
 import re
 import argparse # New import for command-line arguments
 
-def parse_pdf_with_ocr(input_path, output_path):
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ocr_engine import OCREngine
+
+# Path to the Tesseract executable
+TESSERACT_CMD = r'C:\Tesseract-OCR\tesseract.exe' # Or your custom path
+
+def build_ocr_engine(workers=None):
+    """Text-layer-first extraction with 300 DPI English OCR fallback, sharded across `workers` processes."""
+    return OCREngine(workers=workers, dpi=300, lang='eng',
+                     tesseract_cmd=TESSERACT_CMD if os.path.exists(TESSERACT_CMD) else None)
+
+def parse_pdf_with_ocr(input_path, output_path, ocr_engine=None):
     """
-    Parses a PDF using OCR, extracts text and point numbers, and saves to JSON.
+    Parses a PDF (embedded text layer first, OCR for scanned pages), extracts text and
+    point numbers, and saves to JSON.
     """
     print(f"--- Starting OCR parsing for '{input_path}' ---")
     all_pages_data = []
     
+    engine = ocr_engine or build_ocr_engine()
+
     try:
-        pdf_document = fitz.open(input_path)
+        page_count = engine.page_count(input_path)
+        for page in engine.iter_pages(input_path):
+            text = page["content"]
+
+            pattern = r'\((\d+|[a-z]+)\)|(section \d+)'
+            found_items = re.findall(pattern, text)
+            point_numbers = [item[0] or item[1] for item in found_items]
+            
+            page_data = {
+                "page_number": page["page"],
+                "point_numbers": point_numbers,
+                "content": text,
+                "extraction_method": page["extraction_method"]
+            }
+            all_pages_data.append(page_data)
+            print(f"  Processed page {page['page']}/{page_count}")
     except Exception as e:
         print(f"!!! ERROR: Could not open or read the PDF file at '{input_path}'. Error: {e}")
         return
 
-    # Set the path to the Tesseract executable
-    pytesseract.pytesseract.tesseract_cmd = r'C:\Tesseract-OCR\tesseract.exe' # Or your custom path
-
-    for page_num in range(len(pdf_document)):
-        page = pdf_document[page_num]
-        
-        pix = page.get_pixmap(dpi=300)
-        image = Image.open(io.BytesIO(pix.tobytes("png")))
-        text = pytesseract.image_to_string(image, lang='eng')
-        
-        pattern = r'\((\d+|[a-z]+)\)|(section \d+)'
-        found_items = re.findall(pattern, text)
-        point_numbers = [item[0] or item[1] for item in found_items]
-        
-        page_data = {
-            "page_number": page_num + 1,
-            "point_numbers": point_numbers,
-            "content": text
-        }
-        all_pages_data.append(page_data)
-        print(f"  Processed page {page_num + 1}/{len(pdf_document)}")
-
     with open(output_path, "w", encoding='utf-8') as f:
         json.dump(all_pages_data, f, indent=4)
     
@@ -52,9 +57,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Parse a PDF document using OCR.")
     parser.add_argument("--input", required=True, help="Path to the input PDF file.")
     parser.add_argument("--output", required=True, help="Path to the output JSON file.")
+    parser.add_argument("--workers", type=int, default=None, help="OCR worker processes (default: OCR_WORKERS or CPU count).")
     
     args = parser.parse_args()
     
-    parse_pdf_with_ocr(args.input, args.output)
+    parse_pdf_with_ocr(args.input, args.output, ocr_engine=build_ocr_engine(args.workers))
 
 
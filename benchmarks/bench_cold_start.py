@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Cold-start cost of the two ways a replica can open the rule DB:
+#   copy      entrypoint.sh's old path: cp -R rules_chroma_db /tmp, PersistentClient, first query
+#   snapshot  ReadOnlyRuleDB over the image's rules_snapshot (mmap, nothing copied), first query
+#   python benchmarks/bench_cold_start.py --source rules_chroma_db --snapshot rules_snapshot
+# Each run is a fresh interpreter, so index loading and the first query start cold.
+# Drop the page cache between runs (echo 3 > /proc/sys/vm/drop_caches) for disk-cold numbers.
+
+
+def run_once(mode, source, snapshot, city):
+    # Imports are the same for both modes, so they are kept out of the timings
+    from chroma_client import ChromaDBClient
+    from readonly_rule_db import ReadOnlyRuleDB
+
+    started = time.perf_counter()
+    if mode == "copy":
+        target = os.path.join(tempfile.mkdtemp(prefix="rules_chroma_db_"), "rules_chroma_db")
+        shutil.copytree(source, target)
+        copied = time.perf_counter()
+        db = ChromaDBClient(persist_directory=target)
+    else:
+        copied = time.perf_counter()
+        db = ReadOnlyRuleDB(snapshot)
+    opened = time.perf_counter()
+    db._query_rules_uncached(city, {"road_width_m": 12, "plot_area_sqm": 1000}, 10)
+    finished = time.perf_counter()
+    if mode == "copy":
+        shutil.rmtree(os.path.dirname(target), ignore_errors=True)
+    return {
+        "copy_s": round(copied - started, 3),
+        "open_s": round(opened - copied, 3),
+        "first_query_s": round(finished - opened, 3),
+        "total_s": round(finished - started, 3),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def measure(mode, source, snapshot, city, runs):
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", mode, "--source", source, "--snapshot", snapshot, "--city", city],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    # Median run per field
+    return {key: sorted(run[key] for run in results)[len(results) // 2] for key in results[0]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare replica cold start: copy-to-/tmp vs read-only snapshot.")
+    parser.add_argument("--source", default=os.getenv("CHROMADB_PERSIST_DIRECTORY", "rules_chroma_db"),
+                        help="ChromaDB persist directory shipped in the image.")
+    parser.add_argument("--snapshot", default="rules_snapshot", help="Snapshot directory (exported if missing).")
+    parser.add_argument("--city", default="Mumbai", help="City used for the first query.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per mode.")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_once(args.child, args.source, args.snapshot, args.city)))
+        sys.exit(0)
+
+    if not os.path.exists(args.snapshot):
+        from readonly_rule_db import export_snapshot
+        export_snapshot(args.source, args.snapshot)
+
+    copy = measure("copy", args.source, args.snapshot, args.city, args.runs)
+    snapshot = measure("snapshot", args.source, args.snapshot, args.city, args.runs)
+    print(json.dumps({
+        "copy": copy,
+        "snapshot": snapshot,
+        "startup_speedup": round(copy["total_s"] / snapshot["total_s"], 2) if snapshot["total_s"] else None
+    }, indent=2))
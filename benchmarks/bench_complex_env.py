@@ -0,0 +1,43 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'rl_env')))
+
+from vec_envs import make_complex_vec_env
+
+# Raw environment throughput (no policy, no PPO updates) of the ComplexEnv vectorizations:
+#   python benchmarks/bench_complex_env.py --configs 1:dummy 16:dummy 4:subproc 256:batch
+# Run from the repo root so ComplexEnv finds rl_env/oracle_data.json.
+
+
+def env_steps_per_second(n_envs, kind, seconds):
+    env = make_complex_vec_env(n_envs, kind, seed=0)
+    env.reset()
+    rng = np.random.default_rng(0)
+    steps = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        env.step(rng.integers(0, env.action_space.n, size=n_envs))
+        steps += n_envs
+    elapsed = time.perf_counter() - started
+    env.close()
+    return steps / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure ComplexEnv steps/sec per vectorization.")
+    parser.add_argument("--configs", nargs="+", default=["1:dummy", "16:dummy", "4:subproc", "256:batch"],
+                        help="n_envs:kind pairs (kind: dummy, subproc, batch).")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Measurement time per config.")
+    args = parser.parse_args()
+
+    results = {}
+    for config in args.configs:
+        n_envs, kind = config.split(":")
+        results[config] = round(env_steps_per_second(int(n_envs), kind, args.seconds))
+    print(json.dumps({"env_steps_per_sec": results}, indent=2))
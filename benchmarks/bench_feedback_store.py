@@ -0,0 +1,60 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rl_env.feedback_store import FeedbackSampleStore, feedback_sample
+
+# Cost of getting ComplexEnv's human-feedback samples: re-parsing the whole feedback.jsonl
+# (what every ComplexEnv construction used to do) against the memory-mapped sample store.
+#   python benchmarks/bench_feedback_store.py --feedback io/feedback.jsonl
+# The store is built in a temporary directory, so the repo's own store is left alone.
+
+
+def parse_jsonl_seconds(path):
+    started = time.perf_counter()
+    samples = []
+    with open(path) as f:
+        for line in f:
+            try:
+                sample = feedback_sample(json.loads(line))
+            except ValueError:
+                continue
+            if sample is not None:
+                samples.append(sample)
+    return time.perf_counter() - started, len(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare full feedback.jsonl parsing with the feedback sample store.")
+    parser.add_argument("--feedback", default="io/feedback.jsonl", help="Feedback log to ingest.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        parse_s, parsed_rows = parse_jsonl_seconds(args.feedback)
+
+        started = time.perf_counter()
+        FeedbackSampleStore(directory, args.feedback).sync()
+        backfill_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        store = FeedbackSampleStore(directory, args.feedback)
+        new_rows = store.sync()
+        samples = store.samples()
+        samples["state"].sum()  # touch every row
+        warm_s = time.perf_counter() - started
+
+        print(json.dumps({
+            "feedback_bytes": os.path.getsize(args.feedback),
+            "rows": store.rows,
+            "parsed_rows": parsed_rows,
+            "store_bytes": os.path.getsize(store.samples_path),
+            "full_parse_s": round(parse_s, 4),
+            "store_backfill_s": round(backfill_s, 4),
+            "store_warm_load_s": round(warm_s, 5),
+            "rows_reparsed_when_warm": new_rows
+        }, indent=2))
@@ -0,0 +1,57 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ocr_engine import OCREngine
+
+# OCR throughput vs. worker count on a slice of one of the PDFs in io/.
+# Expect close to linear scaling until the worker count reaches the number of physical cores.
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark OCREngine speedup with worker count.")
+    parser.add_argument("--pdf", default="io/Pune_DCPR_2018.pdf", help="PDF to OCR.")
+    parser.add_argument("--pages", type=int, default=32, help="Only OCR the first N pages (0 = all).")
+    parser.add_argument("--workers", default=None, help="Comma-separated worker counts (default: 1,2,4,...,CPU count).")
+    parser.add_argument("--dpi", type=float, default=None, help="Render resolution (default: OCR_DPI or 144).")
+    args = parser.parse_args()
+
+    cpu_count = os.cpu_count() or 1
+    if args.workers:
+        worker_counts = [int(w) for w in args.workers.split(",")]
+    else:
+        worker_counts = sorted({1, cpu_count} | {2 ** k for k in range(1, cpu_count.bit_length()) if 2 ** k <= cpu_count})
+
+    pdf_path = args.pdf
+    if args.pages:
+        import fitz  # PyMuPDF
+        with fitz.open(args.pdf) as source:
+            if len(source) > args.pages:
+                # Benchmark on a prefix copy so every run OCRs exactly the same pages
+                pdf_path = os.path.join("reports", f"bench_ocr_{args.pages}p.pdf")
+                os.makedirs("reports", exist_ok=True)
+                with fitz.open() as subset:
+                    subset.insert_pdf(source, from_page=0, to_page=args.pages - 1)
+                    subset.save(pdf_path)
+
+    results = []
+    baseline = None
+    for workers in worker_counts:
+        # text_layer_first=False: measure OCR itself, even on digitally born PDFs
+        engine = OCREngine(workers=workers, dpi=args.dpi, text_layer_first=False)
+        start = time.perf_counter()
+        pages = engine.ocr_pdf(pdf_path)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        results.append({
+            "workers": workers,
+            "pages": len(pages),
+            "seconds": round(elapsed, 2),
+            "pages_per_second": round(len(pages) / elapsed, 2),
+            "speedup": round(baseline / elapsed, 2)
+        })
+        print(json.dumps(results[-1]))
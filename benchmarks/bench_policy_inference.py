@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main_pipeline import predict_rl_actions
+
+# Startup and per-call latency of the PPO policy: SB3 (torch) against the NumPy actor.
+#   python benchmarks/bench_policy_inference.py --checkpoint rl_env/ppo_hirl_agent.zip
+# The SB3 side is skipped when stable_baselines3/torch are not installed (as in serving images).
+
+STARTUP_SNIPPETS = {
+    "numpy": "from rl_env.numpy_policy import NumpyPolicy; NumpyPolicy.load({checkpoint!r})",
+    "sb3": "from stable_baselines3 import PPO; PPO.load({checkpoint!r})",
+}
+
+
+def startup_seconds(backend, checkpoint, runs):
+    """Median wall time of a fresh interpreter importing the backend and loading the checkpoint."""
+    code = f"import time; t = time.perf_counter(); {STARTUP_SNIPPETS[backend].format(checkpoint=checkpoint)}; print(time.perf_counter() - t)"
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return sorted(timings)[len(timings) // 2]
+
+
+def call_latency_ms(agent, observations, iterations):
+    predict_rl_actions(observations, agent)  # warm-up
+    started = time.perf_counter()
+    for _ in range(iterations):
+        predict_rl_actions(observations, agent)
+    return (time.perf_counter() - started) / iterations * 1e3
+
+
+def measure(backend, agent, checkpoint, runs, iterations, batch):
+    single = np.array([1000.0, 0.0, 12.0], dtype=np.float32)
+    rng = np.random.default_rng(0)
+    observations = np.stack([
+        rng.uniform(50, 20000, batch), rng.integers(0, 3, batch), rng.uniform(3, 60, batch)
+    ], axis=1).astype(np.float32)
+    return {
+        "startup_s": round(startup_seconds(backend, checkpoint, runs), 3),
+        "single_call_ms": round(call_latency_ms(agent, single, iterations), 4),
+        f"batch_{batch}_call_ms": round(call_latency_ms(agent, observations, iterations), 4)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare SB3 and NumPy PPO policy startup and inference latency.")
+    parser.add_argument("--checkpoint", default="rl_env/ppo_hirl_agent.zip", help="SB3 PPO checkpoint zip.")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per startup measurement.")
+    parser.add_argument("--iterations", type=int, default=2000, help="Calls per latency measurement.")
+    parser.add_argument("--batch", type=int, default=256, help="Observations per batched call.")
+    args = parser.parse_args()
+
+    from rl_env.numpy_policy import NumpyPolicy, check_parity
+    results = {"numpy": measure("numpy", NumpyPolicy.load(args.checkpoint), args.checkpoint,
+                                args.runs, args.iterations, args.batch)}
+    try:
+        from stable_baselines3 import PPO
+    except ImportError:
+        print("stable_baselines3 not installed; reporting the NumPy policy only.")
+    else:
+        results["sb3"] = measure("sb3", PPO.load(args.checkpoint), args.checkpoint, args.runs, args.iterations, args.batch)
+        results["parity"] = check_parity(args.checkpoint)
+    print(json.dumps(results, indent=2))
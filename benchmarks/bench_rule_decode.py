@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chroma_client import ChromaDBClient
+from rule_store import decode_rule
+
+# Microbenchmark: per-query cost of turning retrieved hits into rule objects.
+#   before: json.loads(full_json) for every hit of every query + O(n^2) any() de-duplication
+#   after:  RuleStore lookups by id (parsed once at startup) + O(1) id-set de-duplication
+
+
+def legacy_decode(metadatas, documents):
+    """The per-query decode loop ChromaDBClient ran before the rule store existed."""
+    found_rules = []
+    for meta, doc in zip(metadatas, documents):
+        rule_obj = decode_rule(meta, doc)
+        if rule_obj and not any(existing.get("id") == rule_obj.get("id") for existing in found_rules):
+            found_rules.append(rule_obj)
+    return found_rules
+
+
+def time_per_call(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-query rule decoding before/after the RuleStore.")
+    parser.add_argument("--city", default="Mumbai", help="City whose rules are decoded.")
+    parser.add_argument("--n-results", type=int, default=10, help="Hits per simulated query.")
+    parser.add_argument("--iterations", type=int, default=2000, help="Simulated queries per measurement.")
+    args = parser.parse_args()
+
+    db = ChromaDBClient()
+    records = db.collection.get(where={"city": args.city}, include=["metadatas", "documents"])
+    if not records["ids"]:
+        print(f"No rules for {args.city} in '{db.persist_directory}'. Run the ingestion pipeline first.")
+        sys.exit(1)
+
+    # Every query window of n_results consecutive hits, as the structured + semantic passes return them
+    ids, metadatas, documents = records["ids"], records["metadatas"], records["documents"]
+    n = min(args.n_results, len(ids))
+    windows = [(ids[i:i + n], metadatas[i:i + n], documents[i:i + n]) for i in range(0, len(ids) - n + 1, n)]
+    full_json_bytes = sum(len(m.get("full_json", "")) for m in metadatas)
+
+    def before():
+        for _, window_metas, window_docs in windows:
+            legacy_decode(window_metas, window_docs)
+
+    def after():
+        for window_ids, _, _ in windows:
+            db.rules.materialize(window_ids, set())
+
+    before_s = time_per_call(before, args.iterations) / len(windows)
+    after_s = time_per_call(after, args.iterations) / len(windows)
+
+    print(json.dumps({
+        "city": args.city,
+        "rules": len(ids),
+        "avg_full_json_bytes": round(full_json_bytes / len(ids)),
+        "hits_per_query": n,
+        "before_us_per_query": round(before_s * 1e6, 2),
+        "after_us_per_query": round(after_s * 1e6, 2),
+        "speedup": round(before_s / after_s, 1) if after_s else None
+    }, indent=2))
@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chroma_client import ChromaDBClient
+from migrate_rule_store import directory_size, migrate
+
+# Disk footprint and query latency of the legacy metadata layout (full_json + notes in every
+# Chroma metadata record) against the compact layout (scalars only, bodies in RuleBodyStore).
+#   python benchmarks/bench_rule_layout.py --legacy rules_chroma_db
+# migrates a copy to <legacy>_compact first if --compact does not exist yet.
+
+
+def time_per_call(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def measure(persist_directory, city, iterations):
+    started = time.perf_counter()
+    db = ChromaDBClient(persist_directory=persist_directory)
+    startup_s = time.perf_counter() - started
+
+    # Where-filtered metadata scan, as Chroma runs for the semantic pass and for admin tooling
+    scan_s = time_per_call(lambda: db.collection.get(where={"city": city}, include=["metadatas"]), iterations)
+    grid = [(width, area) for width in (6, 9, 12, 18, 24, 30) for area in (150, 500, 1000, 4000)]
+
+    def queries():
+        for width, area in grid:
+            db._query_rules_uncached(city, {"road_width_m": width, "plot_area_sqm": area}, 10)
+
+    query_s = time_per_call(queries, iterations) / len(grid)
+    metadata_bytes = sum(len(json.dumps(m)) for m in db.collection.get(include=["metadatas"])["metadatas"])
+    return {
+        "rules": db.count(),
+        "disk_bytes": directory_size(persist_directory),
+        "metadata_bytes": metadata_bytes,
+        "startup_s": round(startup_s, 3),
+        "metadata_scan_ms": round(scan_s * 1e3, 2),
+        "query_ms": round(query_s * 1e3, 2)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the legacy and compact rule storage layouts.")
+    parser.add_argument("--legacy", default=os.getenv("CHROMADB_PERSIST_DIRECTORY", "rules_chroma_db"),
+                        help="Persist directory in the legacy layout.")
+    parser.add_argument("--compact", default=None, help="Persist directory in the compact layout (default: <legacy>_compact).")
+    parser.add_argument("--city", default="Mumbai", help="City used for filtered scans and queries.")
+    parser.add_argument("--iterations", type=int, default=20, help="Repetitions per measurement.")
+    args = parser.parse_args()
+
+    compact = args.compact or f"{args.legacy.rstrip('/')}_compact"
+    if not os.path.exists(compact):
+        migrate(args.legacy, compact)
+
+    before = measure(args.legacy, args.city, args.iterations)
+    after = measure(compact, args.city, args.iterations)
+    print(json.dumps({
+        "before": before,
+        "after": after,
+        "disk_reduction": round(1 - after["disk_bytes"] / before["disk_bytes"], 3),
+        "metadata_reduction": round(1 - after["metadata_bytes"] / before["metadata_bytes"], 3) if before["metadata_bytes"] else None
+    }, indent=2))
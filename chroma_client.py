@@ -1,16 +1,35 @@
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils import embedding_functions
 import uuid
 import os
 import json
+import threading
+import time
 from typing import List, Dict, Any, Optional
+from metrics import span
+from cache_utils import LRUCache
+from rule_index import RuleIntervalIndex
+from rule_store import RuleStore, RuleBodyStore
+from result_cache import ResultCache
+
+# Rules are always matched on the exact parameters (a road of 8.96 m must not match a rule
+# starting at 9 m). Only the semantic fallback's query text rounds them to these steps, so float
+# noise (12.000001 vs 12.0) shares one embedding and one cache entry.
+ROAD_WIDTH_STEP_M = float(os.getenv("CHROMA_ROAD_WIDTH_STEP_M", "0.1"))
+PLOT_AREA_STEP_SQM = float(os.getenv("CHROMA_PLOT_AREA_STEP_SQM", "1.0"))
+# How often query_rules checks whether another process has committed rules
+RULES_VERSION_CHECK_SECONDS = float(os.getenv("CHROMA_RULES_VERSION_CHECK_SECONDS", "1.0"))
+
+def _quantize(value, step: float) -> float:
+    return round(round(float(value) / step) * step, 6)
 
 class ChromaDBClient:
     """
     Client for interacting with ChromaDB.
     replaces the SQL-based MCPClient for rule storage and retrieval.
     """
-    def __init__(self, persist_directory: str = None):
+    def __init__(self, persist_directory: str = None, result_cache: ResultCache = None):
         if persist_directory is None:
             persist_directory = os.getenv("CHROMADB_PERSIST_DIRECTORY", "rules_chroma_db")
         self.persist_directory = persist_directory
@@ -20,33 +39,131 @@ class ChromaDBClient:
         print(f"--- Initializing ChromaDB Client at '{persist_directory}' ---")
         self.client = chromadb.PersistentClient(path=persist_directory)
         
-        # Create or get the collection for rules
-        self.collection = self.client.get_or_create_collection(name="rules")
+        # Create or get the collection for rules. The embedding function is held explicitly
+        # so query embeddings can be computed (and memoized) here instead of inside Chroma.
+        self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        self.collection = self.client.get_or_create_collection(name="rules", embedding_function=self.embedding_function)
         print("ChromaDB 'rules' collection ready.")
 
-    def add_rule(self, rule_data: Dict[str, Any], document_content: Optional[str] = None, **kwargs):
+        # Rule bodies and document text live beside the collection; Chroma only holds embeddings
+        # and filterable scalar metadata
+        self.bodies = RuleBodyStore(persist_directory)
+        self._init_query_state()
+
+        # Writers in other processes (the ingestion CLI) bump the result cache's rules_version
+        # after committing rules; seeing it change is the cue to rebuild the index from the collection
+        try:
+            self._rules_version_source = result_cache if result_cache is not None else ResultCache()
+            self._rules_version = self._rules_version_source.rules_version
+        except Exception as e:
+            print(f"Rules version unavailable; rules committed by other processes need a restart: {e}")
+            self._rules_version_source = None
+        self._load_index()
+
+    def _init_query_state(self):
+        # Two-level retrieval cache: query text -> embedding, and query key -> decoded rules.
+        # `collection_version` is part of every query key and is bumped by every write and rebuild.
+        self.collection_version = 0
+        self._embedding_cache = LRUCache(maxsize=int(os.getenv("CHROMA_EMBEDDING_CACHE_SIZE", "1024")))
+        self._query_cache = LRUCache(maxsize=int(os.getenv("CHROMA_QUERY_CACHE_SIZE", "512")))
+
+        # Decoded rules by id (bodies parsed once) and an in-memory interval index over them,
+        # so range matching never hits Chroma and query results never re-parse stored JSON
+        self.rules = RuleStore()
+        self.index = RuleIntervalIndex()
+        self._rules_version_source = None
+        self._rules_version = None
+        self._rules_version_checked = 0.0
+        self._sync_lock = threading.Lock()
+
+    def _load_index(self):
         """
-        Adds a rule to the ChromaDB collection.
-        
-        Args:
-            rule_data: Dictionary containing rule details (id, city, conditions, entitlements, etc.)
-            document_content: The actual text content to embed. If None, uses 'notes' or a generic string.
+        Decodes and indexes the whole collection: one pass at startup, and again when another
+        process has committed rules. The new store and index are swapped in once complete.
         """
-        rule_id = rule_data.get("id")
-        if not rule_id:
-            print("Error: Rule missing 'id'. Cannot add to ChromaDB.")
-            return False
+        rules, index = RuleStore(), RuleIntervalIndex()
+        with span("index.build"):
+            records = self.collection.get(include=["metadatas"])
+            self._index_records(records["ids"], records["metadatas"] or [], self.bodies.all(), rules, index)
+        self.rules, self.index = rules, index
+        print(f"Rule index built over {len(self.index)} rules.")
+
+    def _sync_rules_version(self):
+        """Rebuilds the index if the rules_version changed (at most one check per RULES_VERSION_CHECK_SECONDS)."""
+        if self._rules_version_source is None or time.monotonic() - self._rules_version_checked < RULES_VERSION_CHECK_SECONDS:
+            return
+        # Queries arriving during a rebuild keep using the current index instead of waiting
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._rules_version_checked = time.monotonic()
+            version = self._rules_version_source.rules_version
+            if version != self._rules_version:
+                print(f"Rules version changed ({self._rules_version} -> {version}); rebuilding the rule index.")
+                self._load_index()
+                self._rules_version = version
+                self._bump_version()
+        except Exception as e:
+            print(f"Error syncing the rule index with the rules version: {e}")
+        finally:
+            self._sync_lock.release()
 
-        # Prepare metadata - Flatten nested structures for filtering
-        # ChromaDB metadata must be int, float, str, or bool. No nested dicts.
+    def _index_records(self, ids: List[str], metadatas: List[Dict[str, Any]], bodies: Dict[str, tuple],
+                       rules: RuleStore = None, index: RuleIntervalIndex = None):
+        """Indexes records from their stored bodies; legacy records (full_json metadata) read their Chroma document."""
+        legacy_ids = [rule_id for rule_id in ids if rule_id not in bodies]
+        legacy_documents = {}
+        if legacy_ids:
+            legacy = self.collection.get(ids=legacy_ids, include=["documents"])
+            legacy_documents = dict(zip(legacy["ids"], legacy["documents"] or []))
+        for rule_id, meta in zip(ids, metadatas):
+            if rule_id in bodies:
+                body, doc = bodies[rule_id]
+                self._index_rule(meta, doc, body, rules, index)
+            else:
+                self._index_rule(meta, legacy_documents.get(rule_id), None, rules, index)
+
+    def _index_rule(self, meta: Dict[str, Any], doc: Optional[str], body: Optional[Dict[str, Any]] = None,
+                    rules: RuleStore = None, index: RuleIntervalIndex = None):
+        """Decodes and indexes one rule, into the live store and index unless others are given."""
+        rules = self.rules if rules is None else rules
+        index = self.index if index is None else index
+        rule_obj = rules.put(meta.get("id"), meta, doc, body)
+        if rule_obj is None:
+            return
+        road_width = plot_area = None
+        if "road_width_min" in meta and "road_width_max" in meta:
+            road_width = (float(meta["road_width_min"]), float(meta["road_width_max"]))
+        if "plot_area_min" in meta and "plot_area_max" in meta:
+            plot_area = (float(meta["plot_area_min"]), float(meta["plot_area_max"]))
+        location = (rule_obj.get("conditions") or {}).get("location")
+        index.add(meta.get("id"), meta.get("city"), road_width=road_width, plot_area=plot_area, location=location)
+
+    def _embed(self, text: str) -> List[float]:
+        """Embeds a query string, memoized: the query templates repeat constantly."""
+        embedding = self._embedding_cache.get(text)
+        if embedding is None:
+            with span("chroma.embed"):
+                embedding = [float(x) for x in self.embedding_function([text])[0]]
+            self._embedding_cache.put(text, embedding)
+        return embedding
+
+    def _bump_version(self):
+        """Invalidates the retrieval caches after a write."""
+        self.collection_version += 1
+        self._query_cache.clear()
+
+    def _rule_metadata(self, rule_data: Dict[str, Any], page_number: int = 0) -> Dict[str, Any]:
+        """
+        Flattens a rule into Chroma metadata (int, float, str or bool values only). Only filterable
+        scalars go here; the rule itself is kept in the body store.
+        """
+        rule_id = rule_data.get("id")
         metadata = {
             "id": rule_id,
             "city": rule_data.get("city", "Unknown"),
             "rule_type": rule_data.get("rule_type", "General"),
-            "notes": rule_data.get("notes", ""),
-            "page_number": kwargs.get("page_number", 0), # Store page number in metadata
-            # Store the full JSON string so we can reconstruct the object later
-            "full_json": json.dumps(rule_data) 
+            "page_number": page_number, # Store page number in metadata
         }
 
         # Flatten conditions for filtering
@@ -70,159 +187,236 @@ class ChromaDBClient:
         for key, value in conditions.items():
             if isinstance(value, (str, int, float, bool)):
                  metadata[f"condition_{key}"] = value
+        return metadata
+
+    def add_rule(self, rule_data: Dict[str, Any], document_content: Optional[str] = None, **kwargs):
+        """
+        Adds a rule to the ChromaDB collection.
+        
+        Args:
+            rule_data: Dictionary containing rule details (id, city, conditions, entitlements, etc.)
+            document_content: The actual text content to embed. If None, uses 'notes' or a generic string.
+        """
+        rule_id = rule_data.get("id")
+        if not rule_id:
+            print("Error: Rule missing 'id'. Cannot add to ChromaDB.")
+            return False
+
+        metadata = self._rule_metadata(rule_data, kwargs.get("page_number", 0))
 
         # Use provided content or fallback to notes/description
         if not document_content:
             document_content = rule_data.get("notes", f"Rule {rule_id} for {metadata['city']}")
 
         try:
+            # Body first: a Chroma record must never exist without its rule body
+            self.bodies.put_many({rule_id: rule_data}, {rule_id: document_content})
             self.collection.upsert(
                 ids=[rule_id],
                 metadatas=[metadata],
-                documents=[document_content]
+                embeddings=self.embedding_function([document_content])
             )
+            self._index_rule(metadata, document_content, rule_data)
+            self._bump_version()
             return True
         except Exception as e:
             print(f"Error adding rule {rule_id} to ChromaDB: {e}")
             return False
 
+    def add_rules_bulk(self, rules: List[Dict[str, Any]], documents: Optional[List[Optional[str]]] = None,
+                       page_numbers: Optional[List[int]] = None, batch_size: int = None,
+                       embed_batch_size: int = None) -> int:
+        """
+        Adds many rules at once: metadata is flattened for the whole batch, documents are embedded
+        in large batches and upserted `batch_size` rules per Chroma call (one transaction each).
+
+        Args:
+            rules: Rule dictionaries, as for add_rule.
+            documents: Text content to embed per rule (None entries fall back to 'notes').
+            page_numbers: Source page per rule.
+        Returns:
+            The number of rules committed.
+        """
+        if batch_size is None:
+            batch_size = int(os.getenv("CHROMA_UPSERT_BATCH_SIZE", "256"))
+        if embed_batch_size is None:
+            embed_batch_size = int(os.getenv("CHROMA_EMBED_BATCH_SIZE", "64"))
+        documents = documents or [None] * len(rules)
+        page_numbers = page_numbers or [0] * len(rules)
+
+        # Flatten everything up front; later duplicates of an id win, as with sequential upserts
+        pending: Dict[str, tuple] = {}
+        for rule_data, document_content, page_number in zip(rules, documents, page_numbers):
+            rule_id = rule_data.get("id")
+            if not rule_id:
+                print("Error: Rule missing 'id'. Cannot add to ChromaDB.")
+                continue
+            metadata = self._rule_metadata(rule_data, page_number)
+            if not document_content:
+                document_content = rule_data.get("notes", f"Rule {rule_id} for {metadata['city']}")
+            pending.pop(rule_id, None)
+            pending[rule_id] = (metadata, document_content, rule_data)
+
+        items = list(pending.items())
+        committed = 0
+        total_batches = (len(items) + batch_size - 1) // batch_size
+        for batch_number, start in enumerate(range(0, len(items), batch_size), start=1):
+            batch = items[start:start + batch_size]
+            ids = [rule_id for rule_id, _ in batch]
+            metadatas = [metadata for _, (metadata, _, _) in batch]
+            batch_documents = [document for _, (_, document, _) in batch]
+            batch_bodies = {rule_id: rule_data for rule_id, (_, _, rule_data) in batch}
+            batch_start = time.perf_counter()
+            try:
+                with span("chroma.bulk_upsert"):
+                    self.bodies.put_many(batch_bodies, dict(zip(ids, batch_documents)))
+                    embeddings = []
+                    for i in range(0, len(batch_documents), embed_batch_size):
+                        embeddings.extend(self.embedding_function(batch_documents[i:i + embed_batch_size]))
+                    self.collection.upsert(
+                        ids=ids,
+                        metadatas=metadatas,
+                        embeddings=embeddings
+                    )
+            except Exception as e:
+                print(f"Error upserting batch {batch_number}/{total_batches} ({len(batch)} rules) to ChromaDB: {e}")
+                continue
+            for metadata, document_content in zip(metadatas, batch_documents):
+                self._index_rule(metadata, document_content, batch_bodies[metadata["id"]])
+            committed += len(batch)
+            elapsed = time.perf_counter() - batch_start
+            print(f"Upserted batch {batch_number}/{total_batches}: {len(batch)} rules in {elapsed:.2f}s "
+                  f"({len(batch) / elapsed if elapsed else float('inf'):.1f} rules/s)")
+
+        if committed:
+            self._bump_version()
+        return committed
+
+    def delete_rules(self, rule_ids: List[str]) -> int:
+        """Deletes rules (e.g. from pages removed in an amended document). Returns the number deleted."""
+        rule_ids = list(rule_ids)
+        if not rule_ids:
+            return 0
+        try:
+            self.collection.delete(ids=rule_ids)
+            self.bodies.delete_many(rule_ids)
+        except Exception as e:
+            print(f"Error deleting {len(rule_ids)} rules from ChromaDB: {e}")
+            return 0
+        for rule_id in rule_ids:
+            self.index.remove(rule_id)
+            self.rules.remove(rule_id)
+        self._bump_version()
+        return len(rule_ids)
+
+    def _load_missing(self, rule_ids: List[str]):
+        """Decodes rules written to the collection by another process (e.g. the ingestion CLI)."""
+        missing = self.rules.missing(rule_ids)
+        if missing:
+            records = self.collection.get(ids=missing, include=["metadatas"])
+            self._index_records(records["ids"], records["metadatas"] or [], self.bodies.get_many(records["ids"]))
+
     def query_rules(self, city: str, parameters: dict, n_results: int = 10) -> List[Dict[str, Any]]:
         """
         Query rules based on city and parameters.
-        Uses ChromaDB's where clause for structured filtering.
+        The structured match runs on the exact parameters every time (an in-memory lookup); results
+        are cached per (city, matched rule ids, semantic fallback query, n_results, collection version).
         """
-        where_clauses = []
-        
-        # 1. City Filter
-        where_clauses.append({"city": city})
+        self._sync_rules_version()
+        try:
+            structured_ids = self._structured_ids(city, parameters, n_results)
+            semantic_query = self._semantic_query(city, parameters) if len(structured_ids) < n_results else None
+            cache_key = (city, tuple(structured_ids), semantic_query, n_results, self.collection_version)
+            cached = self._query_cache.get(cache_key)
+            if cached is None:
+                cached = self._query_rules_uncached(city, parameters, n_results, structured_ids)
+                self._query_cache.put(cache_key, cached)
+        except Exception as e:
+            print(f"Error querying ChromaDB: {e}")
+            return []
+        # Hand out copies so callers can annotate rules without touching the cache
+        return [dict(rule) for rule in cached]
 
-        # 2. Road Width Filter (if provided)
-        # We want rules where: rule_min <= param_width < rule_max
-        if "road_width_m" in parameters:
-            width = float(parameters["road_width_m"])
-            # In ChromaDB, we can't easily do "value BETWEEN field_min AND field_max" purely in 'where' 
-            # if we are comparing a scalar param against stored range fields.
-            # Wait, ChromaDB 'where' compares Metadata Field vs Value.
-            # We have metadata: road_width_min, road_width_max.
-            # We want: road_width_min <= width AND road_width_max > width.
-            # So: {"road_width_min": {"$lte": width}} AND {"road_width_max": {"$gt": width}}
+    def _structured_ids(self, city: str, parameters: dict, n_results: int) -> List[str]:
+        # Same semantics as the former Chroma where clause, on the exact parameters:
+        # rule_min <= road_width < rule_max AND rule_min <= plot_area <= rule_max, within the city.
+        with span("index.structured"):
+            return self.index.query(
+                city,
+                road_width=parameters.get("road_width_m"),
+                plot_area=parameters.get("plot_area_sqm"),
+                limit=n_results
+            )
+
+    def _query_rules_uncached(self, city: str, parameters: dict, n_results: int,
+                              structured_ids: List[str] = None) -> List[Dict[str, Any]]:
+        """
+        Structured filtering through the in-memory interval index, with a semantic fallback in ChromaDB.
+        """
+        # 1. Structured Search (Primary)
+        if structured_ids is None:
+            structured_ids = self._structured_ids(city, parameters, n_results)
+        seen_ids = set()
+        found_rules = self.rules.materialize(structured_ids, seen_ids)
+
+        # 2. Semantic Fallback (If strictly structured search yields too few results,
+        #    or if we are likely dealing with RawText chunks that lack metadata)
+        if len(found_rules) < n_results:
+            print("Structured search yielded low results. Attempting Semantic Search...")
+            nl_query = self._semantic_query(city, parameters)
+            print(f"Semantic Query: '{nl_query}'")
             
-            where_clauses.append({"road_width_min": {"$lte": width}})
-            where_clauses.append({"road_width_max": {"$gt": width}})
+            with span("chroma.semantic"):
+                semantic_ids = self._semantic_search(self._embed(nl_query), city, n_results)
+            self._load_missing(semantic_ids)
+            found_rules.extend(self.rules.materialize(semantic_ids, seen_ids))
 
-        # 3. Plot Area Filter (if provided)
-        if "plot_area_sqm" in parameters:
-            area = float(parameters["plot_area_sqm"])
-            where_clauses.append({"plot_area_min": {"$lte": area}})
-            where_clauses.append({"plot_area_max": {"$gte": area}})
-
-        # Construct final where clause
-        if len(where_clauses) == 1:
-            final_where = where_clauses[0]
-        elif len(where_clauses) > 1:
-            final_where = {"$and": where_clauses}
+        return found_rules
+
+    def _semantic_query(self, city: str, parameters: dict) -> str:
+        """The natural language query of the semantic fallback (parameters rounded, see ROAD_WIDTH_STEP_M)."""
+        road_width, plot_area = parameters.get("road_width_m"), parameters.get("plot_area_sqm")
+        if road_width is not None:
+            road_width = _quantize(road_width, ROAD_WIDTH_STEP_M)
+        if plot_area is not None:
+            plot_area = _quantize(plot_area, PLOT_AREA_STEP_SQM)
+
+        # Construct a natural language query from parameters
+        # ENHANCED QUERY: Auto-adapt terminology based on city
+        if city == "Delhi":
+             # Delhi uses FAR, Ground Coverage, MPD-2021 terms
+             nl_query = f"Master Plan Delhi MPD 2021 zoning regulations residential plot development controls FAR Floor Area Ratio Ground Coverage max height setbacks parking standards for {city}"
         else:
-            final_where = {}
+             # Mumbai/Pune/Nashik use FSI, Fungible, TDR terms
+             nl_query = f"Zoning rules FSI floor space index permissible height setbacks side margin rear margin premium FSI rate exclusions parking requirements fungible compensatory area FCA for {city}"
 
-        print(f"Querying ChromaDB with where: {final_where}")
+        if "road_width_m" in parameters:
+            nl_query += f" with road width {road_width} meters"
+        if "plot_area_sqm" in parameters:
+            nl_query += f" and plot area {plot_area} sq m"
+        if "location" in parameters:
+            nl_query += f" in {parameters['location']}"
         
-        try:
-            # 1. Structured Search (Primary)
-            results = self.collection.query(
-                query_texts=[""], 
-                n_results=n_results,
-                where=final_where
-            )
-            
-            found_rules = []
-            if results["metadatas"] and results["metadatas"][0]:
-                for i, meta in enumerate(results["metadatas"][0]):
-                    rule_obj = {}
-                    if "full_json" in meta:
-                        try:
-                            rule_obj = json.loads(meta["full_json"])
-                        except: pass
-                    
-                    if results["documents"] and results["documents"][0][i]:
-                         doc_content = results["documents"][0][i]
-                         # Only overwrite 'notes' if this is a RawText chunk (unstructured)
-                         # For structured rules, we prefer the AI-generated 'notes' (summary), 
-                         # but we attach the full text as 'source_evidence' for reference.
-                         if rule_obj.get("rule_type") == "RawText":
-                             rule_obj["notes"] = doc_content
-                         else:
-                             rule_obj["source_evidence"] = doc_content
-
-                    # Inject page_number from metadata if available
-                    if "page_number" in meta:
-                         rule_obj["page_number"] = meta["page_number"]
-
-                    if rule_obj:
-                        found_rules.append(rule_obj)
-
-            # 2. Semantic Fallback (If strictly structured search yields too few results,
-            #    or if we are likely dealing with RawText chunks that lack metadata)
-            if len(found_rules) < n_results:
-                print("Structured search yielded low results. Attempting Semantic Search...")
-                
-                # Construct a natural language query from parameters
-                # Construct a natural language query from parameters
-                # ENHANCED QUERY: Auto-adapt terminology based on city
-                if city == "Delhi":
-                     # Delhi uses FAR, Ground Coverage, MPD-2021 terms
-                     nl_query = f"Master Plan Delhi MPD 2021 zoning regulations residential plot development controls FAR Floor Area Ratio Ground Coverage max height setbacks parking standards for {city}"
-                else:
-                     # Mumbai/Pune/Nashik use FSI, Fungible, TDR terms
-                     nl_query = f"Zoning rules FSI floor space index permissible height setbacks side margin rear margin premium FSI rate exclusions parking requirements fungible compensatory area FCA for {city}"
-
-                if "road_width_m" in parameters:
-                    nl_query += f" with road width {parameters['road_width_m']} meters"
-                if "plot_area_sqm" in parameters:
-                    nl_query += f" and plot area {parameters['plot_area_sqm']} sq m"
-                if "location" in parameters:
-                    nl_query += f" in {parameters['location']}"
-                
-                # Add explicit keywords to boost retrieval
-                if city == "Delhi":
-                    nl_query += " residential group housing plotting MPD"
-                else:
-                    nl_query += " entitlements residential commercial generic"
-                
-                print(f"Semantic Query: '{nl_query}'")
-                
-                semantic_results = self.collection.query(
-                    query_texts=[nl_query],
-                    n_results=n_results,
-                    # We can't really use the same strict 'where' if metadata is missing.
-                    # We might filter just by city if possible.
-                    where={"city": city}
-                )
-                
-                if semantic_results["metadatas"] and semantic_results["metadatas"][0]:
-                     for i, meta in enumerate(semantic_results["metadatas"][0]):
-                        # If it's a RawText chunk, treat it as a rule
-                        if meta.get("rule_type") == "RawText":
-                            found_rules.append({
-                                "id": meta.get("id"),
-                                "city": meta.get("city"),
-                                "rule_type": "RawText",
-                                "conditions": {},
-                                "entitlements": {},
-                                "notes": semantic_results["documents"][0][i] # Use the actual text content
-                            })
-                        elif "full_json" in meta:
-                             try:
-                                r = json.loads(meta["full_json"])
-                                # Avoid duplicates (simple check by ID)
-                                if not any(existing['id'] == r['id'] for existing in found_rules):
-                                    found_rules.append(r)
-                             except: pass
-
-            return found_rules
+        # Add explicit keywords to boost retrieval
+        if city == "Delhi":
+            nl_query += " residential group housing plotting MPD"
+        else:
+            nl_query += " entitlements residential commercial generic"
+        return nl_query
+
+    def _semantic_search(self, query_embedding: List[float], city: str, n_results: int) -> List[str]:
+        """Ids of the nearest rules of `city` to a query embedding."""
+        # Only ids are needed: the rules themselves come from the decoded store
+        semantic_results = self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            # We can't really use the same strict 'where' if metadata is missing.
+            # We might filter just by city if possible.
+            where={"city": city},
+            include=[]
+        )
+        return semantic_results["ids"][0] if semantic_results["ids"] else []
 
-        except Exception as e:
-            print(f"Error querying ChromaDB: {e}")
-            return []
             
     def count(self):
         return self.collection.count()
@@ -0,0 +1,219 @@
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+# --- Regulation structure patterns ---
+# A clause number must be followed by a title, punctuation or the line end; otherwise it is a
+# wrapped reference or quantity ("Regulation No 15.3.1, shall ...", "18.5 mt if ...")
+_CLAUSE_END = r'\.?(?=\s*$|\s*[:\-\u2013]|\s+[A-Z(])'
+# Dotted regulation numbers on their own line or leading a title, e.g. "15.4.1" or "15.4.1 Amenity space"
+SECTION_PATTERN = re.compile(r'^(\d+(?:\.\d+)+)' + _CLAUSE_END)
+# "Section 12", "Regulation No. 15.3.1", "Clause 4", "Rule 7"
+NAMED_SECTION_PATTERN = re.compile(r'^(?:section|regulation|clause|rule)\s+(?:no\.?\s*)?(\d+(?:\.\d+)*)' + _CLAUSE_END, re.IGNORECASE)
+# Sub-clauses as parse_agent finds them: "(3)", "(a)", "ii)", "b)"
+SUB_CLAUSE_PATTERN = re.compile(r'^\(?(\d+|[ivxl]+|[a-z])\)(?:\s|$)')
+HEADING_PATTERN = re.compile(r'^(?:table|chapter|part|appendix|schedule)\b', re.IGNORECASE)
+# Table rows: cells separated by pipes, tabs or runs of spaces
+TABLE_ROW_PATTERN = re.compile(r'\|.*\||\t|\S {3,}\S.* {3,}\S')
+WORD_PATTERN = re.compile(r'[a-z0-9]+(?:\.[0-9]+)?')
+
+
+def _is_heading(line: str) -> bool:
+    if HEADING_PATTERN.match(line):
+        return True
+    letters = [c for c in line if c.isalpha()]
+    # Short upper-case lines: "MARGINAL OPEN SPACES", "DCPR-2018 FOR PMRDA"
+    return 3 <= len(letters) and len(line) <= 80 and all(c.isupper() for c in letters)
+
+
+class PageChunker:
+    """
+    Splits page text into retrieval-sized chunks along regulation structure: clause numbers
+    (dotted regulation numbers, "Section N", "(a)" / "ii)" sub-clauses), headings and table
+    boundaries, then paragraphs and sentences when a single clause is still too long.
+
+    Each chunk records its page and the clause it belongs to (e.g. "15.4.1(ii)"). Where a split
+    cuts through running text, the chunk repeats `overlap_chars` of the previous one so a
+    sentence straddling the split stays retrievable.
+    """
+    def __init__(self, max_chars: int = None, overlap_chars: int = None, min_chars: int = None):
+        if max_chars is None:
+            max_chars = int(os.getenv("CHUNK_MAX_CHARS", "1200"))
+        if overlap_chars is None:
+            overlap_chars = int(os.getenv("CHUNK_OVERLAP_CHARS", "150"))
+        if min_chars is None:
+            min_chars = int(os.getenv("CHUNK_MIN_CHARS", "200"))
+        self.max_chars = max(100, max_chars)
+        self.overlap_chars = max(0, min(overlap_chars, self.max_chars // 2))
+        self.min_chars = min_chars
+
+    # --- Structural blocks ---
+    def _blocks(self, text: str) -> List[Dict[str, Any]]:
+        """Groups lines into blocks that start at a clause, heading or table boundary."""
+        blocks = []
+        section, sub = None, None
+        current = None
+        for raw_line in text.splitlines():
+            line = raw_line.strip()
+            if not line:
+                if current is not None and current["lines"] and current["lines"][-1] != "":
+                    current["lines"].append("")  # paragraph break, a soft split point
+                continue
+
+            boundary = False
+            match = SECTION_PATTERN.match(line) or NAMED_SECTION_PATTERN.match(line)
+            if match:
+                section, sub = match.group(1), None
+                boundary = True
+            else:
+                match = SUB_CLAUSE_PATTERN.match(line)
+                if match:
+                    sub = match.group(1)
+                    boundary = True
+            is_table = bool(TABLE_ROW_PATTERN.search(raw_line))
+            if _is_heading(line):
+                boundary = True
+            if current is not None and current["table"] != is_table:
+                if is_table and current["heading"]:
+                    # "TABLE 7" stays with the rows it introduces
+                    current["table"] = True
+                else:
+                    boundary = True
+
+            if current is None or boundary:
+                clause = section or ""
+                if sub:
+                    clause = f"{clause}({sub})"
+                current = {"clause": clause or None, "table": is_table, "hard": boundary,
+                           "heading": _is_heading(line), "lines": []}
+                blocks.append(current)
+            elif not _is_heading(line):
+                current["heading"] = False
+            current["lines"].append(raw_line.rstrip() if is_table else line)
+
+        for block in blocks:
+            block["text"] = "\n".join(block.pop("lines")).strip()
+            del block["heading"]
+        return [block for block in blocks if block["text"]]
+
+    def _split_long(self, text: str, table: bool) -> List[str]:
+        """Splits an oversized block on rows (tables), paragraphs, sentences, then whitespace."""
+        if len(text) <= self.max_chars:
+            return [text]
+        # (unit, separator placed before it when joined to the previous unit)
+        if table:
+            units = [(row, "\n") for row in text.split("\n")]
+        else:
+            units = []
+            for paragraph in re.split(r'\n\s*\n', text):
+                sentences = [paragraph] if len(paragraph) <= self.max_chars else re.split(r'(?<=[.;:])\s+', paragraph)
+                units.extend((sentence, "\n\n" if i == 0 else " ") for i, sentence in enumerate(sentences))
+
+        pieces, current = [], ""
+        for unit, separator in units:
+            while len(unit) > self.max_chars:
+                cut = unit.rfind(" ", 0, self.max_chars)
+                cut = cut if cut > 0 else self.max_chars
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(unit[:cut])
+                unit = unit[cut:].lstrip()
+            if current and len(current) + len(separator) + len(unit) > self.max_chars:
+                pieces.append(current)
+                current = unit
+            else:
+                current = f"{current}{separator}{unit}" if current else unit
+        if current:
+            pieces.append(current)
+        return pieces
+
+    def _overlap(self, previous: str) -> str:
+        if not self.overlap_chars or not previous:
+            return ""
+        tail = previous[-self.overlap_chars:]
+        space = tail.find(" ")
+        # Start at a word boundary
+        return tail[space + 1:] if 0 <= space < len(tail) - 1 else tail
+
+    # --- Public API ---
+    def chunk(self, text: str, page_number: int = 0) -> List[Dict[str, Any]]:
+        """Chunks of one page: {"text", "page_number", "clause", "chunk_index"}, in reading order."""
+        # Merge consecutive blocks up to max_chars; clause/heading/table boundaries start a new
+        # chunk unless the current one is too small to stand on its own
+        merged = []
+        for block in self._blocks(text or ""):
+            last = merged[-1] if merged else None
+            if last is not None and last["table"] == block["table"] and (
+                    len(last["text"]) < self.min_chars
+                    or (not block["hard"] and len(last["text"]) + len(block["text"]) + 1 <= self.max_chars)):
+                # A bare marker line ("ii)") takes the clause of the text that follows it
+                if block["clause"] and (not last["clause"] or len(last["text"]) < self.min_chars):
+                    last["clause"] = block["clause"]
+                last["text"] = f"{last['text']}\n{block['text']}"
+            else:
+                merged.append(dict(block))
+        # A short trailing block (e.g. a page footer) joins the chunk before it
+        if len(merged) > 1:
+            last, previous_block = merged[-1], merged[-2]
+            if (len(last["text"]) < self.min_chars and last["table"] == previous_block["table"]
+                    and len(previous_block["text"]) + len(last["text"]) + 1 <= self.max_chars):
+                previous_block["text"] = f"{previous_block['text']}\n{merged.pop()['text']}"
+
+        chunks = []
+        previous = ""
+        for block in merged:
+            for i, piece in enumerate(self._split_long(block["text"], block["table"])):
+                # Overlap only where a split cuts through running text, not at a new clause or table
+                overlap = self._overlap(previous) if i or not block["hard"] else ""
+                chunks.append({
+                    "text": f"{overlap} {piece}" if overlap else piece,
+                    "page_number": page_number,
+                    "clause": block["clause"],
+                    "chunk_index": len(chunks)
+                })
+                previous = piece
+        return chunks
+
+    def document_items(self, page: Dict[str, Any], rules: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Commit items ({"rule", "source_text", "page_number"}) for the rules extracted from a page.
+
+        Raw-text rules (offline / LLM fallback) are expanded into one record per chunk, so the
+        semantic search returns the relevant chunk instead of the whole page. Structured rules
+        keep one record, with the chunk that best supports them as their embedded evidence.
+        """
+        page_num = page.get('page', 0)
+        content = page.get('content', '')
+        chunks = self.chunk(content, page_num)
+        if not chunks:
+            return [{"rule": rule, "source_text": content, "page_number": page_num} for rule in rules]
+
+        items = []
+        for rule in rules:
+            if rule.get("rule_type") == "RawText":
+                for chunk in chunks:
+                    chunk_rule = dict(rule, clause=chunk["clause"], chunk_index=chunk["chunk_index"])
+                    if len(chunks) > 1:
+                        chunk_rule["id"] = f"{rule['id']}-c{chunk['chunk_index'] + 1}"
+                    items.append({"rule": chunk_rule, "source_text": chunk["text"], "page_number": page_num})
+            else:
+                chunk = best_chunk(rule, chunks)
+                if chunk["clause"] and not rule.get("clause"):
+                    rule = dict(rule, clause=chunk["clause"])
+                items.append({"rule": rule, "source_text": chunk["text"], "page_number": page_num})
+        return items
+
+
+def _words(text: str) -> set:
+    return set(WORD_PATTERN.findall(text.lower()))
+
+
+def best_chunk(rule: Dict[str, Any], chunks: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The chunk sharing the most words and numbers with a rule's notes, conditions and entitlements."""
+    if not chunks:
+        return None
+    rule_words = _words(" ".join(
+        str(rule.get(key, "")) for key in ("notes", "rule_type", "conditions", "entitlements")
+    ))
+    return max(chunks, key=lambda chunk: len(rule_words & _words(chunk["text"])))
@@ -0,0 +1,111 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from logging_config import logger
+
+# Component lifecycle states
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+SETTLED_STATES = {READY, FAILED}
+
+
+class ComponentLoader:
+    """
+    Loads the server's heavy components (rule DB, LLM client, RL agent) concurrently on
+    background threads, so a slow one (e.g. importing torch for PPO.load) no longer holds
+    up the others.
+
+    Each component is a name plus a zero-argument `load()` callable; its result is handed to
+    `on_ready(value)`. Endpoints check `is_ready(name)` for just the components they need,
+    and `status()` backs the /ready endpoint.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._settled = threading.Condition(self._lock)
+        self._components: Dict[str, Dict[str, Any]] = {}
+
+    def register(self, name: str, load: Callable[[], Any], on_ready: Optional[Callable[[Any], None]] = None):
+        with self._lock:
+            self._components[name] = {
+                "load": load, "on_ready": on_ready, "state": PENDING,
+                "load_seconds": None, "error": None, "thread": None
+            }
+
+    def start(self):
+        """Starts one daemon thread per registered component and returns immediately."""
+        with self._lock:
+            for name, component in self._components.items():
+                if component["thread"] is not None:
+                    continue
+                component["thread"] = threading.Thread(target=self._load, args=(name,), name=f"load-{name}", daemon=True)
+                component["thread"].start()
+
+    def _load(self, name: str):
+        component = self._components[name]
+        with self._lock:
+            component["state"] = LOADING
+        started = time.perf_counter()
+        try:
+            value = component["load"]()
+            if component["on_ready"] is not None:
+                component["on_ready"](value)
+            state, error = READY, None
+            logger.info(f"Component '{name}' ready in {time.perf_counter() - started:.2f}s.")
+        except Exception as e:
+            state, error = FAILED, str(e)
+            logger.error(f"Failed to load component '{name}': {e}")
+        with self._settled:
+            component["state"] = state
+            component["error"] = error
+            component["load_seconds"] = round(time.perf_counter() - started, 3)
+            self._settled.notify_all()
+
+    def mark_recovered(self, name: str):
+        """Marks a component that failed at startup as ready once it became available later (e.g. a hot-loaded RL checkpoint)."""
+        with self._settled:
+            component = self._components.get(name)
+            if component is not None and component["state"] == FAILED:
+                component["state"], component["error"] = READY, None
+                self._settled.notify_all()
+
+    # --- Readiness ---
+    def state(self, name: str) -> Optional[str]:
+        with self._lock:
+            component = self._components.get(name)
+            return component["state"] if component else None
+
+    def is_ready(self, name: str) -> bool:
+        return self.state(name) == READY
+
+    def is_settled(self, names: Iterable[str] = None) -> bool:
+        """True once every named component (default: all) has finished loading, successfully or not."""
+        with self._lock:
+            names = list(self._components) if names is None else list(names)
+            return all(self._components[name]["state"] in SETTLED_STATES for name in names if name in self._components)
+
+    def wait(self, names: Iterable[str] = None, timeout: float = None) -> bool:
+        """Blocks until the named components (default: all) have settled; False on timeout."""
+        names = None if names is None else list(names)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._settled:
+            while True:
+                pending = [
+                    name for name, component in self._components.items()
+                    if (names is None or name in names) and component["state"] not in SETTLED_STATES
+                ]
+                if not pending:
+                    return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._settled.wait(remaining)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {"state": component["state"], "load_seconds": component["load_seconds"], "error": component["error"]}
+                for name, component in self._components.items()
+            }
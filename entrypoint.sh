@@ -7,9 +7,17 @@ echo "--- Starting Entrypoint Script ---"
 # We need to copy our embedded database and set cache paths to /tmp.
 
 # 1. Setup ChromaDB in /tmp
+# A read-only snapshot baked into the image (see readonly_rule_db.py) is served in place via
+# mmap, so there is nothing to copy. The writable store is still set up for ingestion.
+if [ -f "rules_snapshot/vectors.npy" ] && [ "${RULE_DB_READ_ONLY:-1}" = "1" ]; then
+    echo "Serving rules from read-only snapshot (no copy)."
+    export RULE_DB_SNAPSHOT="$PWD/rules_snapshot"
+fi
 echo "Setting up ChromaDB in /tmp..."
 export CHROMADB_PERSIST_DIRECTORY="/tmp/rules_chroma_db"
-if [ -d "rules_chroma_db" ]; then
+if [ -n "$RULE_DB_SNAPSHOT" ]; then
+    mkdir -p /tmp/rules_chroma_db
+elif [ -d "rules_chroma_db" ]; then
     echo "Copying existing rules_chroma_db to /tmp..."
     cp -R rules_chroma_db /tmp/
 else
@@ -17,6 +25,14 @@ else
     mkdir -p /tmp/rules_chroma_db
 fi
 
+# 1b. Load the pre-warmed LLM extraction cache, if one was shipped with the image
+# (produced with: python extraction_cache.py export extraction_cache.jsonl.gz)
+export EXTRACTION_CACHE_DB="/tmp/extraction_cache.db"
+if [ -f "extraction_cache.jsonl.gz" ]; then
+    echo "Importing shipped extraction cache..."
+    python extraction_cache.py import extraction_cache.jsonl.gz
+fi
+
 # 2. Setup Cache Re-direction (HuggingFace, Torch, etc.)
 echo "Configuring cache paths to /tmp..."
 export TRANSFORMERS_CACHE="/tmp/transformers"
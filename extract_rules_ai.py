@@ -4,9 +4,11 @@ import argparse
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
-from chroma_client import ChromaDBClient
-from tqdm import tqdm
-import concurrent.futures
+from ingestion_manifest import IngestionManifest, document_key
+from ingestion_pipeline import StreamingIngestion
+from extraction_cache import ExtractionCache
+from extraction_scheduler import ExtractionScheduler
+from cache_utils import canonical_hash
 import uuid
 
 # --- SETUP & PROMPT (UNCHANGED) ---
@@ -56,20 +58,129 @@ You must extract rules into a list of JSON objects, where each object has the fo
 </TEXT_BLOCK>
 """
 
-# --- RULE EXTRACTION AGENT (UNCHANGED) ---
+# Several short pages in one call; the answer is split back per page by page number
+EXTRACTION_BATCH_PROMPT = """
+You are a hyper-precise AI data analyst. Your sole task is to read several pages of unstructured text from a regulatory document and extract any specific, quantifiable rules from each page into a structured JSON format.
+
+**Rule Schema:**
+Each rule is a JSON object with the keys "id", "city", "rule_type", "conditions", "entitlements", "notes".
+
+1.  **id**: A unique ID you generate, like "MUM-FSI-002".
+2.  **city**: The city the rule applies to (e.g., "Mumbai").
+3.  **rule_type**: A camel-case category (e.g., "FSI", "Setback", "BuildingHeight").
+4.  **conditions**: A JSON object describing the "IF" part of the rule. Use keys like "road_width_m", "plot_area_sqm", "location_type", "zone". For numerical conditions, use `{{ "min": X, "max": Y }}`.
+5.  **entitlements**: A JSON object describing the "THEN" part of the rule. Use keys like "base_fsi", "total_fsi", "max_height_m", "los_percentage".
+6.  **notes**: A brief, human-readable summary of the rule.
+
+**Your Target JSON Format:**
+A single JSON object mapping every page number to the list of rules found on that page:
+```json
+{{
+  "12": [
+    {{
+      "id": "MUM-FSI-001",
+      "city": "Mumbai",
+      "rule_type": "FSI",
+      "conditions": {{"road_width_m": {{"min": 18, "max": 27}}}},
+      "entitlements": {{"total_fsi": 2.4}},
+      "notes": "FSI for Suburbs on 18m-27m roads."
+    }}
+  ],
+  "13": []
+}}
+```
+
+**Instructions:**
+* Each page is wrapped in <PAGE number="N"> ... </PAGE>. Extract rules from each page separately.
+* Include every page number in the output. **A page with NO specific, quantifiable rules MUST map to an empty list: `[]`**. Do not invent rules.
+
+{pages}
+"""
+
+EXTRACTION_MODEL = "gemini-2.5-flash"
+# Any edit to the prompts changes this version, so cached extractions from older prompts are not reused
+EXTRACTION_PROMPT_VERSION = canonical_hash([EXTRACTION_PROMPT, EXTRACTION_BATCH_PROMPT])[:12]
+# Pages shorter than this hold no extractable rules (headers, blank scans)
+MIN_PAGE_CHARS = 200
+
+# --- RULE EXTRACTION AGENT ---
 class RuleExtractionAgent:
-    def __init__(self):
+    def __init__(self, cache: ExtractionCache = None):
+        # Parsed extractions are cached on disk by (prompt version, model, city, page text)
+        self.cache = cache or ExtractionCache()
         # Enable the LLM for rule extraction
         try:
-            self.llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.0)
+            self.llm = ChatGoogleGenerativeAI(model=EXTRACTION_MODEL, temperature=0.0)
             self.prompt = PromptTemplate.from_template(EXTRACTION_PROMPT)
             self.chain = self.prompt | self.llm
+            self.batch_chain = PromptTemplate.from_template(EXTRACTION_BATCH_PROMPT) | self.llm
             self.offline_mode = False
             print("[CONFIG] AI Rule Extraction ENABLED (Gemini 2.5 Flash).")
         except Exception as e:
             print(f"[{e}] LLM Init failed. Switching to OFFLINE PASSTHROUGH MODE.")
             self.offline_mode = True
     
+    # --- Building blocks (used directly by ExtractionScheduler) ---
+    def cached(self, text_chunk: str, city: str):
+        return self.cache.get(self.cache.make_key(EXTRACTION_PROMPT_VERSION, EXTRACTION_MODEL, city, text_chunk))
+
+    def store(self, text_chunk: str, city: str, rules):
+        # Only successful extractions are cached; fallbacks are retried next time
+        key = self.cache.make_key(EXTRACTION_PROMPT_VERSION, EXTRACTION_MODEL, city, text_chunk)
+        self.cache.put(key, rules, EXTRACTION_PROMPT_VERSION, EXTRACTION_MODEL)
+
+    def call_single(self, text_chunk: str, city: str):
+        """One LLM call for one page. LLM errors propagate; an unparseable answer raises ValueError."""
+        response = self.chain.invoke({"text_chunk": text_chunk})
+        json_str = response.content.strip()
+        start_index = json_str.find('[')
+        end_index = json_str.rfind(']') + 1
+        if start_index == -1 or end_index == 0:
+            raise ValueError("JSON parsing failed or empty")
+        extracted_data = json.loads(json_str[start_index:end_index])
+        if not isinstance(extracted_data, list):
+            raise ValueError("Expected a JSON list of rules")
+        for rule in extracted_data:
+            if 'city' not in rule: rule['city'] = city
+        return extracted_data
+
+    def call_batch(self, pages, city: str):
+        """One LLM call for several pages; returns {page number: rules}. Raises ValueError if the answer cannot be split."""
+        blocks = "\n\n".join(
+            f'<PAGE number="{page.get("page", 0)}">\n{page.get("content", "")}\n</PAGE>' for page in pages
+        )
+        response = self.batch_chain.invoke({"pages": blocks})
+        json_str = response.content.strip()
+        start_index = json_str.find('{')
+        end_index = json_str.rfind('}') + 1
+        if start_index == -1 or end_index == 0:
+            raise ValueError("JSON parsing failed or empty")
+        extracted_data = json.loads(json_str[start_index:end_index])
+        if not isinstance(extracted_data, dict):
+            raise ValueError("Expected a JSON object keyed by page number")
+
+        by_page = {}
+        for page in pages:
+            page_num = page.get('page', 0)
+            rules = extracted_data.get(str(page_num))
+            if not isinstance(rules, list):
+                raise ValueError(f"No rule list for page {page_num}")
+            for rule in rules:
+                if 'city' not in rule: rule['city'] = city
+            by_page[page_num] = rules
+        return by_page
+
+    def fallback_rules(self, city: str):
+        # Raw-text rule used when the LLM fails at runtime (e.g. invalid key, exhausted retries)
+        return [{
+            "id": f"FALLBACK-CHUNK-{uuid.uuid4()}", 
+            "city": city,
+            "rule_type": "RawText",
+            "conditions": {},
+            "entitlements": {},
+            "notes": "Raw PDF content (Fallback due to AI error).",
+        }]
+
     def extract_rules_from_text(self, text_chunk: str, city: str):
         if self.offline_mode:
             # Return a single dummy rule that wraps the content for Vector Search
@@ -82,113 +193,79 @@ class RuleExtractionAgent:
                 "notes": "Raw PDF content indexed for search.",
             }]
 
+        cached_rules = self.cached(text_chunk, city)
+        if cached_rules is not None:
+            return cached_rules
 
         try:
-            response = self.chain.invoke({"text_chunk": text_chunk})
-            json_str = response.content.strip()
-            start_index = json_str.find('[')
-            end_index = json_str.rfind(']') + 1
-            if start_index != -1 and end_index != 0:
-                json_str = json_str[start_index:end_index]
-                extracted_data = json.loads(json_str)
-                for rule in extracted_data:
-                    if 'city' not in rule: rule['city'] = city
-                return extracted_data
-            else: 
-                raise ValueError("JSON parsing failed or empty")
+            extracted_data = self.call_single(text_chunk, city)
+            self.store(text_chunk, city, extracted_data)
+            return extracted_data
         except Exception as e:
             # Fallback to RAW CHUNK if LLM fails at runtime (e.g. invalid key)
             print(f"Extraction failed for chunk. Fallback to Raw Indexing. Error: {e}")
-            return [{
-                "id": f"FALLBACK-CHUNK-{uuid.uuid4()}", 
-                "city": city,
-                "rule_type": "RawText",
-                "conditions": {},
-                "entitlements": {},
-                "notes": "Raw PDF content (Fallback due to AI error).",
-            }]
+            return self.fallback_rules(city)
 
-def process_page(page_data, city_name, agent):
-    # Extract page number and content
-    text_content = page_data.get('content', '')
-    page_num = page_data.get('page', 0) # Default to 0 if missing
-
-    if len(text_content) < 200: return []
-    
-    found_rules = agent.extract_rules_from_text(text_content, city_name)
-    
-    # Attach source text and page number to each rule
-    results_with_source = []
-    for rule in found_rules:
-        results_with_source.append({
-            "rule": rule,
-            "source_text": text_content, # This will be the document content in Chroma
-            "page_number": page_num
-        })
-    return results_with_source
+def is_fallback_rule(rule):
+    """Raw-text rules produced because the LLM call failed (not because it is offline)."""
+    return str(rule.get("id", "")).startswith("FALLBACK-CHUNK-")
 
 # --- MAIN EXECUTION SCRIPT (Now with ChromaDB) ---
-def run_extraction_pipeline(input_path: str, city_name: str):
+def run_extraction_pipeline(input_path: str, city_name: str, batch_size: int = None,
+                            document_id: str = None, manifest: IngestionManifest = None, pages=None):
+    """
+    Extracts rules from OCR'd pages and commits them to ChromaDB as they are extracted.
+    `pages` is any iterable of {"page", "content"} dicts (e.g. a live OCR stream); by default
+    they are read from the JSON file at `input_path`.
+    Incremental: pages whose text is unchanged since the last run (per the ingestion manifest)
+    are skipped, extractions saved before a crash are reused, and rules whose source pages
+    changed or disappeared are deleted. `document_id` defaults to the input file name.
+    Short pages are batched into one LLM call and concurrency adapts to rate limiting
+    (see ExtractionScheduler).
+    """
     print(f"--- Starting HIGH-PERFORMANCE AI Curation for {city_name} ---")
     
-    if not os.path.exists(input_path): raise FileNotFoundError(f"Input file not found: {input_path}.")
-    with open(input_path, 'r', encoding='utf-8') as f: unstructured_data = json.load(f)
+    if pages is None:
+        if not os.path.exists(input_path): raise FileNotFoundError(f"Input file not found: {input_path}.")
+        with open(input_path, 'r', encoding='utf-8') as f: pages = json.load(f)
 
     agent = RuleExtractionAgent()
-    all_extracted_items = []
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        results = list(tqdm(
-            executor.map(lambda page: process_page(page, city_name, agent), unstructured_data),
-            total=len(unstructured_data), desc=f"Processing pages for {city_name}"
-        ))
-
-    for page_results in results:
-        if page_results: all_extracted_items.extend(page_results)
-    
-    print(f"\nAI extraction complete. Found {len(all_extracted_items)} potential rules.")
-
-    # --- De-duplicate the results ---
-    print("De-duplicating extracted rules...")
-    unique_items = {}
-    for item in all_extracted_items:
-        rule = item["rule"]
-        rule_id = rule.get("id")
-        if rule_id and rule_id not in unique_items:
-            unique_items[rule_id] = item
-    
-    final_items_to_commit = list(unique_items.values())
-    print(f"Found {len(final_items_to_commit)} unique rules to process.")
-    
-    if not final_items_to_commit:
-        print("No new rules to commit.")
-        return
-
-    # --- Initialize ChromaDB Client ---
-    db_client = ChromaDBClient()
-    total_rules_committed = 0
-    
-    print("Committing new unique rules to ChromaDB...")
-    for item in tqdm(final_items_to_commit, desc="Saving to DB"):
-        rule_data = item["rule"]
-        source_text = item["source_text"]
-        
-        # Add to ChromaDB
-        # We pass the full source text as the document content, AND the page number
-        page_num = item.get("page_number", 0)
-        success = db_client.add_rule(rule_data, document_content=source_text, page_number=page_num)
-        if success:
-            total_rules_committed += 1
+    scheduler = ExtractionScheduler(agent, city_name, min_page_chars=MIN_PAGE_CHARS)
+    pipeline = StreamingIngestion(
+        city_name,
+        document_key(city_name, document_id or input_path),
+        extract_pages=scheduler.extract_pages,
+        is_provisional=is_fallback_rule,
+        manifest=manifest,
+        batch_size=batch_size,
+        page_tokens=scheduler.estimate_tokens,
+        batch_token_budget=scheduler.token_budget,
+        max_batch_pages=scheduler.max_batch_pages
+    )
+    stats = pipeline.run(pages)
+    stats["extraction_cache"] = agent.cache.stats()
+    stats["extraction"] = scheduler.stats()
     
-    print(f"Commit successful. Added {total_rules_committed} new rules to ChromaDB.")
+    print(f"Commit successful. Added {stats['rules_committed']} new rules to ChromaDB "
+          f"({stats['pages_skipped']} unchanged pages skipped, {stats['pages_failed']} failed).")
+    print(f"Extraction cache: {stats['extraction_cache']['hits']} hits, {stats['extraction_cache']['misses']} misses "
+          f"({stats['extraction_cache']['entries']} entries).")
+    extraction = stats["extraction"]
+    print(f"Extraction: {extraction['pages_per_minute']} pages/min, fallback rate {extraction['fallback_rate']:.1%} "
+          f"({extraction['llm_calls']} LLM calls, {extraction['batched_pages']} pages batched, "
+          f"{extraction['retries']} retries, {extraction['throttled']} throttled, "
+          f"final concurrency {extraction['concurrency_limit']}).")
     print(f"\n--- Curation Complete for {city_name} ---")
+    return stats
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extract rules and load them into the database.")
     parser.add_argument("--input", required=True, help="Path to the OCR'd JSON file.")
     parser.add_argument("--city", required=True, help="The name of the city for these rules.")
+    parser.add_argument("--batch-size", type=int, default=None, help="Rules per ChromaDB upsert (default: CHROMA_UPSERT_BATCH_SIZE or 256).")
+    parser.add_argument("--document-id", default=None, help="Source document name in the ingestion manifest (default: the input file name).")
     
     args = parser.parse_args()
-    run_extraction_pipeline(args.input, args.city)
+    run_extraction_pipeline(args.input, args.city, batch_size=args.batch_size, document_id=args.document_id)
 
 
@@ -0,0 +1,137 @@
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from cache_utils import canonical_hash
+
+
+class ExtractionCache:
+    """
+    Disk-backed cache of LLM rule extractions, keyed by (prompt template version, model name,
+    city, page text). Extraction runs at temperature 0, so re-ingesting a document reuses the
+    parsed rule lists instead of paying for the same Gemini calls again.
+
+    Entries can be exported to / imported from gzipped JSONL, so a cache warmed on one machine
+    can be shipped with the Docker image.
+    """
+    def __init__(self, db_path: str = None, max_entries: int = None):
+        if db_path is None:
+            db_path = os.getenv("EXTRACTION_CACHE_DB", "reports/extraction_cache.db")
+        if max_entries is None:
+            max_entries = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "50000"))
+
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS extractions (
+                    key TEXT PRIMARY KEY,
+                    prompt_version TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    rules TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+
+    @staticmethod
+    def make_key(prompt_version: str, model: str, city: str, text: str) -> str:
+        return canonical_hash({"prompt_version": prompt_version, "model": model, "city": city, "text": text})
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute("SELECT rules FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._conn:
+                self._conn.execute("UPDATE extractions SET last_access = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, rules: List[Dict[str, Any]], prompt_version: str, model: str):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO extractions (key, prompt_version, model, rules, created_at, last_access)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (key, prompt_version, model, json.dumps(rules), now, now)
+            )
+            # Size limit: drop the least recently used rows beyond max_entries
+            self._conn.execute(
+                "DELETE FROM extractions WHERE key IN (SELECT key FROM extractions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    # --- Shipping a warmed cache ---
+    def export(self, path: str) -> int:
+        """Writes every entry to gzipped JSONL. Returns the number of entries."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, prompt_version, model, rules, created_at FROM extractions ORDER BY created_at"
+            ).fetchall()
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            for key, prompt_version, model, rules, created_at in rows:
+                f.write(json.dumps({
+                    "key": key, "prompt_version": prompt_version, "model": model,
+                    "rules": json.loads(rules), "created_at": created_at
+                }) + "\n")
+        return len(rows)
+
+    def import_file(self, path: str) -> int:
+        """Loads entries exported by export(); existing keys are kept. Returns the number of new entries."""
+        now = time.time()
+        imported = 0
+        with gzip.open(path, "rt", encoding="utf-8") as f, self._lock, self._conn:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                cursor = self._conn.execute(
+                    """INSERT OR IGNORE INTO extractions (key, prompt_version, model, rules, created_at, last_access)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (entry["key"], entry["prompt_version"], entry["model"], json.dumps(entry["rules"]),
+                     entry.get("created_at", now), now)
+                )
+                imported += cursor.rowcount
+        return imported
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": entries, "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or import the LLM rule extraction cache.")
+    parser.add_argument("action", choices=["export", "import", "stats"])
+    parser.add_argument("path", nargs="?", default="extraction_cache.jsonl.gz", help="Gzipped JSONL file.")
+    args = parser.parse_args()
+
+    cache = ExtractionCache()
+    if args.action == "export":
+        print(f"Exported {cache.export(args.path)} cached extractions to {args.path}.")
+    elif args.action == "import":
+        print(f"Imported {cache.import_file(args.path)} cached extractions from {args.path}.")
+    else:
+        print(json.dumps(cache.stats(), indent=2))
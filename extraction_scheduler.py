@@ -0,0 +1,215 @@
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Error messages that mean "slow down" rather than "this request is broken"
+THROTTLE_MARKERS = ("429", "resource exhausted", "resourceexhausted", "quota", "rate limit", "too many requests",
+                    "timeout", "timed out", "deadline", "503", "unavailable")
+
+
+def is_throttle_error(error: Exception) -> bool:
+    if isinstance(error, TimeoutError):
+        return True
+    message = f"{type(error).__name__} {error}".lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+class AIMDLimiter:
+    """
+    Concurrency limit with additive increase / multiplicative decrease (as in TCP congestion
+    control): +1 slot after a full window of successful calls, halved on a throttling error.
+    """
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32):
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            self.limit = max(self.minimum, self.limit / 2)
+
+
+class ExtractionScheduler:
+    """
+    Sends pages to the rule extraction LLM efficiently.
+
+    * Cached pages and pages too short to hold rules never reach the LLM.
+    * Short pages are packed into one multi-page prompt up to `token_budget` and the returned
+      JSON is split back per page (a malformed batch answer is retried page by page).
+    * Concurrent calls are capped by an AIMD limiter that backs off on 429s and timeouts.
+    * Failed calls are retried with jittered exponential backoff; only then does a page fall
+      back to a raw-text rule.
+
+    `agent` is a RuleExtractionAgent (call_single, call_batch, cached, store, fallback_rules).
+    """
+    def __init__(self, agent, city: str, token_budget: int = None, max_batch_pages: int = None,
+                 min_page_chars: int = 200, max_retries: int = None, backoff_base: float = None,
+                 backoff_cap: float = None, limiter: AIMDLimiter = None):
+        if token_budget is None:
+            token_budget = int(os.getenv("EXTRACTION_BATCH_TOKEN_BUDGET", "6000"))
+        if max_batch_pages is None:
+            max_batch_pages = int(os.getenv("EXTRACTION_BATCH_MAX_PAGES", "8"))
+        if max_retries is None:
+            max_retries = int(os.getenv("EXTRACTION_MAX_RETRIES", "4"))
+        if backoff_base is None:
+            backoff_base = float(os.getenv("EXTRACTION_BACKOFF_BASE_SECONDS", "1"))
+        if backoff_cap is None:
+            backoff_cap = float(os.getenv("EXTRACTION_BACKOFF_CAP_SECONDS", "30"))
+        if limiter is None:
+            limiter = AIMDLimiter(
+                initial=int(os.getenv("EXTRACTION_INITIAL_CONCURRENCY", "4")),
+                maximum=int(os.getenv("EXTRACTION_MAX_CONCURRENCY", "16"))
+            )
+
+        self.agent = agent
+        self.city = city
+        self.token_budget = token_budget
+        self.max_batch_pages = max(1, max_batch_pages)
+        self.min_page_chars = min_page_chars
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.limiter = limiter
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self.counters = {
+            "pages": 0, "short_pages": 0, "cached_pages": 0, "llm_calls": 0, "batched_pages": 0,
+            "retries": 0, "throttled": 0, "fallback_pages": 0
+        }
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    @staticmethod
+    def estimate_tokens(page: Dict[str, Any]) -> int:
+        # ~4 characters per token is close enough for packing decisions
+        return len(page.get('content', '')) // 4
+
+    # --- LLM calls with backoff and AIMD ---
+    def _call_with_retries(self, fn, *args):
+        """Runs an LLM call under the limiter; returns its result, or raises the last error."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.limiter:
+                    self._count("llm_calls")
+                    result = fn(*args)
+                self.limiter.on_success()
+                return result
+            except Exception as e:
+                if is_throttle_error(e):
+                    self._count("throttled")
+                    self.limiter.on_throttle()
+                elif isinstance(e, ValueError):
+                    # Unparseable answer: retrying the identical prompt rarely helps
+                    raise
+                if attempt == self.max_retries:
+                    raise
+                self._count("retries")
+                # Full jitter: spreads retries from concurrent workers apart
+                time.sleep(random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt))))
+
+    def _extract_single(self, page: Dict[str, Any]) -> List[Dict[str, Any]]:
+        text = page.get('content', '')
+        try:
+            rules = self._call_with_retries(self.agent.call_single, text, self.city)
+        except Exception as e:
+            print(f"Extraction failed for page {page.get('page', 0)}. Fallback to Raw Indexing. Error: {e}")
+            self._count("fallback_pages")
+            return self.agent.fallback_rules(self.city)
+        self.agent.store(text, self.city, rules)
+        return rules
+
+    def _extract_group(self, group: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        if len(group) == 1:
+            return [self._extract_single(group[0])]
+        try:
+            by_page = self._call_with_retries(self.agent.call_batch, group, self.city)
+        except ValueError as e:
+            print(f"Batch answer for pages {[p.get('page', 0) for p in group]} could not be split ({e}). Retrying page by page.")
+            return [self._extract_single(page) for page in group]
+        except Exception as e:
+            print(f"Extraction failed for pages {[p.get('page', 0) for p in group]}. Fallback to Raw Indexing. Error: {e}")
+            self._count("fallback_pages", len(group))
+            return [self.agent.fallback_rules(self.city) for _ in group]
+        self._count("batched_pages", len(group))
+        results = []
+        for page in group:
+            rules = by_page[page.get('page', 0)]
+            self.agent.store(page.get('content', ''), self.city, rules)
+            results.append(rules)
+        return results
+
+    # --- Public API ---
+    def extract_pages(self, pages: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Rule lists for `pages`, in order."""
+        self._count("pages", len(pages))
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(pages)
+        pending = []
+        for i, page in enumerate(pages):
+            text = page.get('content', '')
+            if len(text) < self.min_page_chars:
+                self._count("short_pages")
+                results[i] = []
+            elif self.agent.offline_mode:
+                results[i] = self.agent.extract_rules_from_text(text, self.city)
+            else:
+                cached = self.agent.cached(text, self.city)
+                if cached is not None:
+                    self._count("cached_pages")
+                    results[i] = cached
+                else:
+                    pending.append(i)
+
+        # Pack the remaining pages into groups within the token budget
+        group, group_tokens = [], 0
+        groups = []
+        for i in pending:
+            tokens = self.estimate_tokens(pages[i])
+            # Page numbers key the batch answer, so they must be unique within a group
+            duplicate = any(pages[j].get('page', 0) == pages[i].get('page', 0) for j in group)
+            if group and (group_tokens + tokens > self.token_budget or len(group) >= self.max_batch_pages or duplicate):
+                groups.append(group)
+                group, group_tokens = [], 0
+            group.append(i)
+            group_tokens += tokens
+        if group:
+            groups.append(group)
+
+        for group in groups:
+            for i, rules in zip(group, self._extract_group([pages[i] for i in group])):
+                results[i] = rules
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed_minutes = max(time.monotonic() - self.started, 1e-9) / 60
+        with self._lock:
+            c = dict(self.counters)
+        llm_pages = c["pages"] - c["cached_pages"] - c["short_pages"]
+        return dict(
+            c,
+            pages_per_minute=round(c["pages"] / elapsed_minutes, 1),
+            fallback_rate=round(c["fallback_pages"] / llm_pages, 3) if llm_pages else 0.0,
+            concurrency_limit=int(self.limiter.limit)
+        )
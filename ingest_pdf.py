@@ -1,17 +1,30 @@
-import fitz  # PyMuPDF
 import json
 import os
 import argparse
-from tqdm import tqdm
 from extract_rules_ai import run_extraction_pipeline
-import pytesseract
-from PIL import Image
-import io
+from ocr_engine import OCREngine
+from ingestion_manifest import IngestionManifest, document_key
 
-def ingest_pdf(pdf_path, city_name, output_json_path):
+def stream_pages(engine, pdf_path, manifest, doc_id, output_json_path, counts):
     """
-    Reads a PDF, extracts text from each page using Tesseract OCR, 
-    saves as JSON, and triggers the AI extraction pipeline.
+    Yields extracted pages as the OCR engine produces them, recording each in the ingestion
+    manifest and appending it to the intermediate JSON file (so no full-document list is held).
+    """
+    with open(output_json_path, 'w', encoding='utf-8') as f:
+        f.write("[")
+        for page in engine.iter_pages(pdf_path, known_pages=manifest.ocr_cache(doc_id)):
+            manifest.record_text(doc_id, page["page"], page["content"], page["extraction_method"], page["image_hash"])
+            f.write(("\n" if not counts else ",\n") + json.dumps(page, indent=4))
+            counts[page["extraction_method"]] = counts.get(page["extraction_method"], 0) + 1
+            yield page
+        f.write("\n]\n")
+
+def ingest_pdf(pdf_path, city_name, output_json_path, ocr_engine=None):
+    """
+    Reads a PDF, extracts text from each page (embedded text layer first, Tesseract OCR for
+    scanned pages) and streams the pages straight into the AI extraction pipeline, saving
+    them as JSON along the way.
+    `ocr_engine` overrides the default OCREngine (worker count, DPI, Tesseract options).
     """
     print(f"--- Starting Ingestion for {pdf_path} ---")
     
@@ -19,65 +32,31 @@ def ingest_pdf(pdf_path, city_name, output_json_path):
         print(f"Error: PDF not found at {pdf_path}")
         return
 
-    # Robustly find Tesseract
-    tesseract_path = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-    if os.path.exists(tesseract_path):
-        pytesseract.pytesseract.tesseract_cmd = tesseract_path
-    else:
-        # Check standard 32-bit path just in case
-        tesseract_path_x86 = r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe'
-        if os.path.exists(tesseract_path_x86):
-            pytesseract.pytesseract.tesseract_cmd = tesseract_path_x86
-        else:
-             print("[WARNING] Tesseract executable not found in standard paths. Assuming it is in PATH.")
-
-    # 1. Extract Text (via Tesseract OCR)
-    print("Extracting text from PDF pages using Tesseract OCR...")
-    doc = fitz.open(pdf_path)
-    pages_data = []
-    
-    for i, page in enumerate(tqdm(doc, desc="OCR Processing")):
-        # Render page to an image (zoom=2 for better quality)
-        zoom = 2 
-        mat = fitz.Matrix(zoom, zoom)
-        pix = page.get_pixmap(matrix=mat)
-        
-        # Convert to PIL Image
-        img_data = pix.tobytes("png")
-        image = Image.open(io.BytesIO(img_data))
-        
-        # Perform OCR
-        try:
-            text = pytesseract.image_to_string(image)
-        except Exception as e:
-            print(f"OCR Error on page {i}: {e}")
-            text = "" # fallback
-        
-        # Store page number and content
-        pages_data.append({
-            "page": i + 1,
-            "content": text
-        })
-    
-    print(f"Extracted text from {len(pages_data)} pages.")
-    
-    # 2. Save Intermediate JSON
-    print(f"Saving intermediate text data to {output_json_path}...")
-    with open(output_json_path, 'w', encoding='utf-8') as f:
-        json.dump(pages_data, f, indent=4)
-        
-    # 3. Monitor API Key State
+    # 1. Monitor API Key State
     api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
     if not api_key or "YOUR_KEY" in api_key:
         print("\n[WARNING] Valid GEMINI_API_KEY not found. AI extraction will likely fail or produce no rules.")
         print("Please ensure your .env file has a valid key.")
         # We proceed anyway, as the user might want to test the flow, 
         # but the extraction agent will probably return empty results or error out.
+
+    # 2. Extract Text (text layer first, Tesseract OCR fallback, sharded across worker processes)
+    # Scanned pages whose render is unchanged since the last run reuse their manifest OCR text
+    engine = ocr_engine or OCREngine()
+    manifest = IngestionManifest()
+    doc_id = document_key(city_name, pdf_path)
+    manifest.begin_document(doc_id, city_name, pdf_path)
+    print(f"Extracting text from {engine.page_count(pdf_path)} PDF pages ({engine.workers} worker processes), "
+          f"saving intermediate text data to {output_json_path}...")
+    counts = {}
+    pages = stream_pages(engine, pdf_path, manifest, doc_id, output_json_path, counts)
     
-    # 4. Trigger AI Extraction
+    # 3. Trigger AI Extraction (consumes pages as they are extracted)
     print("\n--- Triggering AI Rule Extraction Agent ---")
     try:
-        run_extraction_pipeline(output_json_path, city_name)
+        run_extraction_pipeline(output_json_path, city_name, document_id=pdf_path, manifest=manifest, pages=pages)
+        print(f"Extracted text from {sum(counts.values())} pages ({counts.get('text_layer', 0)} from the text layer, "
+              f"{counts.get('ocr', 0)} via OCR).")
         print("\n--- Ingestion Complete ---")
     except Exception as e:
         print(f"\n[ERROR] Extraction pipeline failed: {e}")
@@ -87,5 +66,17 @@ if __name__ == "__main__":
     DEFAULT_PDF = "io/DCPR_2034.pdf"
     DEFAULT_JSON = "temp_dcr_content.json"
     CITY = "Mumbai"
-    
-    ingest_pdf(DEFAULT_PDF, CITY, DEFAULT_JSON)
+
+    parser = argparse.ArgumentParser(description="OCR a PDF and run the AI rule extraction pipeline on it.")
+    parser.add_argument("--pdf", default=DEFAULT_PDF, help="Path to the input PDF file.")
+    parser.add_argument("--city", default=CITY, help="The name of the city for these rules.")
+    parser.add_argument("--output", default=DEFAULT_JSON, help="Path to the intermediate JSON file.")
+    parser.add_argument("--workers", type=int, default=None, help="OCR worker processes (default: OCR_WORKERS or CPU count).")
+    parser.add_argument("--dpi", type=float, default=None, help="Render resolution for OCR (default: OCR_DPI or 144).")
+    parser.add_argument("--tesseract-config", default=None, help="Extra Tesseract options, e.g. '--oem 1 --psm 6'.")
+    parser.add_argument("--force-ocr", action="store_true", help="OCR every page, ignoring embedded text layers.")
+    args = parser.parse_args()
+
+    engine = OCREngine(workers=args.workers, dpi=args.dpi, tesseract_config=args.tesseract_config,
+                       text_layer_first=False if args.force_ocr else None)
+    ingest_pdf(args.pdf, args.city, args.output, ocr_engine=engine)
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Page status lifecycle: pending (new/changed text) -> extracted (rules parsed) -> committed (rules in Chroma)
+PENDING = "pending"
+EXTRACTED = "extracted"
+COMMITTED = "committed"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def document_key(city: str, source_name: str) -> str:
+    """Manifest id of a source document, e.g. 'Mumbai:DCPR_2034.pdf'."""
+    return f"{city}:{os.path.basename(source_name)}"
+
+
+class IngestionManifest:
+    """
+    Persistent record of what has been ingested, per document and page: the rendered-image hash
+    (OCR'd pages), the page text hash, the extraction result and the rule ids committed from it.
+
+    Lets ingestion skip unchanged pages, resume after a crash (extracted-but-uncommitted pages
+    are not sent to the LLM again) and find rules whose source pages changed or disappeared.
+    """
+    def __init__(self, db_path: str = None):
+        if db_path is None:
+            db_path = os.getenv("INGESTION_MANIFEST_DB", "reports/ingestion_manifest.db")
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    city TEXT NOT NULL,
+                    source_path TEXT,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS pages (
+                    doc_id TEXT NOT NULL,
+                    page INTEGER NOT NULL,
+                    image_hash TEXT,
+                    text_hash TEXT NOT NULL,
+                    extraction_method TEXT,
+                    ocr_text TEXT,
+                    extraction TEXT,
+                    rule_ids TEXT NOT NULL DEFAULT '[]',
+                    status TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (doc_id, page)
+                )"""
+            )
+
+    def begin_document(self, doc_id: str, city: str, source_path: Optional[str] = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (doc_id, city, source_path, updated_at) VALUES (?, ?, ?, ?)",
+                (doc_id, city, source_path, time.time())
+            )
+
+    # --- Text stage ---
+    def ocr_cache(self, doc_id: str) -> Dict[int, Dict[str, str]]:
+        """{page: {"image_hash", "content"}} for OCR'd pages, so unchanged scans skip Tesseract."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT page, image_hash, ocr_text FROM pages WHERE doc_id = ? AND image_hash IS NOT NULL AND ocr_text IS NOT NULL",
+                (doc_id,)
+            ).fetchall()
+        return {page: {"image_hash": image_hash, "content": content} for page, image_hash, content in rows}
+
+    def record_text(self, doc_id: str, page: int, content: str, extraction_method: Optional[str] = None,
+                    image_hash: Optional[str] = None):
+        """Stores a page's text hash; a changed hash sends the page back to `pending`."""
+        new_hash = text_hash(content)
+        ocr_text = content if image_hash else None
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT text_hash FROM pages WHERE doc_id = ? AND page = ?", (doc_id, page)
+            ).fetchone()
+            if row is None:
+                self._conn.execute(
+                    """INSERT INTO pages (doc_id, page, image_hash, text_hash, extraction_method, ocr_text, status, updated_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (doc_id, page, image_hash, new_hash, extraction_method, ocr_text, PENDING, now)
+                )
+            elif row[0] != new_hash:
+                self._conn.execute(
+                    """UPDATE pages SET image_hash = ?, text_hash = ?, extraction_method = ?, ocr_text = ?,
+                       extraction = NULL, status = ?, updated_at = ? WHERE doc_id = ? AND page = ?""",
+                    (image_hash, new_hash, extraction_method, ocr_text, PENDING, now, doc_id, page)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE pages SET image_hash = ?, extraction_method = ?, ocr_text = ? WHERE doc_id = ? AND page = ?",
+                    (image_hash, extraction_method, ocr_text, doc_id, page)
+                )
+
+    def page_state(self, doc_id: str, page: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text_hash, status, extraction, rule_ids FROM pages WHERE doc_id = ? AND page = ?",
+                (doc_id, page)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "text_hash": row[0],
+            "status": row[1],
+            "extraction": json.loads(row[2]) if row[2] is not None else None,
+            "rule_ids": json.loads(row[3])
+        }
+
+    # --- Extraction and commit stages ---
+    def record_extraction(self, doc_id: str, page: int, content: str, rules: List[Dict[str, Any]]):
+        """Stores the parsed rules for a page's current text. Previously committed rule ids are kept until the next commit."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO pages (doc_id, page, text_hash, extraction, status, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (doc_id, page) DO UPDATE SET text_hash = excluded.text_hash,
+                   extraction = excluded.extraction, status = excluded.status, updated_at = excluded.updated_at""",
+                (doc_id, page, text_hash(content), json.dumps(rules), EXTRACTED, now)
+            )
+
+    def record_commit(self, doc_id: str, page: int, rule_ids: List[str], final: bool = True):
+        """
+        Records the rule ids committed from a page. `final=False` (e.g. raw-text fallback rules after
+        an LLM error) keeps the page `pending`, so the next run retries its extraction.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE pages SET rule_ids = ?, status = ?, updated_at = ? WHERE doc_id = ? AND page = ?",
+                (json.dumps(rule_ids), COMMITTED if final else PENDING, time.time(), doc_id, page)
+            )
+
+    def remove_pages(self, doc_id: str, keep_pages: Iterable[int]) -> Set[str]:
+        """Forgets pages of `doc_id` not in `keep_pages` (e.g. dropped from an amended DCPR); returns their rule ids."""
+        keep = set(keep_pages)
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT page, rule_ids FROM pages WHERE doc_id = ?", (doc_id,)).fetchall()
+            removed = [(page, rule_ids) for page, rule_ids in rows if page not in keep]
+            self._conn.executemany(
+                "DELETE FROM pages WHERE doc_id = ? AND page = ?", [(doc_id, page) for page, _ in removed]
+            )
+        return {rule_id for _, rule_ids in removed for rule_id in json.loads(rule_ids)}
+
+    def referenced_rule_ids(self) -> Set[str]:
+        """Rule ids still committed from some page of some document."""
+        with self._lock:
+            rows = self._conn.execute("SELECT rule_ids FROM pages").fetchall()
+        return {rule_id for (rule_ids,) in rows for rule_id in json.loads(rule_ids)}
+
+    def stats(self, doc_id: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM pages WHERE doc_id = ? GROUP BY status", (doc_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,275 @@
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from chroma_client import ChromaDBClient
+from chunker import PageChunker
+from ingestion_manifest import IngestionManifest, text_hash, COMMITTED, EXTRACTED
+from result_cache import ResultCache
+
+# Queue sentinel: the upstream stage has finished
+_DONE = None
+
+
+class StreamingIngestion:
+    """
+    Streaming page -> extraction -> commit pipeline for one source document.
+
+    Pages (e.g. straight from OCREngine.iter_pages) flow through bounded queues into a pool of
+    extraction threads and a single batching DB writer, so the first rules reach ChromaDB
+    within seconds and memory stays flat regardless of document length (a full queue blocks
+    the stage feeding it). The ingestion manifest is consulted and updated page by page.
+
+    Args:
+        extract_pages: list of page dicts -> one list of rule dicts per page (the LLM call).
+        is_provisional: rules for which a page should be retried on the next run (LLM fallbacks).
+        page_tokens / batch_token_budget / max_batch_pages: a worker hands extract_pages as many
+            queued pages as fit the token budget (at most max_batch_pages), so short pages can
+            share one prompt.
+        chunker: splits page text into the chunks stored as Chroma documents (see PageChunker).
+    """
+    def __init__(self, city_name: str, doc_id: str,
+                 extract_pages: Callable[[List[Dict[str, Any]]], List[List[Dict[str, Any]]]],
+                 is_provisional: Callable[[Dict[str, Any]], bool] = lambda rule: False,
+                 manifest: IngestionManifest = None, extraction_workers: int = None, queue_size: int = None,
+                 batch_size: int = None, flush_seconds: float = None, progress_seconds: float = None,
+                 page_tokens: Callable[[Dict[str, Any]], int] = None, batch_token_budget: int = 0,
+                 max_batch_pages: int = 1, chunker: PageChunker = None):
+        if extraction_workers is None:
+            # Upper bound only: ExtractionScheduler's AIMD limiter gates the actual LLM calls
+            extraction_workers = int(os.getenv("INGEST_EXTRACTION_WORKERS", "16"))
+        if queue_size is None:
+            queue_size = int(os.getenv("INGEST_QUEUE_SIZE", "32"))
+        if batch_size is None:
+            batch_size = int(os.getenv("CHROMA_UPSERT_BATCH_SIZE", "256"))
+        if flush_seconds is None:
+            flush_seconds = float(os.getenv("INGEST_FLUSH_SECONDS", "2"))
+        if progress_seconds is None:
+            progress_seconds = float(os.getenv("INGEST_PROGRESS_SECONDS", "5"))
+
+        self.city_name = city_name
+        self.doc_id = doc_id
+        self.extract_pages = extract_pages
+        self.page_tokens = page_tokens or (lambda page: 0)
+        self.batch_token_budget = batch_token_budget
+        self.max_batch_pages = max(1, max_batch_pages)
+        self.chunker = chunker or PageChunker()
+        self.is_provisional = is_provisional
+        self.manifest = manifest or IngestionManifest()
+        self.extraction_workers = max(1, extraction_workers)
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.progress_seconds = progress_seconds
+
+        self._extract_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._commit_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self.db_client: Optional[ChromaDBClient] = None
+        # First fatal error of a stage thread; the other stages keep draining and run() re-raises it
+        self.error: Optional[BaseException] = None
+        self.counters = {
+            "pages_read": 0, "pages_skipped": 0, "pages_resumed": 0, "pages_extracted": 0,
+            "pages_failed": 0, "pages_committed": 0, "rules_committed": 0, "rules_deleted": 0
+        }
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _fail(self, stage: str, error: BaseException):
+        print(f"[ERROR] Ingestion {stage} failed: {error}")
+        with self._lock:
+            if self.error is None:
+                self.error = error
+
+    # --- Stage 2: extraction workers ---
+    def _next_batch(self, carry):
+        """
+        Blocks for one page, then adds already-queued pages while they fit the token budget.
+        Returns (batch, carry, done): a page that did not fit is carried into the next batch,
+        and `done` means the worker took its stop sentinel.
+        """
+        page = carry if carry is not None else self._extract_queue.get()
+        if page is _DONE:
+            return [], None, True
+        batch, tokens = [page], self.page_tokens(page)
+        while len(batch) < self.max_batch_pages:
+            try:
+                page = self._extract_queue.get_nowait()
+            except queue.Empty:
+                break
+            if page is _DONE:
+                return batch, None, True
+            page_tokens = self.page_tokens(page)
+            if tokens + page_tokens > self.batch_token_budget:
+                return batch, page, False
+            batch.append(page)
+            tokens += page_tokens
+        return batch, None, False
+
+    def _extraction_worker(self):
+        carry, done = None, False
+        while not done:
+            batch, carry, done = self._next_batch(carry)
+            # After a fatal error, keep taking pages (so the reader never blocks) without extracting them
+            if not batch or self.error is not None:
+                continue
+            try:
+                results = self.extract_pages(batch)
+            except Exception as e:
+                # The pages stay pending in the manifest and are retried on the next run
+                print(f"Extraction failed for pages {[page.get('page', 0) for page in batch]}: {e}")
+                self._count("pages_failed", len(batch))
+                continue
+            try:
+                for page, rules in zip(batch, results):
+                    # Saved as soon as each call finishes, so a crash does not lose paid-for extractions
+                    self.manifest.record_extraction(self.doc_id, page.get('page', 0), page.get('content', ''), rules)
+                    self._count("pages_extracted")
+                    self._commit_queue.put((page, rules))
+            except Exception as e:
+                self._fail("extraction worker", e)
+
+    # --- Stage 3: batching DB writer ---
+    def _writer(self):
+        try:
+            self._write_batches()
+        except Exception as e:
+            self._fail("writer", e)
+            # Keep draining so the extraction workers and the reader never block on a full queue
+            while self._commit_queue.get() is not _DONE:
+                pass
+
+    def _write_batches(self):
+        self.db_client = ChromaDBClient()
+        committed_ids = set()
+        batch_pages = []
+        batch_items = []
+        last_flush = time.monotonic()
+
+        def flush():
+            # We pass the source chunk as the document content, AND the page number
+            committed = 0
+            if batch_items:
+                committed = self.db_client.add_rules_bulk(
+                    [item["rule"] for item in batch_items],
+                    documents=[item["source_text"] for item in batch_items],
+                    page_numbers=[item["page_number"] for item in batch_items],
+                    batch_size=self.batch_size
+                )
+            if committed < len(batch_items):
+                # Pages stay `extracted`: the next run re-commits them without calling the LLM
+                print(f"[WARNING] Only {committed}/{len(batch_items)} rules were committed. Re-run to resume.")
+            else:
+                committed_ids.update(item["rule"]["id"] for item in batch_items)
+                for page_num, rules, record_ids in batch_pages:
+                    self.manifest.record_commit(
+                        self.doc_id, page_num, record_ids,
+                        final=not any(self.is_provisional(rule) for rule in rules)
+                    )
+                self._count("pages_committed", len(batch_pages))
+                self._count("rules_committed", committed)
+            batch_pages.clear()
+            batch_items.clear()
+
+        while True:
+            try:
+                entry = self._commit_queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                entry = False
+            if entry is _DONE:
+                flush()
+                return
+            if entry:
+                page, rules = entry
+                # One record per structured rule and per raw-text chunk, with the chunk as its document
+                items = [item for item in self.chunker.document_items(page, rules) if item["rule"].get("id")]
+                batch_pages.append((page.get('page', 0), rules, [item["rule"]["id"] for item in items]))
+                batch_ids = {item["rule"]["id"] for item in batch_items}
+                for item in items:
+                    rule_id = item["rule"]["id"]
+                    # De-duplicate: the first page to yield a rule id wins
+                    if rule_id not in committed_ids and rule_id not in batch_ids:
+                        batch_ids.add(rule_id)
+                        batch_items.append(item)
+            if len(batch_items) >= self.batch_size or (batch_pages and time.monotonic() - last_flush >= self.flush_seconds):
+                flush()
+                last_flush = time.monotonic()
+
+    # --- Progress reporting ---
+    def _reporter(self, started: float):
+        while not self._finished.wait(self.progress_seconds):
+            self._print_progress(started)
+
+    def _print_progress(self, started: float):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        with self._lock:
+            c = dict(self.counters)
+        print(
+            f"[{self.city_name}] {elapsed:.0f}s | read {c['pages_read']} ({c['pages_read'] / elapsed * 60:.0f}/min) "
+            f"| extracted {c['pages_extracted']} ({c['pages_extracted'] / elapsed * 60:.0f}/min) "
+            f"| committed {c['pages_committed']} pages, {c['rules_committed']} rules ({c['rules_committed'] / elapsed * 60:.0f}/min) "
+            f"| skipped {c['pages_skipped']}, resumed {c['pages_resumed']}, failed {c['pages_failed']} "
+            f"| queues extract={self._extract_queue.qsize()} commit={self._commit_queue.qsize()}"
+        )
+
+    # --- Stage 1: page reader (runs on the caller's thread) ---
+    def run(self, pages: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        started = time.monotonic()
+        workers = [threading.Thread(target=self._extraction_worker, daemon=True) for _ in range(self.extraction_workers)]
+        writer = threading.Thread(target=self._writer, daemon=True)
+        reporter = threading.Thread(target=self._reporter, args=(started,), daemon=True)
+        for thread in workers + [writer, reporter]:
+            thread.start()
+
+        page_numbers = []
+        # Rules from removed or changed pages are deletion candidates (kept if another page still yields them)
+        stale_candidates = set()
+        try:
+            for page in pages:
+                if self.error is not None:
+                    break
+                page_num = page.get('page', 0)
+                page_numbers.append(page_num)
+                self._count("pages_read")
+                state = self.manifest.page_state(self.doc_id, page_num)
+                if state and state["text_hash"] == text_hash(page.get('content', '')):
+                    if state["status"] == COMMITTED:
+                        self._count("pages_skipped")
+                        continue
+                    if state["status"] == EXTRACTED:
+                        self._count("pages_resumed")
+                        self._commit_queue.put((page, state["extraction"]))
+                        continue
+                if state:
+                    stale_candidates.update(state["rule_ids"])
+                self._extract_queue.put(page)
+        finally:
+            for _ in workers:
+                self._extract_queue.put(_DONE)
+            for thread in workers:
+                thread.join()
+            self._commit_queue.put(_DONE)
+            writer.join()
+            self._finished.set()
+            reporter.join()
+        if self.error is not None:
+            # Pages not yet committed stay pending/extracted in the manifest; a re-run resumes them
+            raise self.error
+
+        # --- Delete rules whose source pages changed or were removed ---
+        stale_candidates |= self.manifest.remove_pages(self.doc_id, page_numbers)
+        stale_rule_ids = stale_candidates - self.manifest.referenced_rule_ids()
+        if stale_rule_ids and self.db_client is not None:
+            deleted = self.db_client.delete_rules(sorted(stale_rule_ids))
+            self._count("rules_deleted", deleted)
+            print(f"Deleted {deleted} stale rules from ChromaDB.")
+
+        # Cached case reports were built from the old rule set
+        if self.counters["rules_committed"] or self.counters["rules_deleted"]:
+            ResultCache().invalidate_rules()
+        self._print_progress(started)
+        return dict(self.counters)
@@ -0,0 +1,244 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from logging_config import logger
+
+# Job lifecycle states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINAL_STATES = {COMPLETED, FAILED, CANCELLED}
+
+
+class JobQueueFullError(Exception):
+    """Raised when the queue already holds `max_queue_depth` pending jobs."""
+
+
+class JobManager:
+    """
+    A small persistent job subsystem for long-running pipeline cases.
+
+    Jobs are written to a SQLite table before they are queued, so a restart
+    re-queues anything that was still pending or running. A fixed pool of
+    worker threads drains the queue and runs `handler(payload)` for each job.
+    """
+    def __init__(self, handler: Callable[[Dict[str, Any]], Dict[str, Any]], db_path: str = None,
+                 max_workers: int = None, max_queue_depth: int = None):
+        if db_path is None:
+            db_path = os.getenv("JOBS_DB_PATH", "reports/jobs.db")
+        if max_workers is None:
+            max_workers = int(os.getenv("JOB_WORKERS", "4"))
+        if max_queue_depth is None:
+            max_queue_depth = int(os.getenv("JOB_QUEUE_MAX", "100"))
+
+        self.handler = handler
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        # Ids cancelled while queued: they stay in `_queue` until a worker pops and skips them,
+        # but no longer count toward the depth limit or anyone's queue position
+        self._cancelled_in_queue = set()
+        self._lock = threading.Lock()
+        self._workers: List[threading.Thread] = []
+        # Set by stop(): workers finish the job in hand but take no new ones, and the last
+        # worker to exit closes the connection (a job still running may need it for its result)
+        self._stopping = threading.Event()
+        self._live_workers = 0
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT
+                )"""
+            )
+
+    # --- Lifecycle ---
+    def start(self):
+        """Re-queues unfinished jobs from a previous run and starts the worker pool."""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING)
+            ).fetchall()
+            # A job that was RUNNING when the process died never finished; run it again.
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?",
+                (QUEUED, RUNNING)
+            )
+        for row in rows:
+            self._queue.put(row["id"])
+        if rows:
+            logger.info(f"Recovered {len(rows)} unfinished jobs from {self.db_path}.")
+
+        self._live_workers = self.max_workers
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"Job queue started with {self.max_workers} workers (max depth {self.max_queue_depth}).")
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Signals the workers to exit once their current job is done. Jobs still queued stay in the
+        table for the next start. Waits up to `timeout` seconds per worker; the connection is
+        closed when the last worker has exited, even if that is after this returns.
+        """
+        self._stopping.set()
+        for _ in self._workers:
+            self._queue.put(None)  # wakes idle workers
+        for worker in self._workers:
+            worker.join(timeout=timeout)
+        running = sum(worker.is_alive() for worker in self._workers)
+        self._workers = []
+        with self._lock:
+            if self._live_workers == 0:
+                self._conn.close()
+        if running:
+            logger.warning(f"{running} job workers are still finishing their jobs after {timeout}s.")
+
+    # --- Public API ---
+    def submit(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Persists a new job and queues it. Raises JobQueueFullError when the queue is saturated."""
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            if self._pending_locked() >= self.max_queue_depth:
+                raise JobQueueFullError(f"Job queue is full ({self.max_queue_depth} pending jobs).")
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO jobs (id, status, payload, created_at) VALUES (?, ?, ?, ?)",
+                    (job_id, QUEUED, json.dumps(payload), _now())
+                )
+            self._queue.put(job_id)
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the job record (including the final report once completed), or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            position = self._queue_position(job_id) if row and row["status"] == QUEUED else None
+        if row is None:
+            return None
+        job = {
+            "job_id": row["id"],
+            "status": row["status"],
+            "cancel_requested": bool(row["cancel_requested"]),
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "error": row["error"],
+            "result": json.loads(row["result"]) if row["result"] else None
+        }
+        if position is not None:
+            job["queue_position"] = position
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancels a job. Queued jobs are cancelled immediately; a running job is
+        flagged and its result is discarded when the handler returns.
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["status"] == QUEUED:
+                self._cancelled_in_queue.add(job_id)
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, cancel_requested = 1, finished_at = ? WHERE id = ?",
+                    (CANCELLED, _now(), job_id)
+                )
+            elif row["status"] == RUNNING:
+                self._conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+        return self.get(job_id)
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return self._pending_locked()
+
+    # --- Internals ---
+    def _pending_locked(self) -> int:
+        return self._queue.qsize() - len(self._cancelled_in_queue)
+
+    def _queue_position(self, job_id: str) -> Optional[int]:
+        # queue.Queue keeps its items in a deque; peeking is safe under its own mutex.
+        with self._queue.mutex:
+            pending = [queued_id for queued_id in self._queue.queue if queued_id not in self._cancelled_in_queue]
+        return pending.index(job_id) if job_id in pending else None
+
+    def _worker_loop(self):
+        try:
+            while not self._stopping.is_set():
+                job_id = self._queue.get()
+                if job_id is None or self._stopping.is_set():
+                    break  # a job popped while stopping is still QUEUED in the table
+                try:
+                    self._run_job(job_id)
+                except Exception as e:
+                    logger.error(f"Job worker crashed on job {job_id}: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._live_workers -= 1
+                if self._live_workers == 0 and self._stopping.is_set():
+                    self._conn.close()
+
+    def _run_job(self, job_id: str):
+        with self._lock, self._conn:
+            self._cancelled_in_queue.discard(job_id)
+            row = self._conn.execute("SELECT status, payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row["status"] != QUEUED:
+                # Cancelled (or otherwise finished) while waiting in the queue.
+                return
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ? WHERE id = ?",
+                (RUNNING, _now(), job_id)
+            )
+        payload = json.loads(row["payload"])
+        logger.info(f"Job {job_id} started for case {payload.get('case_id')}.")
+
+        result, error = None, None
+        try:
+            result = self.handler(payload)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            error = str(e)
+
+        with self._lock, self._conn:
+            cancel_requested = self._conn.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()["cancel_requested"]
+            if cancel_requested:
+                status, result = CANCELLED, None
+            else:
+                status = FAILED if error else COMPLETED
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, _now(), job_id)
+            )
+        logger.info(f"Job {job_id} finished with status '{status}'.")
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
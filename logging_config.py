@@ -1,8 +1,15 @@
 import logging
 import json
 import os
+import contextvars
 from datetime import datetime
 
+# Trace/span ids (and the case) of the work currently running in this context
+# (set by metrics.trace / metrics.span)
+current_trace_id = contextvars.ContextVar("current_trace_id", default=None)
+current_span_id = contextvars.ContextVar("current_span_id", default=None)
+current_case_id = contextvars.ContextVar("current_case_id", default=None)
+
 class JsonFormatter(logging.Formatter):
     """
     Custom formatter to output log records as structured JSON.
@@ -16,6 +23,14 @@ class JsonFormatter(logging.Formatter):
             "message": record.getMessage(),
             "source": record.name
         }
+        # Attach the active trace/span so every record of a case can be grouped together
+        trace_id = current_trace_id.get()
+        if trace_id:
+            log_record["trace_id"] = trace_id
+            log_record["span_id"] = current_span_id.get()
+            case_id = current_case_id.get()
+            if case_id:
+                log_record["case_id"] = case_id
         # If the log call includes 'extra' data, add it to the record
         if hasattr(record, 'extra_data'):
             log_record.update(record.extra_data)
@@ -2,7 +2,7 @@ import json
 import os
 import uvicorn
 from fastapi import FastAPI, HTTPException, Response, Request
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, StreamingResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
@@ -15,7 +15,12 @@ import uuid
 # --- Import our logger, the NEW MCP Client, and the pipeline logic ---
 from logging_config import logger
 from mcp_client import MCPClient
-from main_pipeline import process_case_logic
+from main_pipeline import cached_process_case, run_case_batch, stream_case_logic
+from job_queue import JobManager, JobQueueFullError, TERMINAL_STATES
+from result_cache import ResultCache
+from model_registry import ModelRegistry, ModelVersion
+from metrics import registry as metrics_registry
+from component_loader import ComponentLoader
 # Removed Rule import as we are no longer using SQLAlchemy
 
 # --- 3. Data Models for API (The "Contract") ---
@@ -67,10 +72,25 @@ class SystemState:
     def __init__(self):
         self.mcp_client: MCPClient = None
         self.llm = None
-        self.rl_agent = None
+        # The active RL agent and its checkpoint version, swapped as one value on hot-reload
+        self.rl_model: ModelVersion = None
+        self.model_registry: ModelRegistry = None
+        self.result_cache: ResultCache = None
+        self.job_manager: JobManager = None
+        # Per-component readiness; the components load concurrently in the background
+        self.components = ComponentLoader()
         # The other agents are now stateless and will be created in the pipeline
+        # True once every component has settled and the job queue is running (full pipeline available)
         self.is_initialized = False
 
+    @property
+    def rl_agent(self):
+        return self.rl_model.agent if self.rl_model else None
+
+    @property
+    def rl_model_version(self):
+        return self.rl_model.version if self.rl_model else None
+
 state = SystemState()
 
 # --- 5. WebSocket & Logging Infrastructure (Real-Time Updates) ---
@@ -109,9 +129,9 @@ class WebSocketLogHandler(logging.Handler):
     """Intercepts standard logs and pushes them to the WebSocket manager."""
     def emit(self, record):
         try:
-            # Filter out noise (boring logs)
+            # Filter out noise (boring logs and latency spans)
             msg = record.getMessage()
-            if "Received /" in msg or "Input Parameters" in msg:
+            if "Received /" in msg or "Input Parameters" in msg or getattr(record, 'type', None) == 'span':
                  return
             
             # Use explicit type if provided in extra={'type': '...'}
@@ -158,40 +178,90 @@ async def startup_event():
     logger.addHandler(ws_handler)
     
     # 2. Init AI Models
-    from langchain_google_genai import ChatGoogleGenerativeAI
-    
     load_dotenv()
-    os.environ["GOOGLE_API_KEY"] = os.getenv("GEMINI_API_KEY")
+    if os.getenv("GEMINI_API_KEY"):
+        os.environ["GOOGLE_API_KEY"] = os.getenv("GEMINI_API_KEY")
 
-    state.mcp_client = MCPClient()
-    
-    try:
-        if not os.getenv("GEMINI_API_KEY"):
-            logger.warning("GEMINI_API_KEY not found in .env. AI features will be disabled.")
-            state.llm = None
-        else:
-            state.llm = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
-                google_api_key=os.getenv("GEMINI_API_KEY"),
-                max_retries=3,
-                request_timeout=60
-            )
-    except Exception as e:
-        logger.error(f"Failed to initialize LLM: {e}")
-        state.llm = None
+    # Loaded concurrently on background threads: /get_rules is served as soon as the rule DB
+    # is up, while the pipeline endpoints wait for everything (see /ready for progress)
+    state.components.register("rule_db", MCPClient, on_ready=lambda client: setattr(state, "mcp_client", client))
+    state.components.register("llm", load_llm, on_ready=lambda llm: setattr(state, "llm", llm))
+    # The RL checkpoint is then watched and hot-reloaded when retraining rewrites it
+    state.model_registry = ModelRegistry(RL_CHECKPOINT, load_rl_agent, on_swap=set_rl_model)
+    state.components.register("rl_agent", state.model_registry.load)
+    state.components.start()
+    asyncio.create_task(finish_startup())
+    logger.info("Real-Time Logging initialized; components loading in the background.")
+
+def load_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    if not os.getenv("GEMINI_API_KEY"):
+        raise RuntimeError("GEMINI_API_KEY not found in .env. AI features will be disabled.")
+    return ChatGoogleGenerativeAI(
+        model="gemini-2.5-flash",
+        google_api_key=os.getenv("GEMINI_API_KEY"),
+        max_retries=3,
+        request_timeout=60
+    )
+
+RL_CHECKPOINT = "rl_env/ppo_hirl_agent.zip"
+
+def load_rl_agent(checkpoint: str = RL_CHECKPOINT):
+    # RL_POLICY_BACKEND: "table" (precomputed lookup, default), "numpy" (torch-free actor) or "sb3"
+    backend = os.getenv("RL_POLICY_BACKEND", "table")
+    if backend == "table":
+        try:
+            from rl_env.policy_table import PolicyTable
+            return PolicyTable.load(checkpoint)
+        except Exception as e:
+            logger.warning(f"RL lookup table unavailable, running the policy network instead: {e}")
+            backend = "numpy"
+    if backend == "numpy":
+        try:
+            from rl_env.numpy_policy import NumpyPolicy
+            return NumpyPolicy.load(checkpoint)
+        except Exception as e:
+            logger.warning(f"NumPy policy unavailable, loading the SB3 checkpoint instead: {e}")
+    from stable_baselines3 import PPO
+    return PPO.load(checkpoint)
+
+def set_rl_model(model: ModelVersion):
+    """ModelRegistry swap hook: one attribute assignment, so in-flight requests keep the model they read."""
+    state.rl_model = model
+    # A checkpoint that appears after a failed startup load makes the component ready in /ready
+    state.components.mark_recovered("rl_agent")
+    if state.result_cache is not None:
+        state.result_cache.invalidate_model(model.version)
+
+async def finish_startup():
+    """Once every component has settled (loaded or failed), opens the pipeline endpoints and job queue."""
+    await asyncio.to_thread(state.components.wait)
+    # Watch for new checkpoints even if the first load failed (e.g. no checkpoint trained yet)
+    state.model_registry.start()
+    if not state.components.is_ready("rule_db"):
+        logger.error("Rule DB failed to load; pipeline endpoints stay unavailable.")
+        return
+
+    # Reports cached under a different checkpoint are stale once a model is loaded
+    state.result_cache = ResultCache()
+    state.result_cache.invalidate_model(state.rl_model_version)
 
-    try:
-        from stable_baselines3 import PPO
-        state.rl_agent = PPO.load("rl_env/ppo_hirl_agent.zip")
-    except Exception as e:
-        logger.error(f"Failed to load RL agent: {e}")
-        state.rl_agent = None
-    
     state.is_initialized = True
-    logger.info("All components and Real-Time Logging initialized.")
+
+    # 3. Start the background job queue (re-queues jobs left over from a previous run)
+    state.job_manager = JobManager(handler=lambda payload: cached_process_case(payload, state))
+    state.job_manager.start()
+    logger.info(f"All components initialized: {state.components.status()}")
 
 @app.on_event("shutdown")
 def shutdown_event():
+    if state.model_registry:
+        state.model_registry.stop()
+    if state.job_manager:
+        state.job_manager.stop()
+    if state.result_cache:
+        state.result_cache.close()
     if state.mcp_client:
         state.mcp_client.close()
 
@@ -214,7 +284,7 @@ def run_case_endpoint(case_input: CaseInput):
         logger.error("System state is not initialized.")
         raise HTTPException(status_code=503, detail="System is initializing. Please try again.")
     try:
-        result = process_case_logic(case_input.dict(), state)
+        result = cached_process_case(case_input.dict(), state)
         logger.info(f"Case {case_input.case_id} processed successfully.")
         return result
     except Exception as e:
@@ -222,10 +292,96 @@ def run_case_endpoint(case_input: CaseInput):
         # Return the actual error message to the frontend for debugging
         raise HTTPException(status_code=500, detail=f"Pipeline Error: {str(e)}")
 
-@app.post("/feedback", summary="Submit feedback for a processed case")
-def feedback_endpoint(feedback: FeedbackInput):
+@app.post("/run_case/stream", summary="Run a single case, streaming the AI report as Server-Sent Events")
+def run_case_stream_endpoint(case_input: CaseInput):
+    """
+    Emits an `event: report` with the deterministic results first, then `event: token`
+    chunks of the markdown analysis, and finally `event: done` with the complete report.
+    """
+    logger.info(f"Received /run_case/stream request for case {case_input.case_id}")
+    if not state.is_initialized:
+        raise HTTPException(status_code=503, detail="System is initializing. Please try again.")
+
+    def event_stream():
+        try:
+            for event, data in stream_case_logic(case_input.dict(), state):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            logger.info(f"Case {case_input.case_id} streamed successfully.")
+        except Exception as e:
+            logger.error(f"Error in /run_case/stream: {e}", exc_info=True)
+            yield f"event: error\ndata: {json.dumps({'detail': f'Pipeline Error: {str(e)}'})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/run_cases", summary="Run the pipeline for a portfolio of cases, streaming NDJSON results")
+def run_cases_endpoint(case_inputs: List[CaseInput]):
+    logger.info(f"Received /run_cases request for {len(case_inputs)} cases")
+    if not state.is_initialized:
+        raise HTTPException(status_code=503, detail="System is initializing. Please try again.")
+    max_batch = int(os.getenv("MAX_BATCH_CASES", "500"))
+    if len(case_inputs) > max_batch:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(case_inputs)} cases (max {max_batch}).")
+    cases = [case_input.dict() for case_input in case_inputs]
+    return StreamingResponse(run_case_batch(cases, state), media_type="application/x-ndjson")
+
+@app.post("/jobs", status_code=202, summary="Queue a case for asynchronous processing")
+def submit_job(case_input: CaseInput):
     if not state.is_initialized:
+        raise HTTPException(status_code=503, detail="System is initializing. Please try again.")
+    try:
+        job = state.job_manager.submit(case_input.dict())
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    logger.info(f"Queued job {job['job_id']} for case {case_input.case_id}")
+    return job
+
+@app.get("/jobs/{job_id}", summary="Get the status (and final report, once done) of a queued case")
+def get_job(job_id: str):
+    if not state.job_manager:
         raise HTTPException(status_code=503, detail="System is initializing.")
+    job = state.job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@app.delete("/jobs/{job_id}", summary="Cancel a queued or running case")
+def cancel_job(job_id: str):
+    if not state.job_manager:
+        raise HTTPException(status_code=503, detail="System is initializing.")
+    job = state.job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@app.websocket("/ws/jobs/{job_id}")
+async def job_websocket(websocket: WebSocket, job_id: str):
+    """Pushes the job record whenever its status changes, then closes once the job is finished."""
+    await websocket.accept()
+    last_status = None
+    try:
+        while True:
+            job = state.job_manager.get(job_id) if state.job_manager else None
+            if job is None:
+                await websocket.send_text(json.dumps({"job_id": job_id, "status": "not_found"}))
+                break
+            if job["status"] != last_status:
+                last_status = job["status"]
+                await websocket.send_text(json.dumps(job))
+            if job["status"] in TERMINAL_STATES:
+                break
+            await asyncio.sleep(1.0)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+@app.post("/feedback", summary="Submit feedback for a processed case")
+def feedback_endpoint(feedback: FeedbackInput):
+    if not state.components.is_ready("rule_db"):
+        raise HTTPException(status_code=503, detail="Rule database is initializing.")
     try:
         # Correctly use the MCP Client to handle feedback
         feedback_record = state.mcp_client.add_feedback(feedback.dict())
@@ -235,6 +391,36 @@ def feedback_endpoint(feedback: FeedbackInput):
         logger.error(f"Error in /feedback: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Could not save feedback.")
 
+@app.get("/ready", summary="Readiness of each startup component, with its load time")
+def ready_endpoint(response: Response):
+    """200 once the full pipeline is available, 503 while components are still loading (or the rule DB failed)."""
+    if not state.is_initialized:
+        response.status_code = 503
+    return {"ready": state.is_initialized, "components": state.components.status()}
+
+@app.get("/rl_model", summary="Active and previous RL model versions and the checkpoint watcher status")
+def rl_model_endpoint():
+    if state.model_registry is None:
+        raise HTTPException(status_code=503, detail="RL model registry is initializing.")
+    return state.model_registry.status()
+
+@app.post("/rl_model/rollback", summary="Re-activate the previously loaded RL model version")
+def rl_model_rollback_endpoint():
+    if state.model_registry is None:
+        raise HTTPException(status_code=503, detail="RL model registry is initializing.")
+    try:
+        state.model_registry.rollback()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return state.model_registry.status()
+
+@app.get("/metrics", summary="Prometheus metrics: per-stage latency histograms and p50/p95/p99")
+def metrics_endpoint():
+    gauges = {}
+    if state.job_manager:
+        gauges["compliance_job_queue_depth"] = state.job_manager.queue_depth()
+    return PlainTextResponse(metrics_registry.render_prometheus(gauges), media_type="text/plain; version=0.0.4")
+
 @app.get("/logs/{case_id}", summary="Get all agent logs for a specific case_id")
 def logs_endpoint(case_id: str) -> List[Dict[str, Any]]:
     log_file = "reports/agent_log.jsonl"
@@ -254,8 +440,8 @@ def logs_endpoint(case_id: str) -> List[Dict[str, Any]]:
 
 @app.get("/get_rules", summary="Fetches parsed rule JSON for a given city")
 def get_rules(city: str) -> List[Dict[str, Any]]:
-    if not state.is_initialized:
-        raise HTTPException(status_code=503, detail="System is initializing.")
+    if not state.components.is_ready("rule_db"):
+        raise HTTPException(status_code=503, detail="Rule database is initializing.")
     try:
         # Use the MCP Client to query rules for the city
         # We pass an empty parameters dict to get all rules for the city
@@ -1,130 +1,84 @@
 import json
 import os
+import concurrent.futures
+import time
 import numpy as np
 import re
 from stl import mesh
 from datetime import datetime
-import torch
 from langchain_core.prompts import PromptTemplate
 from logging_config import logger
+from metrics import span, trace, submit_in_context
 
-def process_case_logic(case_data, system_state):
+# Heading of the placeholder report used when the LLM call fails; such reports are never cached
+LLM_ERROR_HEADING = "### ⚠️ AI Analysis Unavailable"
+LLM_SKIPPED_REPORT = "### AI Analysis Skipped\n\nReason: `GEMINI_API_KEY` is missing. Please configure it to receive detailed regulatory analysis."
+
+# Actions: 0=Reject, 1=Low Density, 2=Medium, 3=High, 4=Premium
+RL_STRATEGIES = {
+    0: "RESTRICTED Development (Plot potentially undersized or location sensitive)",
+    1: "LOW DENSITY Residential (Basic FSI ~1.0)",
+    2: "MEDIUM DENSITY (Standard FSI ~1.5 - 2.0)",
+    3: "HIGH DENSITY (Mid-High Rise, FSI ~2.5 - 3.0)",
+    4: "PREMIUM / TALL BUILDING (High Rise, FSI > 3.0, Maximize TDR)"
+}
+
+def build_rl_observation(parameters):
+    """Maps case parameters to the PPO observation [plot_size, location(0-2), road_width]."""
+    location_map = {"urban": 0, "suburban": 1, "rural": 2}
+    return np.array([
+        parameters.get("plot_size", 0),
+        location_map.get(parameters.get("location", "urban"), 0),
+        parameters.get("road_width", 0)
+    ]).astype(np.float32)
+
+def predict_rl_actions(observations, rl_agent):
     """
-    This is the core pipeline logic, refactored to use the MCPClient as the single source of truth.
+    Runs the PPO policy on a stacked (n, 3) batch of observations in a single forward pass.
+    Returns (actions, action_probabilities) as NumPy arrays of shape (n,) and (n, n_actions).
     """
-    # --- A. Unpack Inputs ---
-    project_id = case_data.get("project_id", "default_project")
-    case_id = case_data.get("case_id")
-    city = case_data.get("city")
-    parameters = case_data.get("parameters", {})
-    
-    # Extract Detailed Parameters
-    plot_size = float(parameters.get("plot_size", 0))
-    road_width = parameters.get("road_width")
-    location = parameters.get("location")
-    zoning = parameters.get("zoning", "Not Specified")
-    proposed_use = parameters.get("proposed_use", "Not Specified")
-    building_height = parameters.get("building_height", "Not Specified")
+    if hasattr(rl_agent, "predict_actions"):
+        # NumpyPolicy (torch-free forward pass) or PolicyTable (precomputed lookup)
+        return rl_agent.predict_actions(observations)
+    import torch
+    observations = np.asarray(observations, dtype=np.float32).reshape(-1, 3)
+    obs_tensor = torch.as_tensor(observations, device=rl_agent.device)
+    with torch.no_grad():
+        distribution = rl_agent.policy.get_distribution(obs_tensor)
+        probabilities = distribution.distribution.probs.cpu().numpy()
+    # Deterministic prediction is the mode of the categorical distribution
+    actions = probabilities.argmax(axis=1)
+    return actions, probabilities
 
-    # Extract Advanced Constraints
-    asr_rate = float(parameters.get("asr_rate", 0))
-    plot_deductions = float(parameters.get("plot_deductions", 0))
-    
-    # Pre-calculate Net Area
-    net_plot_area = max(0, plot_size - plot_deductions)
+def current_rl_model(system_state):
+    """
+    (agent, model_version) read in one go: the model registry hot-swaps both as a single value,
+    so a reload mid-request cannot pair one checkpoint's decision with another's version.
+    """
+    model = getattr(system_state, "rl_model", None)
+    if model is not None:
+        return model.agent, model.version
+    return getattr(system_state, "rl_agent", None), getattr(system_state, "rl_model_version", None)
 
-    logger.info(f"Processing case {case_id} for project {project_id}.")
-    
-    # --- B. Query MCP for Hard Facts ---
-    logger.info("Accessing VectorDB (Chroma)... Searching 'DCPR 2034 FSI Rules'...", extra={"type": "rag"})
+def retrieval_key(city, parameters):
+    """Cases sharing this key get identical rules from MCPClient.query_rules."""
+    return (
+        city,
+        parameters.get("road_width"),
+        float(parameters.get("plot_size", 0)),
+        parameters.get("location")
+    )
+
+def query_case_rules(city, parameters, system_state):
+    """Queries the MCP for the rules matching a case's retrieval parameters."""
     db_parameters = {
-        "road_width_m": road_width,
-        "plot_area_sqm": plot_size,
-        "location": location
+        "road_width_m": parameters.get("road_width"),
+        "plot_area_sqm": float(parameters.get("plot_size", 0)),
+        "location": parameters.get("location")
     }
-    matching_rules = system_state.mcp_client.query_rules(city, db_parameters)
-    logger.info(f"Found {len(matching_rules)} Relevant Regulation Chunks (Score: 0.89).", extra={"type": "rag"})
-    
-    # Extract both structured entitlements and raw text notes for the LLM
-    context_data = []
-    seen_context_signatures = set()
-
-    if matching_rules:
-        for rule in matching_rules:
-            item = {}
-            if rule.get("entitlements"):
-                item["entitlements"] = rule["entitlements"]
-            if rule.get("notes"):
-                # Truncate to prevent context overflow with full-page text
-                full_text = rule["notes"]
-                item["raw_text_excerpt"] = full_text[:3000] + "..." if len(full_text) > 3000 else full_text
-            if rule.get("conditions"):
-                item["applicability_conditions"] = rule["conditions"]
-            
-            # Add citation info
-            if "page_number" in rule:
-                item["source_page"] = rule["page_number"]
-            
-            # Create a signature to detect duplicates
-            # Use raw_text_excerpt as the primary key for uniqueness if present, 
-            # otherwise fallback to full item dump
-            signature = item.get("raw_text_excerpt", json.dumps(item, sort_keys=True))
-            
-            if signature not in seen_context_signatures:
-                seen_context_signatures.add(signature)
-                context_data.append(item)
-
-    # --- C. Run RL Agent (Moved Before LLM) ---
-    rl_optimal_action = -1
-    rl_recommendation_text = "Analysis pending."
-    confidence_score = 0.0
-    
-    if system_state.rl_agent:
-        try:
-            location_map = {"urban": 0, "suburban": 1, "rural": 2}
-            rl_state_np = np.array([parameters.get("plot_size",0), location_map.get(parameters.get("location", "urban"),0), parameters.get("road_width",0)]).astype(np.float32)
-            
-            logger.info("RL Agent 'Policy_Pro' Activated.", extra={"type": "rl"})
-            logger.info(f"Observation State: {rl_state_np.tolist()}", extra={"type": "rl"})
-            logger.info("Policy Network Evaluating 5 Development Strategies...", extra={"type": "rl"})
-            action, _ = system_state.rl_agent.predict(rl_state_np, deterministic=True)
-            rl_optimal_action = int(action)
-            
-            # Map Action to Strategy Name for LLM
-            # Actions: 0=Reject, 1=Low Density, 2=Medium, 3=High, 4=Premium
-            strategies = {
-                0: "RESTRICTED Development (Plot potentially undersized or location sensitive)",
-                1: "LOW DENSITY Residential (Basic FSI ~1.0)",
-                2: "MEDIUM DENSITY (Standard FSI ~1.5 - 2.0)",
-                3: "HIGH DENSITY (Mid-High Rise, FSI ~2.5 - 3.0)",
-                4: "PREMIUM / TALL BUILDING (High Rise, FSI > 3.0, Maximize TDR)"
-            }
-            rl_recommendation_text = strategies.get(rl_optimal_action, "Standard Development")
-            logger.info(f">>> OPTIMAL ACTION: {rl_recommendation_text.split('(')[0].strip()} (Confidence 90%)", extra={"type": "rl"})
+    return system_state.mcp_client.query_rules(city, db_parameters)
 
-            rl_state_tensor = torch.as_tensor(rl_state_np, device=system_state.rl_agent.device).reshape(1, -1)
-            distribution = system_state.rl_agent.policy.get_distribution(rl_state_tensor)
-            action_probabilities = distribution.distribution.probs.detach().cpu().numpy()[0]
-            raw_rl_confidence = float(action_probabilities[rl_optimal_action])
-            
-            # Base confidence from RL
-            confidence_score = 0.5 + (raw_rl_confidence * 0.4) 
-            
-        except Exception as e:
-            logger.warning(f"RL Prediction failed: {e}")
-            rl_recommendation_text = "RL Analysis Unavailable"
-    else:
-        rl_recommendation_text = "RL Agent Not Loaded"
-
-    # --- D. Use the LLM to Explain the Facts ---
-    logger.info("LLM extracting specific constraints from Page 45, 87...", extra={"type": "llm"})
-    
-    if system_state.llm:
-        try:
-            # ... (LLM Context and Prompt setup - assume unchanged) ...
-            context_for_llm = f"The following rules were retrieved from the master database:\n\n{json.dumps(context_data, indent=2)}"
-            
-            prompt = PromptTemplate.from_template(
+CONSULTANT_PROMPT = PromptTemplate.from_template(
                 """You are a professional AI consultant specializing in the detailed analysis of municipal development regulations. Your task is to act as an expert consultant and provide a comprehensive, clear, and actionable report based on the provided context and the user's query.
 
                 **Your final output MUST be a well-structured Markdown report.** Use the following format precisely:
@@ -149,7 +103,7 @@ def process_case_logic(case_data, system_state):
                 [Based on the rules found in the <context>, provide a high-level summary. IMPORTANT: If exact zoning rules are missing for the specific parameters, infer the most likely scenario (e.g., assume Residential Zone in Suburbs) and provide a "likely" analysis based on the raw text found.]
                 
                 **Citations:**
-                [For every rule or regulation mentioned, you MUST cite the specific Rule Name and Page Number if available in the context (e.g., "Page 45, Table 12").]
+                [For every rule or regulation mentioned, you MUST cite the specific Rule Name, Clause and Page Number if available in the context (e.g., "Page 45, Clause 15.4.1, Table 12").]
 
                 #### **2. Entitlements & Calculations**
                 [Using the rules from the <context>, detail the specific entitlements. Perform calculations for FSI and BUA based on the **Net Plot Area** of {net_plot_area} sq. m.]
@@ -178,88 +132,203 @@ def process_case_logic(case_data, system_state):
                 **User Query Parameters (for your reference):**
                 {input}
                 """
-            )
-            
-            llm_chain = prompt | system_state.llm
+)
+
+def build_context_data(matching_rules):
+    """Turns retrieved rules into de-duplicated LLM context items (entitlements, excerpts, citations)."""
+    # Extract both structured entitlements and raw text notes for the LLM
+    context_data = []
+    seen_context_signatures = set()
+
+    if matching_rules:
+        for rule in matching_rules:
+            item = {}
+            if rule.get("entitlements"):
+                item["entitlements"] = rule["entitlements"]
+            if rule.get("notes"):
+                # Raw text arrives as clause-level chunks; the cap guards records ingested before chunking
+                full_text = rule["notes"]
+                item["raw_text_excerpt"] = full_text[:3000] + "..." if len(full_text) > 3000 else full_text
+            if rule.get("conditions"):
+                item["applicability_conditions"] = rule["conditions"]
             
-            # --- Financial & Premium FSI Pre-calculation ---
-            inferred_premium_fsi = 0.3 if (city and city in ["Pune", "Mumbai", "Nashik"]) else 0.0
+            # Add citation info
+            if "page_number" in rule:
+                item["source_page"] = rule["page_number"]
+            if rule.get("clause"):
+                item["source_clause"] = rule["clause"]
             
-            # If rules found a specific Premium FSI, use that instead (future improvement)
-            # For now, we stick to the inferred default if context is missing specific numeric data
+            # Create a signature to detect duplicates
+            # Use raw_text_excerpt as the primary key for uniqueness if present, 
+            # otherwise fallback to full item dump
+            signature = item.get("raw_text_excerpt", json.dumps(item, sort_keys=True))
             
-            premium_fsi_area = net_plot_area * inferred_premium_fsi
-            estimated_cost = 0.5 * asr_rate * premium_fsi_area if asr_rate > 0 else 0
+            if signature not in seen_context_signatures:
+                seen_context_signatures.add(signature)
+                context_data.append(item)
+    return context_data
+
+def run_rl_stage(parameters, system_state, rl_result=None):
+    """Returns (optimal_action, recommendation_text, confidence_score, model_version) for a case."""
+    rl_optimal_action = -1
+    rl_recommendation_text = "Analysis pending."
+    confidence_score = 0.0
+    rl_agent, rl_model_version = current_rl_model(system_state)
+    
+    if rl_result is not None or rl_agent:
+        try:
+            logger.info("RL Agent 'Policy_Pro' Activated.", extra={"type": "rl"})
+            if rl_result is None:
+                rl_state_np = build_rl_observation(parameters)
+                logger.info(f"Observation State: {rl_state_np.tolist()}", extra={"type": "rl"})
+                logger.info("Policy Network Evaluating 5 Development Strategies...", extra={"type": "rl"})
+                actions, probabilities = predict_rl_actions(rl_state_np, rl_agent)
+                rl_result = (actions[0], probabilities[0], rl_model_version)
+            action, action_probabilities, rl_model_version = rl_result
+            rl_optimal_action = int(action)
             
-            # Format cost string
-            if estimated_cost > 0:
-                cost_str = f"₹{estimated_cost:,.2f} (Estimated at 50% of ASR per sq.m)"
-            else:
-                cost_str = "N/A (ASR Rate missing)"
-
-            # Prepare inputs for the LLM
-            llm_inputs = {
-                "context": context_for_llm,
-                "input": json.dumps(parameters),
-                "current_date": datetime.utcnow().strftime('%B %d, %Y'),
-                "plot_size": f'{parameters.get("plot_size", "N/A")} sq. m.',
-                "location": parameters.get("location", "N/A"),
-                "road_width": f'{parameters.get("road_width", "N/A")} m.',
-                "zoning": zoning,
-                "proposed_use": proposed_use,
-                "building_height": building_height,
-                "net_plot_area": net_plot_area,
-                "asr_rate": asr_rate,
-                "plot_deductions": plot_deductions,
-                "rl_recommendation": rl_recommendation_text,
-                "inferred_premium_fsi": inferred_premium_fsi,
-                "premium_fsi_area": f"{premium_fsi_area:.2f} sq.m",
-                "estimated_premium_cost": cost_str
-            }
-
-            # DEBUG: Write the full prompt to a file
-            try:
-                full_prompt = prompt.format(**llm_inputs)
-                with open("debug_llm_prompt.txt", "w", encoding="utf-8") as f:
-                    f.write(full_prompt)
-                logger.info("Saved full LLM prompt to debug_llm_prompt.txt")
-            except Exception as e:
-                logger.error(f"Failed to save debug prompt: {e}")
+            # Map Action to Strategy Name for LLM
+            rl_recommendation_text = RL_STRATEGIES.get(rl_optimal_action, "Standard Development")
+            logger.info(f">>> OPTIMAL ACTION: {rl_recommendation_text.split('(')[0].strip()} (Confidence 90%)", extra={"type": "rl"})
 
-            summary_response = llm_chain.invoke(llm_inputs)
+            raw_rl_confidence = float(action_probabilities[rl_optimal_action])
             
-            # Handle potential multi-part content from newer Gemini models
-            raw_content = summary_response.content
-            if isinstance(raw_content, list) and len(raw_content) > 0:
-                # Expecting [{'type': 'text', 'text': '...', ...}]
-                if isinstance(raw_content[0], dict) and "text" in raw_content[0]:
-                    analysis_report = raw_content[0]["text"]
-                else:
-                    analysis_report = str(raw_content) # Fallback
-            elif hasattr(raw_content, "text"): # Some objects might have .text prop
-                 analysis_report = raw_content.text
-            else:
-                analysis_report = str(raw_content) # Default to string conversion logic for plain strings or unknown types
+            # Base confidence from RL
+            confidence_score = 0.5 + (raw_rl_confidence * 0.4) 
             
-            # Fallback for empty response
-            if not analysis_report or not analysis_report.strip():
-                logger.warning("LLM returned empty analysis report.")
-                analysis_report = "### **Analysis Available (Partial)**\n\nThe system successfully retrieved rules but the AI summarization returned an empty response. This can happen due to high server load or safety filters.\n\n**Retrieved Rules:**\n"
-                # Append some rule titles so it's not totally blank
-                for i, r in enumerate(context_data[:5]):
-                    snippet = r.get('raw_text_excerpt', '')[:200].replace('\n', ' ')
-                    analysis_report += f"- **Rule {i+1}**: {snippet}...\n"
-                
-            logger.info(f"LLM expert report complete for {case_id}.")
         except Exception as e:
-            logger.error(f"LLM generation failed: {e}")
-            analysis_report = f"### ⚠️ AI Analysis Unavailable\n\n**Reason**: The AI service encountered a temporary error ({str(e)}). \n\n**Note**: The rest of your report (Calculations, Geometry, RL Decision) is available below."
+            logger.warning(f"RL Prediction failed: {e}")
+            rl_recommendation_text = "RL Analysis Unavailable"
+    else:
+        rl_recommendation_text = "RL Agent Not Loaded"
+    return rl_optimal_action, rl_recommendation_text, confidence_score, rl_model_version
+
+def build_llm_inputs(city, parameters, context_data, rl_recommendation_text):
+    """Pre-computes the financial estimates and fills in every variable of CONSULTANT_PROMPT."""
+    zoning = parameters.get("zoning", "Not Specified")
+    proposed_use = parameters.get("proposed_use", "Not Specified")
+    building_height = parameters.get("building_height", "Not Specified")
+    asr_rate = float(parameters.get("asr_rate", 0))
+    plot_deductions = float(parameters.get("plot_deductions", 0))
+    net_plot_area = max(0, float(parameters.get("plot_size", 0)) - plot_deductions)
 
+    context_for_llm = f"The following rules were retrieved from the master database:\n\n{json.dumps(context_data, indent=2)}"
+    
+    # --- Financial & Premium FSI Pre-calculation ---
+    inferred_premium_fsi = 0.3 if (city and city in ["Pune", "Mumbai", "Nashik"]) else 0.0
+    
+    # If rules found a specific Premium FSI, use that instead (future improvement)
+    # For now, we stick to the inferred default if context is missing specific numeric data
+    
+    premium_fsi_area = net_plot_area * inferred_premium_fsi
+    estimated_cost = 0.5 * asr_rate * premium_fsi_area if asr_rate > 0 else 0
+    
+    # Format cost string
+    if estimated_cost > 0:
+        cost_str = f"₹{estimated_cost:,.2f} (Estimated at 50% of ASR per sq.m)"
     else:
+        cost_str = "N/A (ASR Rate missing)"
+
+    # Prepare inputs for the LLM
+    llm_inputs = {
+        "context": context_for_llm,
+        "input": json.dumps(parameters),
+        "current_date": datetime.utcnow().strftime('%B %d, %Y'),
+        "plot_size": f'{parameters.get("plot_size", "N/A")} sq. m.',
+        "location": parameters.get("location", "N/A"),
+        "road_width": f'{parameters.get("road_width", "N/A")} m.',
+        "zoning": zoning,
+        "proposed_use": proposed_use,
+        "building_height": building_height,
+        "net_plot_area": net_plot_area,
+        "asr_rate": asr_rate,
+        "plot_deductions": plot_deductions,
+        "rl_recommendation": rl_recommendation_text,
+        "inferred_premium_fsi": inferred_premium_fsi,
+        "premium_fsi_area": f"{premium_fsi_area:.2f} sq.m",
+        "estimated_premium_cost": cost_str
+    }
+    return llm_inputs
+
+def _message_text(raw_content):
+    """Handle potential multi-part content from newer Gemini models."""
+    if isinstance(raw_content, list):
+        if not raw_content:
+            return ""
+        # Expecting [{'type': 'text', 'text': '...', ...}]
+        if isinstance(raw_content[0], dict) and "text" in raw_content[0]:
+            return raw_content[0]["text"]
+        return str(raw_content) # Fallback
+    if hasattr(raw_content, "text"): # Some objects might have .text prop
+        return raw_content.text
+    return str(raw_content) # Default to string conversion logic for plain strings or unknown types
+
+def _empty_analysis_fallback(context_data):
+    logger.warning("LLM returned empty analysis report.")
+    analysis_report = "### **Analysis Available (Partial)**\n\nThe system successfully retrieved rules but the AI summarization returned an empty response. This can happen due to high server load or safety filters.\n\n**Retrieved Rules:**\n"
+    # Append some rule titles so it's not totally blank
+    for i, r in enumerate(context_data[:5]):
+        snippet = r.get('raw_text_excerpt', '')[:200].replace('\n', ' ')
+        analysis_report += f"- **Rule {i+1}**: {snippet}...\n"
+    return analysis_report
+
+def _llm_error_report(error):
+    logger.error(f"LLM generation failed: {error}")
+    return f"{LLM_ERROR_HEADING}\n\n**Reason**: The AI service encountered a temporary error ({str(error)}). \n\n**Note**: The rest of your report (Calculations, Geometry, RL Decision) is available below."
+
+def _save_debug_prompt(llm_inputs):
+    # DEBUG: Write the full prompt to a file
+    try:
+        full_prompt = CONSULTANT_PROMPT.format(**llm_inputs)
+        with open("debug_llm_prompt.txt", "w", encoding="utf-8") as f:
+            f.write(full_prompt)
+        logger.info("Saved full LLM prompt to debug_llm_prompt.txt")
+    except Exception as e:
+        logger.error(f"Failed to save debug prompt: {e}")
+
+def generate_analysis(llm_inputs, context_data, system_state, case_id):
+    """Blocking LLM call producing the markdown analysis (or a placeholder when the LLM is unavailable)."""
+    logger.info("LLM extracting specific constraints from Page 45, 87...", extra={"type": "llm"})
+    if not system_state.llm:
         logger.warning("LLM skipped because it is not initialized.")
-        analysis_report = "### AI Analysis Skipped\n\nReason: `GEMINI_API_KEY` is missing. Please configure it to receive detailed regulatory analysis."
+        return LLM_SKIPPED_REPORT
+    try:
+        llm_chain = CONSULTANT_PROMPT | system_state.llm
+        _save_debug_prompt(llm_inputs)
+        summary_response = llm_chain.invoke(llm_inputs)
+        analysis_report = _message_text(summary_response.content)
+        # Fallback for empty response
+        if not analysis_report or not analysis_report.strip():
+            analysis_report = _empty_analysis_fallback(context_data)
+        logger.info(f"LLM expert report complete for {case_id}.")
+        return analysis_report
+    except Exception as e:
+        return _llm_error_report(e)
 
+def stream_analysis(llm_inputs, context_data, system_state, case_id):
+    """Streaming variant of generate_analysis: yields markdown chunks as the LLM produces them."""
+    logger.info("LLM extracting specific constraints from Page 45, 87...", extra={"type": "llm"})
+    if not system_state.llm:
+        logger.warning("LLM skipped because it is not initialized.")
+        yield LLM_SKIPPED_REPORT
+        return
+    produced_text = False
+    try:
+        llm_chain = CONSULTANT_PROMPT | system_state.llm
+        _save_debug_prompt(llm_inputs)
+        for chunk in llm_chain.stream(llm_inputs):
+            text = _message_text(chunk.content)
+            if text:
+                produced_text = produced_text or bool(text.strip())
+                yield text
+        if not produced_text:
+            yield _empty_analysis_fallback(context_data)
+        logger.info(f"LLM expert report complete for {case_id}.")
+    except Exception as e:
+        yield ("\n\n" if produced_text else "") + _llm_error_report(e)
 
+def compute_envelope(parameters, context_data):
+    """Deterministic FSI resolution and building envelope; independent of the LLM output."""
     # --- D. Run Specialized Calculations (Inlined) ---
     # Formerly EntitlementsAgent & AllowableEnvelopeAgent behavior
     
@@ -398,6 +467,20 @@ def process_case_logic(case_data, system_state):
     depth_dim = max(4.0, final_depth)
     height_dim = max(5.0, final_height)
 
+    return {
+        "total_fsi": total_fsi,
+        "deterministic_entitlements": deterministic_entitlements,
+        "carpet_area_sqm": interior_result.get("result_carpet_area_sqm"),
+        "width": float(width_dim),
+        "depth": float(depth_dim),
+        "height": float(height_dim)
+    }
+
+def compute_comparative_analysis(parameters, total_fsi):
+    """ROI of the optimized (system) FSI against a plain baseline FSI."""
+    asr_rate = float(parameters.get("asr_rate", 0))
+    net_plot_area = max(0, float(parameters.get("plot_size", 0)) - float(parameters.get("plot_deductions", 0)))
+
     # --- F. ROI & Comparative Analysis (Hackathon Wow Feature) ---
     # Baseline: Standard FSI (1.1) without optimization
     # Optimized: The System's Result (Total FSI)
@@ -432,53 +515,178 @@ def process_case_logic(case_data, system_state):
     optimized_profit = optimized_revenue - optimized_cost
     value_add = optimized_profit - baseline_profit
 
-    # --- G. Compile Final, Standardized Report ---
-    final_report = { 
+    return {
+        "baseline": {
+            "fsi": round(baseline_fsi, 2),
+            "bua": round(baseline_bua, 2),
+            "estimated_profit": round(baseline_profit, 2)
+        },
+        "optimized": {
+            "fsi": round(ai_fsi, 2),
+            "bua": round(ai_bua, 2),
+            "estimated_profit": round(optimized_profit, 2)
+        },
+        "value_add": round(value_add, 2),
+        "roi_increase_percent": round((value_add / baseline_profit * 100), 1) if baseline_profit > 0 else 0
+    }
+
+def assemble_report(case_data, analysis_report, envelope, comparative_analysis, rl_optimal_action, confidence_score, rl_model_version=None):
+    """Compiles the final, standardized report."""
+    project_id = case_data.get("project_id", "default_project")
+    case_id = case_data.get("case_id")
+    return {
         "project_id": project_id,
         "case_id": case_id,
-        "city": city,
-        "inputs": parameters,
+        "city": case_data.get("city"),
+        "inputs": case_data.get("parameters", {}),
         "entitlements": {
             "analysis_summary": analysis_report,
-            "rules_from_db": deterministic_entitlements,
-            "carpet_area_sqm": interior_result.get("result_carpet_area_sqm")
-        },
-        "comparative_analysis": {
-            "baseline": {
-                "fsi": round(baseline_fsi, 2),
-                "bua": round(baseline_bua, 2),
-                "estimated_profit": round(baseline_profit, 2)
-            },
-            "optimized": {
-                "fsi": round(ai_fsi, 2),
-                "bua": round(ai_bua, 2),
-                "estimated_profit": round(optimized_profit, 2)
-            },
-            "value_add": round(value_add, 2),
-            "roi_increase_percent": round((value_add / baseline_profit * 100), 1) if baseline_profit > 0 else 0
+            "rules_from_db": envelope["deterministic_entitlements"],
+            "carpet_area_sqm": envelope["carpet_area_sqm"]
         },
+        "comparative_analysis": comparative_analysis,
         "rl_decision": {
             "optimal_action": rl_optimal_action,
-            "confidence_score": round(confidence_score, 2)
+            "confidence_score": round(confidence_score, 2),
+            "model_version": rl_model_version
         },
         "geometry_file": f"/outputs/projects/{project_id}/{case_id}_geometry.stl",
         "calculated_geometry": {
-            "width": float(width_dim),
-            "depth": float(depth_dim),
-            "height": float(height_dim)
+            "width": envelope["width"],
+            "depth": envelope["depth"],
+            "height": envelope["height"]
         },
-        "logs": f"/logs/{case_id}" 
+        "logs": f"/logs/{case_id}"
     }
+
+# Shared pool for the independent pipeline stages. Stage tasks never wait on each other,
+# so concurrent cases cannot deadlock the pool.
+_STAGE_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv("PIPELINE_STAGE_WORKERS", "16")),
+    thread_name_prefix="pipeline-stage"
+)
+
+def _timed(timings, stage, case_id, fn, *args):
+    """Runs fn(*args) inside a `pipeline.<stage>` span and records its duration (ms) under timings[stage]."""
+    start = time.perf_counter()
+    try:
+        with span(f"pipeline.{stage}", case_id):
+            return fn(*args)
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000, 2)
+
+def _geometry_stage(case_data, context_data):
+    """Envelope and ROI; neither needs the LLM output."""
+    parameters = case_data.get("parameters", {})
+    envelope = compute_envelope(parameters, context_data)
+    comparative_analysis = compute_comparative_analysis(parameters, envelope["total_fsi"])
+    return envelope, comparative_analysis
+
+def _write_preliminary_outputs(case_data, envelope, comparative_analysis, rl_decision):
+    preliminary_report = assemble_report(case_data, "", envelope, comparative_analysis, *rl_decision)
+    write_case_outputs(preliminary_report)
+
+def _geometry_and_preliminary_outputs(timings, case_data, context_data, rl_decision):
+    case_id = case_data.get("case_id")
+    envelope, comparative_analysis = _timed(timings, "geometry", case_id, _geometry_stage, case_data, context_data)
+    _timed(timings, "write_outputs", case_id, _write_preliminary_outputs, case_data, envelope, comparative_analysis, rl_decision)
+    return envelope, comparative_analysis
+
+def process_case_logic(case_data, system_state, matching_rules=None, rl_result=None):
+    """
+    This is the core pipeline logic, refactored to use the MCPClient as the single source of truth.
+
+    Stages run as a small DAG: retrieval and RL inference in parallel; then the LLM call (on the
+    caller's thread), with the envelope/ROI computation and the STL + preliminary JSON writes
+    overlapping it on the stage pool.
+    Per-stage wall-clock timings are returned in the report under `timings_ms`.
+
+    `matching_rules` and `rl_result` (an (action, probabilities, model_version) triple) can be supplied by a
+    batch caller that already ran retrieval / RL inference for several cases at once.
+    """
+    with trace(case_data.get("case_id")), span("pipeline.total", case_data.get("case_id")):
+        return _process_case_stages(case_data, system_state, matching_rules, rl_result)
+
+def _process_case_stages(case_data, system_state, matching_rules, rl_result):
+    # --- A. Unpack Inputs ---
+    project_id = case_data.get("project_id", "default_project")
+    case_id = case_data.get("case_id")
+    city = case_data.get("city")
+    parameters = case_data.get("parameters", {})
+    timings = {}
+    pipeline_start = time.perf_counter()
+
+    logger.info(f"Processing case {case_id} for project {project_id}.")
     
-    # --- G. Save Outputs ---
-    output_dir = f"outputs/projects/{project_id}"
+    # --- B + C. Query MCP for Hard Facts || Run RL Agent (the policy only needs the raw parameters) ---
+    rules_future = None
+    if matching_rules is None:
+        logger.info("Accessing VectorDB (Chroma)... Searching 'DCPR 2034 FSI Rules'...", extra={"type": "rag"})
+        rules_future = submit_in_context(_STAGE_EXECUTOR, _timed, timings, "retrieval", case_id, query_case_rules, city, parameters, system_state)
+    rl_future = submit_in_context(_STAGE_EXECUTOR, _timed, timings, "rl_inference", case_id, run_rl_stage, parameters, system_state, rl_result)
+
+    if rules_future is not None:
+        matching_rules = rules_future.result()
+    logger.info(f"Found {len(matching_rules)} Relevant Regulation Chunks (Score: 0.89).", extra={"type": "rag"})
+    context_data = build_context_data(matching_rules)
+
+    rl_decision = rl_future.result()
+    rl_optimal_action, rl_recommendation_text, confidence_score, rl_model_version = rl_decision
+
+    # --- E + F. Specialized Calculations & ROI, then the STL + preliminary JSON, off the LLM's critical path ---
+    outputs_future = submit_in_context(_STAGE_EXECUTOR, _geometry_and_preliminary_outputs, timings, case_data, context_data,
+                                       (rl_optimal_action, confidence_score, rl_model_version))
+
+    # --- D. Use the LLM to Explain the Facts ---
+    # On this thread: the call takes seconds, and holding a shared pool slot for it would starve
+    # the short stages of other requests
+    llm_inputs = build_llm_inputs(city, parameters, context_data, rl_recommendation_text)
+    analysis_report = _timed(timings, "llm", case_id, generate_analysis, llm_inputs, context_data, system_state, case_id)
+    envelope, comparative_analysis = outputs_future.result()
+
+    # --- G. Compile Final, Standardized Report & Save Outputs ---
+    final_report = assemble_report(case_data, analysis_report, envelope, comparative_analysis, rl_optimal_action, confidence_score, rl_model_version)
+    final_report["timings_ms"] = timings
+    _timed(timings, "write_report", case_id, write_report_json, final_report)
+    timings["total"] = round((time.perf_counter() - pipeline_start) * 1000, 2)
+    logger.info(f"Stage timings for {case_id} (ms): {timings}")
+    
+    return final_report
+
+
+def write_case_outputs(final_report):
+    """Writes the JSON report and the STL block of the calculated envelope to the project folder."""
+    write_report_json(final_report)
+    write_geometry_stl(final_report)
+
+
+def _output_dir(final_report):
+    output_dir = f"outputs/projects/{final_report['project_id']}"
     os.makedirs(output_dir, exist_ok=True)
-    json_output_path = os.path.join(output_dir, f"{case_id}_report.json")
-    stl_output_path = os.path.join(output_dir, f"{case_id}_geometry.stl")
+    return output_dir
+
+
+def write_report_json(final_report):
+    with span("io.write_report", final_report["case_id"]):
+        _write_report_json(final_report)
 
+
+def _write_report_json(final_report):
+    json_output_path = os.path.join(_output_dir(final_report), f"{final_report['case_id']}_report.json")
     with open(json_output_path, "w") as f:
         json.dump(final_report, f, indent=4)
-    
+
+
+def write_geometry_stl(final_report):
+    with span("io.write_stl", final_report["case_id"]):
+        _write_geometry_stl(final_report)
+
+
+def _write_geometry_stl(final_report):
+    geometry = final_report["calculated_geometry"]
+    width_dim, depth_dim, height_dim = geometry["width"], geometry["depth"], geometry["height"]
+    stl_output_path = os.path.join(_output_dir(final_report), f"{final_report['case_id']}_geometry.stl")
+
     # Inlined GeometryAgent.create_block
     try:
         # Define the 8 corners of the block
@@ -511,8 +719,184 @@ def process_case_logic(case_data, system_state):
         logger.info(f"Geometry saved to {stl_output_path}")
     except Exception as e:
         logger.error(f"Failed to generate geometry: {e}")
-    
-    return final_report
-    
-    logger.info("Synthesizing Final Compliance Report...", extra={"type": "sys"})
-    logger.info("Pipeline Execution Complete. Generating 3D Geometry.", extra={"type": "success"})
+
+
+def lookup_cached_report(case_data, system_state):
+    """
+    Returns (report, key). On a hit the cached report is re-bound to this case's ids,
+    its outputs are re-written, and it is marked with cache.hit = True.
+    """
+    cache = getattr(system_state, "result_cache", None)
+    if cache is None:
+        return None, None
+    lookup_start = time.perf_counter()
+    with span("cache.lookup", case_data.get("case_id")):
+        model_version = getattr(system_state, "rl_model_version", None)
+        key = cache.make_key(case_data, model_version)
+        cached = cache.get(key)
+    if cached is None:
+        return None, key
+    lookup_ms = round((time.perf_counter() - lookup_start) * 1000, 2)
+
+    project_id = case_data.get("project_id", "default_project")
+    case_id = case_data.get("case_id")
+    report = json.loads(json.dumps(cached))
+    report.update({
+        "project_id": project_id,
+        "case_id": case_id,
+        "inputs": case_data.get("parameters", {}),
+        "geometry_file": f"/outputs/projects/{project_id}/{case_id}_geometry.stl",
+        "logs": f"/logs/{case_id}",
+        "cache": {"hit": True, "key": key},
+        "timings_ms": {"cache_lookup": lookup_ms, "total": lookup_ms}
+    })
+    # Reports cached before model versions were recorded: the key already pins the version
+    report["rl_decision"].setdefault("model_version", model_version)
+    write_case_outputs(report)
+    logger.info(f"Result cache hit for case {case_id}.", extra={"type": "success"})
+    return report, key
+
+
+def store_cached_report(key, report, system_state):
+    """Caches a freshly computed report unless its AI analysis was skipped or failed."""
+    cache = getattr(system_state, "result_cache", None)
+    if cache is None or key is None or system_state.llm is None:
+        return
+    if LLM_ERROR_HEADING in report["entitlements"]["analysis_summary"]:
+        return
+    model_version = report["rl_decision"].get("model_version")
+    if model_version != getattr(system_state, "rl_model_version", None):
+        return  # The RL model was hot-swapped while this case ran; its key belongs to the old version
+    cache.put(key, dict(report), model_version=model_version)
+
+
+def cached_process_case(case_data, system_state, matching_rules=None, rl_result=None):
+    """process_case_logic behind the content-addressed result cache."""
+    report, key = lookup_cached_report(case_data, system_state)
+    if report is not None:
+        return report
+    return _process_cache_miss(case_data, system_state, key, matching_rules, rl_result)
+
+
+def _process_cache_miss(case_data, system_state, key, matching_rules=None, rl_result=None):
+    """Runs the pipeline for a case already looked up in the cache under `key`, and caches the report."""
+    report = process_case_logic(case_data, system_state, matching_rules, rl_result)
+    store_cached_report(key, report, system_state)
+    if key is not None:
+        report["cache"] = {"hit": False, "key": key}
+    return report
+
+
+def stream_case_logic(case_data, system_state):
+    """
+    Streaming variant of cached_process_case. Yields (event, data) pairs:
+      - ("report", report): everything deterministic (RL decision, comparative analysis,
+        geometry, STL path) with an empty analysis_summary, before the LLM is called;
+      - ("token", {"case_id", "text"}): markdown chunks of the analysis as they are generated;
+      - ("done", report): the final report, identical to the /run_case response.
+    """
+    cached_report, key = lookup_cached_report(case_data, system_state)
+    if cached_report is not None:
+        yield "report", cached_report
+        yield "done", cached_report
+        return
+
+    case_id = case_data.get("case_id")
+    city = case_data.get("city")
+    parameters = case_data.get("parameters", {})
+    logger.info(f"Processing case {case_id} for project {case_data.get('project_id', 'default_project')} (streaming).")
+
+    logger.info("Accessing VectorDB (Chroma)... Searching 'DCPR 2034 FSI Rules'...", extra={"type": "rag"})
+    timings = {}
+    rl_future = submit_in_context(_STAGE_EXECUTOR, _timed, timings, "rl_inference", case_id, run_rl_stage, parameters, system_state)
+    matching_rules = _timed(timings, "retrieval", case_id, query_case_rules, city, parameters, system_state)
+    logger.info(f"Found {len(matching_rules)} Relevant Regulation Chunks (Score: 0.89).", extra={"type": "rag"})
+    context_data = build_context_data(matching_rules)
+
+    rl_optimal_action, rl_recommendation_text, confidence_score, rl_model_version = rl_future.result()
+    envelope, comparative_analysis = _timed(timings, "geometry", case_id, _geometry_stage, case_data, context_data)
+
+    final_report = assemble_report(case_data, "", envelope, comparative_analysis, rl_optimal_action, confidence_score, rl_model_version)
+    # The geometry does not depend on the analysis, so the viewer can load it right away
+    write_geometry_stl(final_report)
+    yield "report", final_report
+
+    llm_inputs = build_llm_inputs(city, parameters, context_data, rl_recommendation_text)
+    chunks = []
+    for text in stream_analysis(llm_inputs, context_data, system_state, case_id):
+        chunks.append(text)
+        yield "token", {"case_id": case_id, "text": text}
+
+    final_report["entitlements"]["analysis_summary"] = "".join(chunks)
+    write_report_json(final_report)
+    store_cached_report(key, final_report, system_state)
+    if key is not None:
+        final_report["cache"] = {"hit": False, "key": key}
+    yield "done", final_report
+
+
+def run_case_batch(cases, system_state, max_workers=None):
+    """
+    Evaluates a portfolio of cases, yielding one NDJSON line per case as each finishes.
+
+    Rules are queried once per retrieval key (city + road width + plot size + location),
+    and all RL observations are stacked into a single policy forward pass. Only the
+    per-case LLM report and geometry run individually, in a thread pool.
+    """
+    if max_workers is None:
+        max_workers = int(os.getenv("BATCH_WORKERS", "8"))
+    logger.info(f"Batch evaluation started for {len(cases)} cases.")
+
+    # 0. Cached reports are returned straight away; only misses go through the pipeline
+    # (with the cache key computed here, so they are not looked up a second time)
+    misses, cache_keys = [], []
+    for case in cases:
+        report, cache_key = lookup_cached_report(case, system_state)
+        if report is not None:
+            yield json.dumps({"case_id": case.get("case_id"), "status": "success", "report": report}) + "\n"
+        else:
+            misses.append(case)
+            cache_keys.append(cache_key)
+    cases = misses
+
+    # 1. Shared retrieval: one MCP query per distinct retrieval key
+    groups = {}
+    for index, case in enumerate(cases):
+        key = retrieval_key(case.get("city"), case.get("parameters", {}))
+        groups.setdefault(key, []).append(index)
+
+    rules_by_case = [None] * len(cases)
+    for indices in groups.values():
+        first_case = cases[indices[0]]
+        rules = query_case_rules(first_case.get("city"), first_case.get("parameters", {}), system_state)
+        for index in indices:
+            rules_by_case[index] = rules
+    logger.info(f"Retrieved rules for {len(groups)} parameter groups ({len(cases)} cases).", extra={"type": "rag"})
+
+    # 2. Vectorized RL inference: one forward pass over the stacked observations
+    rl_results = [None] * len(cases)
+    rl_agent, rl_model_version = current_rl_model(system_state)
+    if rl_agent and cases:
+        try:
+            observations = np.stack([build_rl_observation(case.get("parameters", {})) for case in cases])
+            actions, probabilities = predict_rl_actions(observations, rl_agent)
+            rl_results = [(action, probability, rl_model_version) for action, probability in zip(actions, probabilities)]
+            logger.info(f"Policy Network evaluated {len(cases)} observations in one batch.", extra={"type": "rl"})
+        except Exception as e:
+            logger.warning(f"Batched RL Prediction failed, falling back to per-case inference: {e}")
+
+    # 3. Per-case report generation, streamed back in completion order
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_process_cache_miss, case, system_state, cache_keys[i], rules_by_case[i], rl_results[i]): case
+            for i, case in enumerate(cases)
+        }
+        for future in concurrent.futures.as_completed(futures):
+            case = futures[future]
+            try:
+                line = {"case_id": case.get("case_id"), "status": "success", "report": future.result()}
+            except Exception as e:
+                logger.error(f"Batch case {case.get('case_id')} failed: {e}", exc_info=True)
+                line = {"case_id": case.get("case_id"), "status": "error", "detail": str(e)}
+            yield json.dumps(line) + "\n"
+    logger.info(f"Batch evaluation complete for {len(cases)} cases.", extra={"type": "success"})
@@ -1,9 +1,11 @@
-from chroma_client import ChromaDBClient
+from readonly_rule_db import open_rule_db
 from typing import List, Dict, Any
 import json
 import os
 from datetime import datetime
 import uuid
+from metrics import span
+from rl_env.feedback_store import FeedbackSampleStore
 
 class MCPClient:
     """
@@ -11,7 +13,15 @@ class MCPClient:
     Now backed by ChromaDB for vector-search enabled rule management.
     """
     def __init__(self):
-        self.db = ChromaDBClient()
+        # Serving replicas open the read-only snapshot baked into the image (RULE_DB_SNAPSHOT)
+        self.db = open_rule_db()
+        # Compact (state, action, vote) rows for RL retraining, kept in step with feedback.jsonl.
+        # Best-effort: a broken side file must not take the rule DB down with it
+        self.feedback_store = None
+        try:
+            self.feedback_store = FeedbackSampleStore()
+        except Exception as e:
+            print(f"Feedback sample store unavailable; feedback is still logged to feedback.jsonl: {e}")
         print("MCPClient initialized, connected to ChromaDB.")
 
     def add_rule(self, rule_data: Dict[str, Any]):
@@ -24,6 +34,15 @@ class MCPClient:
             print(f"Error adding rule: {e}")
             return False
 
+    def add_rules_bulk(self, rules: List[Dict[str, Any]], documents: List[str] = None,
+                       page_numbers: List[int] = None, batch_size: int = None) -> int:
+        """Adds a batch of rules in chunked upserts. Returns the number committed."""
+        try:
+            return self.db.add_rules_bulk(rules, documents=documents, page_numbers=page_numbers, batch_size=batch_size)
+        except Exception as e:
+            print(f"Error adding rules in bulk: {e}")
+            return 0
+
     def query_rules(self, city: str, parameters: dict) -> List[Dict[str, Any]]:
         """
         Finds all rules that match the given case parameters.
@@ -69,8 +88,18 @@ class MCPClient:
             "report_excerpt": report_text[:500] + "..." if len(report_text) > 500 else report_text 
         }
         try:
-            with open(log_file, "a") as f:
-                f.write(json.dumps(feedback_record) + "\n")
+            with span("mcp.add_feedback", feedback_record["case_id"]):
+                line = (json.dumps(feedback_record) + "\n").encode("utf-8")
+                with open(log_file, "ab") as f:
+                    f.write(line)
+                    f.flush()
+                    end = f.tell()
+            try:
+                if self.feedback_store is not None:
+                    self.feedback_store.append_record(feedback_record, end - len(line), end)
+            except Exception as e:
+                # feedback.jsonl is the source of truth; the next sync() catches the store up
+                print(f"Error updating feedback sample store: {e}")
             return feedback_record
         except Exception as e:
             print(f"Error saving feedback: {e}")
@@ -0,0 +1,156 @@
+import contextvars
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from logging_config import logger, current_trace_id, current_span_id, current_case_id
+
+# Prometheus-style latency buckets (seconds), from sub-millisecond cache hits to long LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram (exported to Prometheus) plus a bounded reservoir of
+    recent observations used for the p50/p95/p99 quantiles.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, reservoir_size: int = 2048):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=reservoir_size)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.bucket_counts[i] += 1
+
+    def quantiles(self, qs=(0.5, 0.95, 0.99)) -> Dict[float, float]:
+        if not self.recent:
+            return {q: 0.0 for q in qs}
+        values = np.fromiter(self.recent, dtype=np.float64)
+        return {q: float(np.quantile(values, q)) for q in qs}
+
+
+class MetricsRegistry:
+    """Per-stage latency histograms shared by the API server and its clients."""
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95/p99 (ms) and counts per stage, for quick inspection."""
+        with self._lock:
+            items = list(self._histograms.items())
+        result = {}
+        for stage, histogram in items:
+            q = histogram.quantiles()
+            result[stage] = {
+                "count": histogram.count,
+                "p50_ms": round(q[0.5] * 1000, 2),
+                "p95_ms": round(q[0.95] * 1000, 2),
+                "p99_ms": round(q[0.99] * 1000, 2)
+            }
+        return result
+
+    def render_prometheus(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """Renders every histogram (and optional gauges) in the Prometheus text exposition format."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+        lines: List[str] = [
+            "# HELP compliance_stage_duration_seconds Wall-clock duration of pipeline stages.",
+            "# TYPE compliance_stage_duration_seconds histogram"
+        ]
+        for stage, histogram in items:
+            for upper, count in zip(histogram.buckets, histogram.bucket_counts):
+                lines.append(f'compliance_stage_duration_seconds_bucket{{stage="{stage}",le="{upper}"}} {count}')
+            lines.append(f'compliance_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'compliance_stage_duration_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'compliance_stage_duration_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        lines.append("# HELP compliance_stage_duration_quantile_seconds Recent p50/p95/p99 stage durations.")
+        lines.append("# TYPE compliance_stage_duration_quantile_seconds gauge")
+        for stage, histogram in items:
+            for q, value in histogram.quantiles().items():
+                lines.append(f'compliance_stage_duration_quantile_seconds{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def trace(case_id: Optional[str] = None):
+    """
+    Starts a new trace (one per case) that all spans opened inside it belong to. Every log
+    record and span inside it carries `case_id`, including spans of shared components
+    (retrieval, embedding) that do not know which case they serve.
+    """
+    token = current_trace_id.set(uuid.uuid4().hex[:16])
+    case_token = current_case_id.set(case_id)
+    try:
+        yield current_trace_id.get()
+    finally:
+        current_case_id.reset(case_token)
+        current_trace_id.reset(token)
+
+
+@contextmanager
+def span(stage: str, case_id: Optional[str] = None):
+    """
+    Times a stage: records it in the registry and writes a span record (trace id, span id,
+    parent span id, duration) to the JSON log so a case's breakdown can be reconstructed.
+    """
+    span_id = uuid.uuid4().hex[:16]
+    parent_span_id = current_span_id.get()
+    token = current_span_id.set(span_id)
+    status = "ok"
+    start = time.perf_counter()
+    try:
+        yield span_id
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        current_span_id.reset(token)
+        registry.observe(stage, duration)
+        span_record = {
+            "trace_id": current_trace_id.get(),
+            "span_id": span_id,
+            "parent_span_id": parent_span_id,
+            "stage": stage,
+            "duration_ms": round(duration * 1000, 3),
+            "status": status
+        }
+        extra_data = {"span": span_record}
+        case_id = case_id or current_case_id.get()
+        if case_id:
+            extra_data["case"] = {"case_id": case_id}
+        logger.info(f"Span {stage} finished in {span_record['duration_ms']} ms", extra={"type": "span", "extra_data": extra_data})
+
+
+def submit_in_context(executor, fn, *args):
+    """executor.submit that carries the caller's trace/span context into the worker thread."""
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fn, *args)
@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from typing import Any, Dict
+
+import chromadb
+
+from chroma_client import ChromaDBClient
+from rule_store import RuleBodyStore
+
+# Metadata fields the compact layout no longer stores in Chroma (the rule body store holds them)
+LEGACY_METADATA_KEYS = ("full_json", "notes")
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def compact_record(meta: Dict[str, Any], stored_bodies: Dict[str, tuple]):
+    """(compact metadata, rule body) for one stored record, or (None, None) if it cannot be decoded."""
+    rule_id = meta.get("id")
+    body = stored_bodies[rule_id][0] if rule_id in stored_bodies else None
+    if body is None and "full_json" in meta:
+        try:
+            body = json.loads(meta["full_json"])
+        except ValueError:
+            body = None
+    if body is None:
+        return None, None
+    return {key: value for key, value in meta.items() if key not in LEGACY_METADATA_KEYS}, body
+
+
+def migrate(source: str, target: str, batch_size: int = 500) -> Dict[str, Any]:
+    """
+    Copies the `rules` collection from `source` into a fresh compact store at `target`: embeddings
+    and filterable scalars in Chroma, rule bodies and document text in the RuleBodyStore. Stored
+    embeddings are copied as-is, so nothing is re-embedded. Writing a new directory (rather than rewriting in place)
+    also leaves behind the free pages a rewrite would strand inside chroma.sqlite3.
+    """
+    source_client = chromadb.PersistentClient(path=source)
+    source_collection = source_client.get_collection(name="rules")
+    # Rules already in the compact layout (e.g. a partially migrated store) keep their bodies
+    source_bodies = {}
+    if os.path.exists(os.path.join(source, RuleBodyStore.FILENAME)):
+        store = RuleBodyStore(source)
+        source_bodies = store.all()
+        store.close()
+
+    target_db = ChromaDBClient(persist_directory=target)
+    total = source_collection.count()
+    migrated = skipped = 0
+    started = time.perf_counter()
+    for offset in range(0, total, batch_size):
+        records = source_collection.get(
+            limit=batch_size, offset=offset, include=["metadatas", "documents", "embeddings"]
+        )
+        ids, metadatas, embeddings, bodies, documents = [], [], [], {}, {}
+        for rule_id, meta, doc, embedding in zip(records["ids"], records["metadatas"], records["documents"], records["embeddings"]):
+            compact_meta, body = compact_record(meta, source_bodies)
+            if rule_id in source_bodies and not doc:
+                doc = source_bodies[rule_id][1]
+            if compact_meta is None:
+                print(f"Skipping {rule_id}: no full_json or stored body to migrate.")
+                skipped += 1
+                continue
+            ids.append(rule_id)
+            metadatas.append(compact_meta)
+            embeddings.append(embedding)
+            bodies[rule_id] = body
+            documents[rule_id] = doc
+        if ids:
+            target_db.bodies.put_many(bodies, documents)
+            target_db.collection.upsert(ids=ids, metadatas=metadatas, embeddings=embeddings)
+            migrated += len(ids)
+        print(f"Migrated {migrated}/{total} rules...")
+
+    return {
+        "rules": total,
+        "migrated": migrated,
+        "skipped": skipped,
+        "seconds": round(time.perf_counter() - started, 2),
+        "source_bytes": directory_size(source),
+        "target_bytes": directory_size(target)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate a ChromaDB rule collection to the compact metadata layout.")
+    parser.add_argument("--source", default=os.getenv("CHROMADB_PERSIST_DIRECTORY", "rules_chroma_db"),
+                        help="Existing persist directory.")
+    parser.add_argument("--target", default=None, help="New persist directory (default: <source>_compact).")
+    parser.add_argument("--batch-size", type=int, default=500, help="Records copied per Chroma call.")
+    parser.add_argument("--in-place", action="store_true",
+                        help="Swap the migrated store into --source afterwards (the original is kept as <source>.bak).")
+    args = parser.parse_args()
+
+    source = args.source.rstrip("/\\")
+    target = args.target or f"{source}_compact"
+    if os.path.exists(target) and os.listdir(target):
+        print(f"Target '{target}' is not empty. Remove it or choose another --target.")
+        sys.exit(1)
+
+    report = migrate(source, target, batch_size=args.batch_size)
+    report["size_reduction"] = (
+        round(1 - report["target_bytes"] / report["source_bytes"], 3) if report["source_bytes"] else None
+    )
+    print(json.dumps(report, indent=2))
+
+    if args.in_place:
+        backup = f"{source}.bak"
+        os.replace(source, backup)
+        shutil.move(target, source)
+        print(f"'{source}' now uses the compact layout; the original is in '{backup}'.")
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from logging_config import logger
+from cache_utils import file_fingerprint
+
+
+class ModelVersion(NamedTuple):
+    """A loaded RL agent together with the content hash of the checkpoint it came from."""
+    agent: Any
+    version: Optional[str]
+    loaded_at: float
+
+
+class ModelRegistry:
+    """
+    Keeps the active RL agent for a checkpoint path and hot-swaps it when the file is rewritten
+    (e.g. by the retraining workflow), without a server restart.
+
+    A background thread polls the checkpoint's mtime/size every `interval` seconds. A change is
+    only loaded once the file has stopped changing for one poll, and is skipped when its content
+    hash matches the active version (a touch, or a re-save of the same weights). Loading happens
+    on the watcher thread; the swap itself is one `on_swap(model)` call made under the registry
+    lock (as is every rollback), so requests see either the old or the new ModelVersion, never
+    a mix, and what serving uses always matches `active`. The replaced version is kept
+    for `rollback()`, which stays pinned until the next new checkpoint.
+    """
+    def __init__(self, checkpoint: str, load: Callable[[str], Any],
+                 on_swap: Optional[Callable[[ModelVersion], None]] = None, interval: float = None):
+        if interval is None:
+            interval = float(os.getenv("RL_RELOAD_INTERVAL_SECONDS", "10"))
+        self.checkpoint = checkpoint
+        self.interval = interval
+        self._load = load
+        self._on_swap = on_swap
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.active: Optional[ModelVersion] = None
+        self.previous: Optional[ModelVersion] = None
+        # (mtime_ns, size) of the file behind `active`, and of a change waiting to settle
+        self._loaded_stat = None
+        self._pending_stat = None
+        self.last_error: Optional[str] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.checkpoint)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _swap(self, model: ModelVersion):
+        # on_swap runs under the lock too, so a racing rollback cannot apply its swap in a
+        # different order than `active` / `previous` were updated
+        with self._lock:
+            self.previous, self.active = self.active, model
+            if self._on_swap is not None:
+                self._on_swap(model)
+            previous_version = self.previous.version if self.previous else None
+        logger.info(f"RL model {model.version} is now active (previous: {previous_version}).")
+
+    # --- Loading ---
+    def load(self) -> ModelVersion:
+        """Loads the checkpoint as it is now and makes it active (the startup load)."""
+        stat = self._stat()
+        model = ModelVersion(self._load(self.checkpoint), file_fingerprint(self.checkpoint), time.time())
+        self._loaded_stat = stat
+        self._swap(model)
+        return model
+
+    def check(self) -> bool:
+        """One poll: loads and swaps in the checkpoint if it changed and has settled. True on a swap."""
+        stat = self._stat()
+        if stat is None or stat == self._loaded_stat:
+            self._pending_stat = None
+            return False
+        if stat != self._pending_stat:
+            # Just changed (possibly still being written): load it once it is unchanged a poll later
+            self._pending_stat = stat
+            return False
+        self._pending_stat = None
+
+        version = file_fingerprint(self.checkpoint)
+        if self.active is not None and version == self.active.version:
+            self._loaded_stat = stat
+            return False
+        try:
+            agent = self._load(self.checkpoint)
+        except Exception as e:
+            # Keep serving the active model; a broken file is not retried until it changes again
+            self.last_error = str(e)
+            self._loaded_stat = stat
+            logger.warning(f"Could not load RL checkpoint {self.checkpoint} ({version}): {e}")
+            return False
+        if self._stat() != stat:
+            return False  # Rewritten while loading: the next polls pick up the newer file
+        self.last_error = None
+        self._loaded_stat = stat
+        self._swap(ModelVersion(agent, version, time.time()))
+        return True
+
+    def rollback(self) -> ModelVersion:
+        """Re-activates the previous version (the current one becomes `previous`)."""
+        with self._lock:
+            if self.previous is None:
+                raise ValueError("No previous RL model version to roll back to.")
+            self.active, self.previous = self.previous, self.active
+            model = self.active
+            if self._on_swap is not None:
+                self._on_swap(model)
+        logger.info(f"Rolled back to RL model {model.version}.")
+        return model
+
+    # --- Watcher thread ---
+    def start(self):
+        """Starts the background watcher (a no-op when `interval` <= 0 or it is already running)."""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._watch, name="rl-model-watcher", daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"RL model watcher error: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            active, previous = self.active, self.previous
+        return {
+            "checkpoint": self.checkpoint,
+            "active_version": active.version if active else None,
+            "active_loaded_at": active.loaded_at if active else None,
+            "previous_version": previous.version if previous else None,
+            "reload_interval_seconds": self.interval,
+            "watching": self._thread is not None and self._thread.is_alive(),
+            "last_error": self.last_error
+        }
@@ -0,0 +1,168 @@
+import os
+import hashlib
+import unicodedata
+import itertools
+import concurrent.futures
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional
+
+import fitz  # PyMuPDF
+import pytesseract
+from PIL import Image
+
+# Standard Windows install locations, tried before falling back to tesseract on PATH
+TESSERACT_CANDIDATE_PATHS = [
+    r'C:\Program Files\Tesseract-OCR\tesseract.exe',
+    r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
+]
+
+
+def find_tesseract() -> Optional[str]:
+    """Returns the Tesseract executable path, or None to use whatever is on PATH."""
+    for path in TESSERACT_CANDIDATE_PATHS:
+        if os.path.exists(path):
+            return path
+    print("[WARNING] Tesseract executable not found in standard paths. Assuming it is in PATH.")
+    return None
+
+
+def _ocr_page(page, zoom: float, lang: str, tesseract_config: str, known: Optional[Dict[str, str]] = None):
+    """Returns (text, image_hash). `known` is the previous run's OCR of this page, reused if the render is unchanged."""
+    # Render straight to raw RGB samples: no PNG encode/decode round trip
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    image_hash = hashlib.sha256(pix.samples).hexdigest()
+    if known and known.get("image_hash") == image_hash:
+        return known["content"], image_hash
+    image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    return pytesseract.image_to_string(image, lang=lang, config=tesseract_config), image_hash
+
+
+def score_text_layer(text: str) -> Dict[str, float]:
+    """Quality signals for a page's embedded text: usable characters and the share of garbage glyphs."""
+    stripped = text.strip()
+    garbage = sum(
+        1 for c in stripped
+        if c == "\ufffd" or (unicodedata.category(c) in ("Co", "Cn", "Cs", "Cc") and c not in "\n\r\t")
+    )
+    return {"chars": len(stripped), "garbage_ratio": garbage / len(stripped) if stripped else 1.0}
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int, zoom: float, lang: str,
+                        tesseract_config: str, tesseract_cmd: Optional[str], text_layer_first: bool,
+                        min_text_chars: int, max_garbage_ratio: float,
+                        known_pages: Optional[Dict[int, Dict[str, str]]] = None) -> List[Dict[str, Any]]:
+    """
+    Worker: extracts pages [start, end) of the PDF with its own fitz document. The native text
+    layer is used when it is good enough; scanned or garbled pages fall back to Tesseract.
+    `known_pages` maps page numbers to a previous run's {"image_hash", "content"}.
+    """
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    results = []
+    with fitz.open(pdf_path) as doc:
+        for i in range(start, end):
+            page = doc[i]
+            if text_layer_first:
+                text = page.get_text()
+                quality = score_text_layer(text)
+                if quality["chars"] >= min_text_chars and quality["garbage_ratio"] <= max_garbage_ratio:
+                    results.append({"page": i + 1, "content": text, "extraction_method": "text_layer", "image_hash": None})
+                    continue
+            image_hash = None
+            try:
+                text, image_hash = _ocr_page(page, zoom, lang, tesseract_config, (known_pages or {}).get(i + 1))
+            except Exception as e:
+                print(f"OCR Error on page {i}: {e}")
+                text = "" # fallback
+            results.append({"page": i + 1, "content": text, "extraction_method": "ocr", "image_hash": image_hash})
+    return results
+
+
+def _known_in_range(known_pages: Dict[int, Dict[str, str]], start: int, end: int) -> Dict[int, Dict[str, str]]:
+    # Only ship each worker the cached OCR text for its own pages
+    return {page: known_pages[page] for page in range(start + 1, end + 1) if page in known_pages}
+
+
+class OCREngine:
+    """
+    Multi-process, text-layer-first page extraction for PDFs.
+
+    Page ranges are sharded across a process pool (each worker opens its own fitz document,
+    since PyMuPDF documents cannot be shared between processes) and pages are yielded back
+    in page order as soon as their shard finishes. Digitally born pages are read from their
+    embedded text layer; only scanned or low-quality pages are rendered and OCR'd. Each page
+    records the path it took in "extraction_method" ("text_layer" or "ocr").
+    """
+    def __init__(self, workers: int = None, dpi: float = None, lang: str = None,
+                 tesseract_config: str = None, tesseract_cmd: str = None, pages_per_task: int = None,
+                 text_layer_first: bool = None, min_text_chars: int = None, max_garbage_ratio: float = None):
+        if workers is None:
+            workers = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+        if dpi is None:
+            # 144 DPI == the 2x zoom ingest_pdf has always rendered at
+            dpi = float(os.getenv("OCR_DPI", "144"))
+        if lang is None:
+            lang = os.getenv("OCR_LANG", "eng")
+        if tesseract_config is None:
+            tesseract_config = os.getenv("OCR_TESSERACT_CONFIG", "")
+        if pages_per_task is None:
+            pages_per_task = int(os.getenv("OCR_PAGES_PER_TASK", "4"))
+        if text_layer_first is None:
+            text_layer_first = os.getenv("OCR_TEXT_LAYER_FIRST", "1") == "1"
+        if min_text_chars is None:
+            min_text_chars = int(os.getenv("OCR_MIN_TEXT_CHARS", "50"))
+        if max_garbage_ratio is None:
+            max_garbage_ratio = float(os.getenv("OCR_MAX_GARBAGE_RATIO", "0.05"))
+
+        self.workers = max(1, workers)
+        self.zoom = dpi / 72.0
+        self.lang = lang
+        self.tesseract_config = tesseract_config
+        self.tesseract_cmd = tesseract_cmd or find_tesseract()
+        self.pages_per_task = max(1, pages_per_task)
+        self.text_layer_first = text_layer_first
+        self.min_text_chars = min_text_chars
+        self.max_garbage_ratio = max_garbage_ratio
+
+    def iter_pages(self, pdf_path: str, known_pages: Optional[Dict[int, Dict[str, str]]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yields {"page": n, "content": text, "extraction_method": ..., "image_hash": ...} for every
+        page, in page order. `known_pages` (see IngestionManifest.ocr_cache) lets unchanged scanned
+        pages skip Tesseract.
+        """
+        known_pages = known_pages or {}
+        with fitz.open(pdf_path) as doc:
+            page_count = len(doc)
+        ranges = [(start, min(start + self.pages_per_task, page_count))
+                  for start in range(0, page_count, self.pages_per_task)]
+        args = (self.zoom, self.lang, self.tesseract_config, self.tesseract_cmd,
+                self.text_layer_first, self.min_text_chars, self.max_garbage_ratio)
+
+        if self.workers == 1:
+            for start, end in ranges:
+                yield from _extract_page_range(pdf_path, start, end, *args, _known_in_range(known_pages, start, end))
+            return
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as executor:
+            def submit(page_range):
+                start, end = page_range
+                return executor.submit(_extract_page_range, pdf_path, start, end, *args, _known_in_range(known_pages, start, end))
+
+            # At most 2 shards per worker in flight: a slow consumer (e.g. the LLM stage)
+            # applies backpressure instead of finished pages piling up in memory
+            remaining = iter(ranges)
+            in_flight = deque(submit(r) for r in itertools.islice(remaining, 2 * self.workers))
+            # Consuming futures in submission order keeps the output in page order
+            while in_flight:
+                future = in_flight.popleft()
+                next_range = next(remaining, None)
+                if next_range is not None:
+                    in_flight.append(submit(next_range))
+                yield from future.result()
+
+    def ocr_pdf(self, pdf_path: str) -> List[Dict[str, Any]]:
+        return list(self.iter_pages(pdf_path))
+
+    def page_count(self, pdf_path: str) -> int:
+        with fitz.open(pdf_path) as doc:
+            return len(doc)
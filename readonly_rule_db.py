@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from chromadb.utils import embedding_functions
+
+from chroma_client import ChromaDBClient
+from metrics import span
+from migrate_rule_store import compact_record, directory_size
+from rule_store import RuleBodyStore, connect_immutable
+
+# Snapshot layout (one directory, baked into the image):
+#   vectors.npy          float32 [rules x dim] embeddings, memory-mapped at startup
+#   sq_norms.npy         float32 [rules] squared L2 norms of the vectors
+#   rule_bodies.sqlite3  RuleBodyStore bodies and documents, plus a `records` table (row, id, metadata)
+#   snapshot.json        rule count, dimension and source
+VECTORS_FILE = "vectors.npy"
+NORMS_FILE = "sq_norms.npy"
+MANIFEST_FILE = "snapshot.json"
+
+
+def export_snapshot(source_directory: str, snapshot_directory: str, batch_size: int = 1000) -> Dict[str, Any]:
+    """Writes a read-only serving snapshot of the ChromaDB rule collection at `source_directory`."""
+    source = ChromaDBClient(persist_directory=source_directory)
+    os.makedirs(snapshot_directory, exist_ok=True)
+    # Rebuilt from scratch so rules deleted since the last export do not linger
+    if os.path.exists(os.path.join(snapshot_directory, RuleBodyStore.FILENAME)):
+        os.remove(os.path.join(snapshot_directory, RuleBodyStore.FILENAME))
+    bodies = RuleBodyStore(snapshot_directory)
+    records_conn = sqlite3.connect(bodies.path)
+    with records_conn:
+        records_conn.execute("CREATE TABLE records (row INTEGER PRIMARY KEY, id TEXT NOT NULL, metadata TEXT NOT NULL)")
+
+    vectors: List[Any] = []
+    total = source.collection.count()
+    for offset in range(0, total, batch_size):
+        records = source.collection.get(limit=batch_size, offset=offset, include=["metadatas", "embeddings"])
+        stored = source.bodies.get_many(records["ids"])
+        legacy_ids = [rule_id for rule_id in records["ids"] if rule_id not in stored]
+        legacy_documents = {}
+        if legacy_ids:
+            legacy = source.collection.get(ids=legacy_ids, include=["documents"])
+            legacy_documents = dict(zip(legacy["ids"], legacy["documents"] or []))
+
+        rows, batch_bodies, batch_documents = [], {}, {}
+        for rule_id, meta, embedding in zip(records["ids"], records["metadatas"], records["embeddings"]):
+            compact_meta, body = compact_record(meta, stored)
+            if compact_meta is None:
+                print(f"Skipping {rule_id}: no stored body.")
+                continue
+            rows.append((len(vectors), rule_id, json.dumps(compact_meta)))
+            vectors.append(np.asarray(embedding, dtype=np.float32))
+            batch_bodies[rule_id] = body
+            batch_documents[rule_id] = stored[rule_id][1] if rule_id in stored else legacy_documents.get(rule_id)
+        bodies.put_many(batch_bodies, batch_documents)
+        with records_conn:
+            records_conn.executemany("INSERT INTO records (row, id, metadata) VALUES (?, ?, ?)", rows)
+    records_conn.close()
+    bodies.close()
+
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    np.save(os.path.join(snapshot_directory, VECTORS_FILE), matrix)
+    np.save(os.path.join(snapshot_directory, NORMS_FILE), np.einsum("ij,ij->i", matrix, matrix).astype(np.float32))
+    manifest = {
+        "rules": int(matrix.shape[0]),
+        "dimension": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        "source": os.path.abspath(source_directory),
+        "created_at": time.time()
+    }
+    with open(os.path.join(snapshot_directory, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    manifest["snapshot_bytes"] = directory_size(snapshot_directory)
+    return manifest
+
+
+class ReadOnlyRuleDB(ChromaDBClient):
+    """
+    Serving-mode rule database opened straight from a snapshot directory in the image.
+
+    Embeddings are memory-mapped (np.load mmap_mode="r") and the SQLite file is opened
+    immutable, so nothing is copied to /tmp and untouched pages stay in the shared page cache
+    instead of the replica's memory. Semantic search is an exact L2 scan over the city's rows,
+    which replaces loading Chroma's HNSW index. Queries behave exactly like ChromaDBClient;
+    writes are disabled (ingestion runs against a writable ChromaDBClient and re-exports).
+    """
+    def __init__(self, snapshot_directory: str = None):
+        if snapshot_directory is None:
+            snapshot_directory = os.getenv("RULE_DB_SNAPSHOT", "rules_snapshot")
+        self.persist_directory = snapshot_directory
+        print(f"--- Opening read-only rule snapshot at '{snapshot_directory}' ---")
+
+        self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        self.bodies = RuleBodyStore(snapshot_directory, read_only=True)
+        self.vectors = np.load(os.path.join(snapshot_directory, VECTORS_FILE), mmap_mode="r")
+        self.sq_norms = np.load(os.path.join(snapshot_directory, NORMS_FILE), mmap_mode="r")
+        self.ids: List[str] = []
+        self._city_rows: Dict[str, np.ndarray] = {}
+        self._init_query_state()
+        self._load_index()
+
+    def _load_index(self):
+        with span("index.build"):
+            conn = connect_immutable(self.bodies.path)
+            records = conn.execute("SELECT row, id, metadata FROM records ORDER BY row").fetchall()
+            conn.close()
+            bodies = self.bodies.all()
+            city_rows: Dict[str, List[int]] = {}
+            for row, rule_id, metadata in records:
+                meta = json.loads(metadata)
+                self.ids.append(rule_id)
+                city_rows.setdefault(meta.get("city"), []).append(row)
+                body, doc = bodies.get(rule_id, (None, None))
+                self._index_rule(meta, doc, body)
+            self._city_rows = {city: np.asarray(rows, dtype=np.int64) for city, rows in city_rows.items()}
+        print(f"Rule index built over {len(self.index)} rules (read-only snapshot).")
+
+    def _semantic_search(self, query_embedding: List[float], city: str, n_results: int) -> List[str]:
+        rows = self._city_rows.get(city)
+        if rows is None or not len(rows):
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        # ||v - q||^2 up to the constant ||q||^2, same ranking as Chroma's default l2 space
+        distances = self.sq_norms[rows] - 2.0 * (self.vectors[rows] @ query)
+        k = min(n_results, len(rows))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return [self.ids[rows[i]] for i in top]
+
+    def _load_missing(self, rule_ids: List[str]):
+        # The snapshot never changes, so every id is already decoded
+        return
+
+    # --- Writes are disabled in serving replicas ---
+    def add_rule(self, rule_data: Dict[str, Any], document_content: str = None, **kwargs):
+        print(f"Error: rule DB is a read-only snapshot. Cannot add rule {rule_data.get('id')}.")
+        return False
+
+    def add_rules_bulk(self, rules: List[Dict[str, Any]], *args, **kwargs) -> int:
+        print(f"Error: rule DB is a read-only snapshot. Cannot add {len(rules)} rules.")
+        return 0
+
+    def delete_rules(self, rule_ids: List[str]) -> int:
+        print("Error: rule DB is a read-only snapshot. Cannot delete rules.")
+        return 0
+
+    def count(self):
+        return len(self.ids)
+
+    def peek(self):
+        return self.rules.materialize(self.ids[:10])
+
+
+def open_rule_db() -> ChromaDBClient:
+    """The read-only snapshot when RULE_DB_SNAPSHOT points at one (serving replicas), else a writable ChromaDBClient."""
+    snapshot_directory = os.getenv("RULE_DB_SNAPSHOT")
+    if snapshot_directory and os.path.exists(os.path.join(snapshot_directory, VECTORS_FILE)):
+        return ReadOnlyRuleDB(snapshot_directory)
+    return ChromaDBClient()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a read-only serving snapshot of the rule database.")
+    parser.add_argument("--source", default=os.getenv("CHROMADB_PERSIST_DIRECTORY", "rules_chroma_db"),
+                        help="ChromaDB persist directory to export.")
+    parser.add_argument("--target", default="rules_snapshot", help="Snapshot directory to write.")
+    args = parser.parse_args()
+
+    print(json.dumps(export_snapshot(args.source, args.target), indent=2))
@@ -0,0 +1,147 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from cache_utils import LRUCache, canonical_hash
+from logging_config import logger
+
+
+class ResultCache:
+    """
+    Content-addressed cache of final case reports, sitting in front of process_case_logic.
+
+    Two tiers: an in-memory LRU for the running server and a SQLite table on disk that
+    survives restarts and is shared with offline tools (e.g. the rule extraction pipeline,
+    which invalidates it after committing new rules).
+    """
+    def __init__(self, db_path: str = None, max_memory_entries: int = None,
+                 max_disk_entries: int = None, ttl_seconds: float = None):
+        if db_path is None:
+            db_path = os.getenv("RESULT_CACHE_DB", "reports/result_cache.db")
+        if max_memory_entries is None:
+            max_memory_entries = int(os.getenv("RESULT_CACHE_MEMORY_ENTRIES", "256"))
+        if max_disk_entries is None:
+            max_disk_entries = int(os.getenv("RESULT_CACHE_DISK_ENTRIES", "5000"))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.memory = LRUCache(maxsize=max_memory_entries, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    report TEXT NOT NULL,
+                    model_version TEXT,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('rules_version', '0')")
+
+    # --- Keys ---
+    @property
+    def rules_version(self) -> int:
+        """Generation counter of the rule collection, bumped by invalidate_rules()."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'rules_version'").fetchone()
+        return int(row[0])
+
+    def make_key(self, case_data: Dict[str, Any], model_version: Optional[str]) -> str:
+        """Canonical hash of the normalized case parameters, rule version and model checkpoint."""
+        parameters = case_data.get("parameters", {}) or {}
+
+        def number(value):
+            return None if value is None else round(float(value), 4)
+
+        def text(value):
+            return value.strip() if isinstance(value, str) else value
+
+        normalized = {
+            "city": text(case_data.get("city")),
+            "plot_size": number(parameters.get("plot_size")),
+            "road_width": number(parameters.get("road_width")),
+            "location": text(parameters.get("location")),
+            "zoning": text(parameters.get("zoning")),
+            "proposed_use": text(parameters.get("proposed_use")),
+            "building_height": number(parameters.get("building_height")),
+            "asr_rate": number(parameters.get("asr_rate")),
+            "plot_deductions": number(parameters.get("plot_deductions")),
+            "rules_version": self.rules_version,
+            "model_version": model_version
+        }
+        return canonical_hash(normalized)
+
+    # --- Lookups ---
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        report = self.memory.get(key)
+        if report is not None:
+            return report
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT report, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if time.time() - row[1] > self.ttl_seconds:
+                with self._conn:
+                    self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+        report = json.loads(row[0])
+        self.memory.put(key, report)
+        return report
+
+    def put(self, key: str, report: Dict[str, Any], model_version: Optional[str] = None):
+        self.memory.put(key, report)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, report, model_version, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(report), model_version, now, now)
+            )
+            # Size limit: drop the least recently used rows beyond max_disk_entries
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,)
+            )
+
+    # --- Invalidation ---
+    def invalidate_rules(self):
+        """Called after new rules are committed: every cached report is stale."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM results")
+            self._conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'rules_version'")
+        self.memory.clear()
+        logger.info("Result cache invalidated after a rule collection update.")
+
+    def invalidate_model(self, model_version: Optional[str]):
+        """Called when an RL checkpoint is loaded: drops reports produced by any other checkpoint."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM results WHERE model_version IS NOT ?", (model_version,)
+            )
+        self.memory.clear()
+        logger.info(f"Result cache invalidated for RL model version {model_version}.")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            disk_entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {"memory": self.memory.stats(), "disk_entries": disk_entries}
+
+    def close(self):
+        self._conn.close()
@@ -1,119 +1,198 @@
 import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
-import random
 import json
 import os
 
+from feedback_store import SAMPLE_DTYPE, VOTE_DOWN, VOTE_UP, FeedbackSampleStore
+
+N_ACTIONS = 5  # 5 possible rule choices from the original design
+
+
+def load_synthetic_cases():
+    """Synthetic "textbook" cases from our original oracle."""
+    synthetic_cases = []
+    if os.path.exists("rl_env/oracle_data.json"):
+        with open("rl_env/oracle_data.json") as f:
+            synthetic_data = json.load(f)
+            for item in synthetic_data:
+                item['source'] = 'synthetic' # Tag to identify the source
+                synthetic_cases.append(item)
+    return synthetic_cases
+
+
+class TrainingData:
+    """
+    ComplexEnv's cases: `states` / `rewards` arrays for the in-memory cases (the synthetic oracle
+    cases), followed by human-feedback rows [start, stop) of the feedback sample store.
+
+    The store rows stay a read-only memory map: their observations and rewards are looked up per
+    batch of indices (human_reward_table over just those rows), never concatenated into one
+    in-memory table. Pickling (SubprocVecEnv hands a copy to every worker) sends only the file
+    path and row range, and each process maps the file itself.
+    """
+    def __init__(self, states, rewards, samples_path: str = None, start: int = 0, stop: int = 0):
+        self.states = np.asarray(states, dtype=np.float32).reshape(-1, 3)
+        self.rewards = np.asarray(rewards, dtype=np.float32).reshape(len(self.states), N_ACTIONS)
+        self.samples_path = samples_path
+        self.start = start
+        self.stop = max(stop, start) if samples_path is not None else start
+        self._samples = None
+
+    @property
+    def n_human(self) -> int:
+        return self.stop - self.start
+
+    def __len__(self):
+        return len(self.states) + self.n_human
+
+    @property
+    def samples(self) -> np.ndarray:
+        """The store rows, memory-mapped on first use (in each process)."""
+        if self._samples is None:
+            if self.n_human == 0:
+                self._samples = np.zeros(0, dtype=SAMPLE_DTYPE)
+            else:
+                self._samples = np.memmap(self.samples_path, dtype=SAMPLE_DTYPE, mode="r", shape=(self.stop,))[self.start:]
+        return self._samples
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_samples"] = None
+        return state
+
+    def _split(self, indices):
+        indices = np.asarray(indices, dtype=np.intp)
+        human = indices >= len(self.states)
+        return indices, human, indices[human] - len(self.states)
+
+    def observations(self, indices) -> np.ndarray:
+        """Observations of the cases at `indices`, shape (len(indices), 3)."""
+        indices, human, rows = self._split(indices)
+        observations = np.empty((len(indices), 3), dtype=np.float32)
+        observations[~human] = self.states[indices[~human]]
+        observations[human] = self.samples["state"][rows]
+        return observations
+
+    def action_rewards(self, indices, actions) -> np.ndarray:
+        """Reward of taking `actions[i]` on case `indices[i]`, shape (len(indices),)."""
+        indices, human, rows = self._split(indices)
+        actions = np.asarray(actions, dtype=np.intp)
+        rewards = np.empty(len(indices), dtype=np.float32)
+        rewards[~human] = self.rewards[indices[~human], actions[~human]]
+        if rows.size:
+            samples = self.samples[rows]
+            table = human_reward_table(samples["action_taken"], samples["vote"])
+            rewards[human] = table[np.arange(len(rows)), actions[human]]
+        return rewards
+
+
+def load_training_data(store: FeedbackSampleStore = None, since_row: int = 0) -> TrainingData:
+    """
+    TrainingData for ComplexEnv: the synthetic oracle cases plus human-feedback rows
+    [since_row, end) of the feedback sample store. The store is synced first (parsing only
+    feedback.jsonl lines it has not seen); its rows are then read through the memory map, so no
+    full report is json-parsed here and the rows are not copied into memory.
+    """
+    # --- 1. LOAD BOTH KNOWLEDGE SOURCES ---
+    # Source A: Synthetic "Textbook" Knowledge from our original oracle
+    synthetic_cases = load_synthetic_cases()
+    synthetic_states = [case["state"] for case in synthetic_cases]
+
+    # Source B: Human-in-the-Loop "Real-World" Feedback
+    if store is None:
+        store = FeedbackSampleStore()
+    store.sync()
+
+    # Both knowledge sources make up the final training set
+    return TrainingData(synthetic_states, build_reward_table(synthetic_cases),
+                        samples_path=store.samples_path, start=since_row, stop=store.rows)
+
+
+def build_reward_table(training_cases, n_actions=N_ACTIONS):
+    """
+    Reward of every action for every case, shape (n_cases, n_actions), so a step is a single
+    lookup (and a batch of steps a single fancy-index in ComplexBatchEnv).
+    """
+    rewards = np.zeros((len(training_cases), n_actions), dtype=np.float32)
+    for i, case in enumerate(training_cases):
+        source = case.get('source', 'synthetic')
+        if source == 'human':
+            # This case came from a human. Use the stronger +/- 2 reward.
+            action_the_human_saw = case['action_taken']
+            human_vote = case['feedback']
+            if not isinstance(action_the_human_saw, (int, np.integer)):
+                action_the_human_saw = -1  # No usable action recorded: matches nothing
+            if human_vote == 'down':
+                # Avoiding a downvoted action earns a small reward, repeating it a strong penalty
+                rewards[i, :] = 1
+                if 0 <= action_the_human_saw < n_actions:
+                    rewards[i, action_the_human_saw] = -2
+            elif human_vote == 'up' and 0 <= action_the_human_saw < n_actions:
+                # Strong positive reward for agreeing with a good choice, neutral otherwise
+                rewards[i, action_the_human_saw] = 2
+        else:
+            # This is a synthetic case from the oracle. Use the original +/- 1 reward.
+            rewards[i, :] = -1
+            rewards[i, case["correct_action"]] = 1
+    return rewards
+
+
+def human_reward_table(actions_taken, votes, n_actions=N_ACTIONS):
+    """build_reward_table's human rule over store columns: +2 for an upvoted action; +1 everywhere but -2 for a downvoted one."""
+    actions_taken = np.asarray(actions_taken, dtype=np.intp)
+    votes = np.asarray(votes)
+    rewards = np.zeros((len(actions_taken), n_actions), dtype=np.float32)
+    rewards[votes == VOTE_DOWN] = 1
+    rows = np.flatnonzero((actions_taken >= 0) & (actions_taken < n_actions))
+    rewards[rows, actions_taken[rows]] = np.where(votes[rows] == VOTE_DOWN, -2, np.where(votes[rows] == VOTE_UP, 2, 0))
+    return rewards
+
+
 class ComplexEnv(gym.Env):
-    def __init__(self):
+    def __init__(self, training_cases=None, verbose=True, training_data=None):
         super().__init__()
-        
+
         # --- 1. LOAD BOTH KNOWLEDGE SOURCES ---
-        
-        # Source A: Synthetic "Textbook" Knowledge from our original oracle
-        synthetic_cases = []
-        if os.path.exists("rl_env/oracle_data.json"):
-            with open("rl_env/oracle_data.json") as f:
-                synthetic_data = json.load(f)
-                for item in synthetic_data:
-                    item['source'] = 'synthetic' # Tag to identify the source
-                    synthetic_cases.append(item)
-        
-        # Source B: Human-in-the-Loop "Real-World" Feedback
-        human_feedback_cases = []
-        feedback_file = "io/feedback.jsonl"
-        if os.path.exists(feedback_file):
-            with open(feedback_file, 'r') as f:
-                for line in f:
-                    try:
-                        feedback = json.loads(line)
-                        if not feedback or 'input' not in feedback or 'output' not in feedback:
-                            continue
-                            
-                        # Safety check for None values
-                        inp = feedback.get('input') or {}
-                        outp = feedback.get('output') or {}
-                        
-                        params = inp.get('parameters')
-                        if not params: continue
-                        
-                        location_map = {"urban": 0, "suburban": 1, "rural": 2}
-                        loc_str = params.get('location', 'urban')
-                        if loc_str not in location_map: loc_str = 'urban'
-                        
-                        state = [
-                            float(params.get('plot_size', 0)), 
-                            float(location_map[loc_str]), 
-                            float(params.get('road_width', 0))
-                        ]
-                        
-                        # The action the agent took that the human voted on
-                        # Check if 'rl_optimal_action' exists
-                        if 'rl_optimal_action' not in outp: continue
-                        action_taken = outp['rl_optimal_action']
-                        
-                        human_feedback_cases.append({
-                            "state": state,
-                            "action_taken": action_taken,
-                            "feedback": feedback.get('user_feedback', 'up'), # 'up' or 'down'
-                            "source": 'human'
-                        })
-                    except Exception as e:
-                        # Skip corrupted lines in the feedback file
-                        # print(f"Skipping bad feedback line: {e}")
-                        continue
-
-        # Combine both knowledge sources into the final training set
-        self.training_cases = synthetic_cases + human_feedback_cases
-        
-        if not self.training_cases:
+        # Either explicit case dicts, or the TrainingData from load_training_data. Vectorized
+        # training passes the latter in, so N copies do not each re-read the files
+        if training_cases is not None:
+            n_human = sum(1 for case in training_cases if case.get('source') == 'human')
+            training_data = TrainingData([case["state"] for case in training_cases], build_reward_table(training_cases))
+        else:
+            training_data = training_data if training_data is not None else load_training_data()
+            n_human = training_data.n_human
+
+        if len(training_data) == 0:
             raise ValueError("No training data found. Please create oracle_data.json or provide feedback.")
 
         # --- 2. DEFINE SPACES ---
-        self.action_space = spaces.Discrete(5) # 5 possible rule choices from the original design
+        self.action_space = spaces.Discrete(N_ACTIONS)
         low_obs = np.array([0, 0, 0])
         high_obs = np.array([10000, 2, 100])
         self.observation_space = spaces.Box(low=low_obs, high=high_obs, dtype=np.float32)
-        
-        self.current_case = None
-        print(f"ComplexEnv (HIRL) initialized with {len(self.training_cases)} total cases ({len(human_feedback_cases)} from human feedback).")
-        
+
+        # Cases as arrays: observations and the reward of every action (see TrainingData)
+        self.data = training_data
+        self.current_index = None
+        if verbose:
+            print(f"ComplexEnv (HIRL) initialized with {len(self.data)} total cases ({n_human} from human feedback).")
+
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
-        # Pick a new random case from our combined training data
-        self.current_case = random.choice(self.training_cases)
+        # Pick a new random case from our combined training data, with the env's own seeded
+        # generator so parallel copies (SubprocVecEnv / DummyVecEnv) draw independent streams
+        self.current_index = int(self.np_random.integers(len(self.data)))
         info = {}
-        return np.array(self.current_case["state"]).astype(np.float32), info
+        return self.data.observations([self.current_index])[0], info
 
     def step(self, action):
-        # --- 3. IMPLEMENT THE NEW REWARD LOGIC ---
-        source = self.current_case.get('source', 'synthetic')
-        
-        if source == 'human':
-            # This case came from a human. Use the stronger +/- 2 reward.
-            action_the_human_saw = self.current_case['action_taken']
-            human_vote = self.current_case['feedback']
-            
-            # If the agent takes the same action that was UPVOTED
-            if action == action_the_human_saw and human_vote == 'up':
-                reward = 2  # Strong positive reward for agreeing with a good choice
-            # If the agent takes the same action that was DOWNVOTED
-            elif action == action_the_human_saw and human_vote == 'down':
-                reward = -2 # Strong negative reward for repeating a bad choice
-            # If the agent AVOIDS a downvoted action, that's good!
-            elif action != action_the_human_saw and human_vote == 'down':
-                reward = 1 # Small positive reward for avoiding a bad choice
-            else:
-                reward = 0 # Neutral reward for other scenarios
-        else:
-            # This is a synthetic case from the oracle. Use the original +/- 1 reward.
-            correct_action = self.current_case["correct_action"]
-            reward = 1 if action == correct_action else -1
+        # --- 3. REWARD LOGIC (build_reward_table / human_reward_table rules, see TrainingData) ---
+        reward = float(self.data.action_rewards([self.current_index], [int(action)])[0])
 
         terminated = True
         truncated = False
         info = {}
-        
-        current_state = np.array(self.current_case["state"]).astype(np.float32)
-        return current_state, reward, terminated, truncated, info
\ No newline at end of file
+
+        current_state = self.data.observations([self.current_index])[0]
+        return current_state, reward, terminated, truncated, info
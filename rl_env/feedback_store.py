@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# --- Compact HIRL training samples ---
+# io/feedback.jsonl keeps every full report; ComplexEnv only needs (state, action_taken, vote).
+# FeedbackSampleStore keeps those as fixed-width binary rows in an append-only file that the
+# env memory-maps, plus a small JSON sidecar:
+#   rows           committed rows (a torn append past this is truncated on open)
+#   source_offset  bytes of feedback.jsonl already ingested, so sync() parses only new lines
+#   checkpoints    rows each consumer (e.g. a trained checkpoint) has already trained on
+SAMPLE_DTYPE = np.dtype([("state", "<f4", (3,)), ("action_taken", "<i2"), ("vote", "i1"), ("_pad", "u1")])
+VOTE_DOWN, VOTE_NONE, VOTE_UP = -1, 0, 1
+LOCATION_MAP = {"urban": 0, "suburban": 1, "rural": 2}
+NO_ACTION = -1
+
+
+def feedback_sample(record: Dict[str, Any]) -> Optional[Tuple[list, int, int]]:
+    """(state, action_taken, vote) for one feedback.jsonl record, or None if it cannot train the agent."""
+    if not record or 'input' not in record or 'output' not in record:
+        return None
+    # Safety check for None values
+    inp = record.get('input') or {}
+    outp = record.get('output') or {}
+    params = inp.get('parameters') if isinstance(inp, dict) else None
+    # The action the agent took that the human voted on
+    if not params or not isinstance(outp, dict) or 'rl_optimal_action' not in outp:
+        return None
+
+    loc_str = params.get('location', 'urban')
+    if loc_str not in LOCATION_MAP:
+        loc_str = 'urban'
+    state = [float(params.get('plot_size', 0)), float(LOCATION_MAP[loc_str]), float(params.get('road_width', 0))]
+    action_taken = outp['rl_optimal_action']
+    if not isinstance(action_taken, int) or isinstance(action_taken, bool):
+        action_taken = NO_ACTION
+    vote = {"up": VOTE_UP, "down": VOTE_DOWN}.get(record.get('user_feedback', 'up'), VOTE_NONE)
+    return state, action_taken, vote
+
+
+class FeedbackSampleStore:
+    """
+    Append-only store of HIRL training samples derived from io/feedback.jsonl.
+
+    MCPClient.add_feedback appends each new record's sample as it is written; `sync()` catches
+    up on anything written to the JSONL some other way (and backfills an existing log the first
+    time), parsing only the bytes past `source_offset`. Readers get a read-only memory map.
+    """
+    SAMPLES_FILE = "feedback_samples.bin"
+    META_FILE = "feedback_samples.json"
+
+    def __init__(self, directory: str = None, source_path: str = None):
+        if directory is None:
+            directory = os.getenv("FEEDBACK_STORE_DIR", "io")
+        if source_path is None:
+            source_path = os.path.join("io", "feedback.jsonl")
+        os.makedirs(directory, exist_ok=True)
+        self.samples_path = os.path.join(directory, self.SAMPLES_FILE)
+        self.meta_path = os.path.join(directory, self.META_FILE)
+        self.source_path = source_path
+        self._lock = threading.Lock()
+        self.meta = self._load_meta()
+        # Drop a torn tail: rows appended but never committed to the sidecar
+        committed = self.meta["rows"] * SAMPLE_DTYPE.itemsize
+        if os.path.exists(self.samples_path) and os.path.getsize(self.samples_path) != committed:
+            with open(self.samples_path, "r+b") as f:
+                f.truncate(committed)
+
+    def _load_meta(self) -> Dict[str, Any]:
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                return json.load(f)
+        return {"rows": 0, "source_offset": 0, "checkpoints": {}}
+
+    def _save_meta(self):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _append(self, samples):
+        rows = np.zeros(len(samples), dtype=SAMPLE_DTYPE)
+        for i, (state, action_taken, vote) in enumerate(samples):
+            rows[i] = (state, action_taken, vote, 0)
+        with open(self.samples_path, "ab") as f:
+            f.write(rows.tobytes())
+        self.meta["rows"] += len(rows)
+
+    @property
+    def rows(self) -> int:
+        return self.meta["rows"]
+
+    # --- Writes ---
+    def append_record(self, record: Dict[str, Any], source_start: int, source_end: int):
+        """
+        Adds the sample of a record just written to the JSONL at bytes [source_start, source_end).
+        If the store is not caught up to source_start (another writer, or an older log), it syncs instead.
+        """
+        with self._lock:
+            if self.meta["source_offset"] != source_start:
+                self._sync()
+                return
+            sample = feedback_sample(record)
+            if sample is not None:
+                self._append([sample])
+            self.meta["source_offset"] = source_end
+            self._save_meta()
+
+    def sync(self) -> int:
+        """Ingests JSONL lines past `source_offset`; returns the number of samples added."""
+        with self._lock:
+            return self._sync()
+
+    def _sync(self) -> int:
+        if not os.path.exists(self.source_path):
+            return 0
+        if os.path.getsize(self.source_path) < self.meta["source_offset"]:
+            # The log was truncated or replaced: rebuild from the start
+            print(f"{self.source_path} shrank; rebuilding the feedback sample store.")
+            open(self.samples_path, "wb").close()
+            self.meta.update(rows=0, source_offset=0, checkpoints={})
+
+        samples = []
+        offset = self.meta["source_offset"]
+        with open(self.source_path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a line still being written; picked up by the next sync
+                offset += len(line)
+                try:
+                    sample = feedback_sample(json.loads(line))
+                except ValueError:
+                    # Skip corrupted lines in the feedback file
+                    continue
+                if sample is not None:
+                    samples.append(sample)
+        if samples:
+            self._append(samples)
+        if samples or offset != self.meta["source_offset"]:
+            self.meta["source_offset"] = offset
+            self._save_meta()
+        return len(samples)
+
+    # --- Reads ---
+    def samples(self, start: int = 0) -> np.ndarray:
+        """Read-only memory map of rows [start, rows) (an empty array if there are none)."""
+        rows = self.meta["rows"]
+        if start >= rows:
+            return np.zeros(0, dtype=SAMPLE_DTYPE)
+        return np.memmap(self.samples_path, dtype=SAMPLE_DTYPE, mode="r", shape=(rows,))[start:]
+
+    def checkpoint(self, consumer: str) -> int:
+        """Rows `consumer` has already trained on."""
+        return int(self.meta["checkpoints"].get(consumer, 0))
+
+    def set_checkpoint(self, consumer: str, rows: int):
+        with self._lock:
+            self.meta["checkpoints"][consumer] = int(rows)
+            self._save_meta()
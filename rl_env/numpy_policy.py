@@ -0,0 +1,220 @@
+import argparse
+import base64
+import io
+import json
+import os
+import pickle
+import re
+import sys
+import time
+import zipfile
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cache_utils import file_fingerprint
+
+# --- Torch-free PPO policy inference ---
+# The serving path only needs the actor half of SB3's MlpPolicy:
+#   obs -> [Linear -> activation] * n (mlp_extractor.policy_net) -> Linear (action_net) -> softmax
+# export_policy() pulls those weights straight out of the SB3 checkpoint zip (policy.pth is a
+# torch zip-pickle of plain float tensors, readable without torch) into an .npz, and
+# NumpyPolicy runs the forward pass with NumPy. One matmul chain yields both the action and
+# the full probability vector, for a single observation or a stacked batch.
+
+ACTIVATIONS = {
+    "Tanh": np.tanh,
+    "ReLU": lambda x: np.maximum(x, 0.0),
+    "LeakyReLU": lambda x: np.where(x > 0, x, 0.01 * x),
+}
+DEFAULT_ACTIVATION = "Tanh"  # SB3's default for PPO's MlpPolicy
+
+_TORCH_STORAGE_DTYPES = {
+    "FloatStorage": np.float32,
+    "DoubleStorage": np.float64,
+    "HalfStorage": np.float16,
+    "LongStorage": np.int64,
+    "IntStorage": np.int32,
+    "BoolStorage": np.bool_,
+}
+_POLICY_LAYER_PATTERN = re.compile(r'^mlp_extractor\.policy_net\.(\d+)\.weight$')
+
+
+def default_npz_path(checkpoint: str) -> str:
+    return os.path.splitext(checkpoint)[0] + ".npz"
+
+
+# --- Export ---
+class _StateDictUnpickler(pickle.Unpickler):
+    """Unpickles a torch state_dict into NumPy arrays without importing torch."""
+    def __init__(self, data: bytes, archive: zipfile.ZipFile, prefix: str):
+        super().__init__(io.BytesIO(data))
+        self.archive = archive
+        self.prefix = prefix
+
+    def find_class(self, module, name):
+        if module == "torch._utils" and name == "_rebuild_tensor_v2":
+            return _rebuild_tensor
+        if module == "torch" and name in _TORCH_STORAGE_DTYPES:
+            return _TORCH_STORAGE_DTYPES[name]
+        if module == "collections" and name == "OrderedDict":
+            return OrderedDict
+        raise pickle.UnpicklingError(f"Unsupported object in policy checkpoint: {module}.{name}")
+
+    def persistent_load(self, pid):
+        # ("storage", dtype, key, location, numel)
+        _, dtype, key, _, numel = pid
+        raw = self.archive.read(f"{self.prefix}data/{key}")
+        return np.frombuffer(raw, dtype=np.dtype(dtype).newbyteorder("<"), count=numel)
+
+
+def _rebuild_tensor(storage, storage_offset, size, stride, requires_grad=False, backward_hooks=None, metadata=None):
+    if not size:
+        return np.array(storage[storage_offset])
+    itemsize = storage.dtype.itemsize
+    view = np.lib.stride_tricks.as_strided(
+        storage[storage_offset:], shape=tuple(size), strides=tuple(s * itemsize for s in stride)
+    )
+    return np.ascontiguousarray(view)
+
+
+def read_policy_state(checkpoint: str) -> Dict[str, np.ndarray]:
+    """The policy state_dict of an SB3 checkpoint zip, as {name: ndarray}."""
+    with zipfile.ZipFile(checkpoint) as outer:
+        with zipfile.ZipFile(io.BytesIO(outer.read("policy.pth"))) as archive:
+            pickle_name = next(name for name in archive.namelist() if name.endswith("data.pkl"))
+            prefix = pickle_name[:-len("data.pkl")]
+            return _StateDictUnpickler(archive.read(pickle_name), archive, prefix).load()
+
+
+def read_activation(checkpoint: str) -> str:
+    """Activation of the policy MLP, from the checkpoint's policy_kwargs (SB3 default: Tanh)."""
+    with zipfile.ZipFile(checkpoint) as outer:
+        data = json.loads(outer.read("data"))
+    activation = (data.get("policy_kwargs") or {}).get("activation_fn")
+    if not activation:
+        return DEFAULT_ACTIVATION
+    # Stored as the class repr ("<class 'torch.nn.modules.activation.ReLU'>"), or cloudpickled
+    # with the qualified name in the payload
+    if isinstance(activation, dict):
+        activation = base64.b64decode(activation.get(":serialized:", "")).decode("latin-1")
+    for name in sorted(ACTIVATIONS, key=len, reverse=True):
+        if name in activation:
+            return name
+    raise ValueError(f"Unsupported policy activation in {checkpoint}: {activation}")
+
+
+def export_policy(checkpoint: str, output: str = None) -> Dict[str, np.ndarray]:
+    """
+    Extracts the actor weights of `checkpoint` into `output` (default: <checkpoint>.npz) and
+    returns the arrays. The .npz records the checkpoint fingerprint, so a retrained zip is detected.
+    """
+    state = read_policy_state(checkpoint)
+    layers = sorted((int(m.group(1)), key) for key in state for m in [_POLICY_LAYER_PATTERN.match(key)] if m)
+    arrays = {}
+    for i, (index, key) in enumerate(layers):
+        arrays[f"w{i}"] = state[key].astype(np.float32)
+        arrays[f"b{i}"] = state[f"mlp_extractor.policy_net.{index}.bias"].astype(np.float32)
+    arrays["action_w"] = state["action_net.weight"].astype(np.float32)
+    arrays["action_b"] = state["action_net.bias"].astype(np.float32)
+    arrays["activation"] = np.array(read_activation(checkpoint))
+    arrays["source_fingerprint"] = np.array(file_fingerprint(checkpoint))
+
+    output = output or default_npz_path(checkpoint)
+    try:
+        np.savez(output, **arrays)
+    except OSError as e:
+        # Read-only image filesystem: the arrays are still usable in memory
+        print(f"Warning: could not write {output}: {e}")
+    return arrays
+
+
+# --- Inference ---
+class NumpyPolicy:
+    """
+    The PPO actor as plain NumPy arrays. `predict_actions` takes one observation (3,) or a
+    batch (n, 3) and returns (actions (n,), probabilities (n, n_actions)); the action is the
+    deterministic argmax, as PPO.predict(deterministic=True).
+    """
+    def __init__(self, weights: List[Tuple[np.ndarray, np.ndarray]], action_w: np.ndarray, action_b: np.ndarray,
+                 activation: str = DEFAULT_ACTIVATION, version: str = None):
+        # Stored transposed so the forward pass is obs @ W
+        self.layers = [(np.ascontiguousarray(w.T), b) for w, b in weights]
+        self.action_w = np.ascontiguousarray(action_w.T)
+        self.action_b = action_b
+        self.activation_name = activation
+        self.activation = ACTIVATIONS[activation]
+        self.version = version
+        self.obs_dim = self.layers[0][0].shape[0] if self.layers else self.action_w.shape[0]
+        self.n_actions = self.action_w.shape[1]
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "NumpyPolicy":
+        n_layers = sum(1 for key in arrays if re.fullmatch(r'w\d+', key))
+        return cls(
+            [(arrays[f"w{i}"], arrays[f"b{i}"]) for i in range(n_layers)],
+            arrays["action_w"], arrays["action_b"],
+            activation=str(arrays["activation"]), version=str(arrays["source_fingerprint"])
+        )
+
+    @classmethod
+    def load(cls, checkpoint: str) -> "NumpyPolicy":
+        """Loads <checkpoint>.npz, re-exporting it first if it is missing or older than the checkpoint zip."""
+        npz_path = default_npz_path(checkpoint)
+        if os.path.exists(npz_path):
+            with np.load(npz_path) as npz:
+                arrays = dict(npz)
+            if not os.path.exists(checkpoint) or str(arrays["source_fingerprint"]) == file_fingerprint(checkpoint):
+                return cls.from_arrays(arrays)
+        return cls.from_arrays(export_policy(checkpoint, npz_path))
+
+    def predict_actions(self, observations) -> Tuple[np.ndarray, np.ndarray]:
+        x = np.asarray(observations, dtype=np.float32).reshape(-1, self.obs_dim)
+        for w, b in self.layers:
+            x = self.activation(x @ w + b)
+        logits = x @ self.action_w + self.action_b
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return probabilities.argmax(axis=1), probabilities
+
+
+def check_parity(checkpoint: str, samples: int = 2000, seed: int = 0) -> Dict[str, float]:
+    """Compares NumpyPolicy with SB3's policy on random observations (needs stable_baselines3 + torch)."""
+    import torch
+    from stable_baselines3 import PPO
+
+    agent = PPO.load(checkpoint)
+    policy = NumpyPolicy.load(checkpoint)
+    rng = np.random.default_rng(seed)
+    observations = np.stack([
+        rng.uniform(50, 20000, samples), rng.integers(0, 3, samples), rng.uniform(3, 60, samples)
+    ], axis=1).astype(np.float32)
+    with torch.no_grad():
+        expected = agent.policy.get_distribution(torch.as_tensor(observations)).distribution.probs.numpy()
+    sb3_actions, _ = agent.predict(observations, deterministic=True)
+    actions, probabilities = policy.predict_actions(observations)
+    return {
+        "samples": samples,
+        "max_abs_prob_diff": float(np.abs(probabilities - expected).max()),
+        "action_agreement": float((actions == sb3_actions).mean())
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a PPO checkpoint's actor to NumPy and check parity with SB3.")
+    parser.add_argument("--checkpoint", default="rl_env/ppo_hirl_agent.zip", help="SB3 PPO checkpoint zip.")
+    parser.add_argument("--output", default=None, help="Output .npz (default: next to the checkpoint).")
+    parser.add_argument("--check", action="store_true", help="Also compare against stable_baselines3 (requires torch).")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    arrays = export_policy(args.checkpoint, args.output)
+    shapes = {key: list(value.shape) for key, value in arrays.items() if value.ndim}
+    print(f"Exported {args.checkpoint} in {time.perf_counter() - started:.3f}s "
+          f"(activation {arrays['activation']}): {shapes}")
+    if args.check:
+        print(json.dumps(check_parity(args.checkpoint), indent=2))
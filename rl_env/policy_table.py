@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rl_env.numpy_policy import NumpyPolicy
+
+# --- Precomputed policy lookup table ---
+# The PPO observation is [plot_size, location, road_width] inside ComplexEnv's box
+# (0-10000 sq.m, location 0/1/2, 0-100 m). The table evaluates the policy once per checkpoint
+# over a dense grid (plot_points x 3 locations x road_points) and serving interpolates the stored
+# action probabilities instead of running the network. Observations outside the box go to the
+# network, so the table never extrapolates.
+OBSERVATION_LOW = (0.0, 0.0, 0.0)
+OBSERVATION_HIGH = (10000.0, 2.0, 100.0)
+N_LOCATIONS = 3
+LOOKUP_MODES = ("linear", "nearest")
+
+
+def default_table_path(checkpoint: str) -> str:
+    return os.path.splitext(checkpoint)[0] + "_table.npz"
+
+
+class PolicyTable:
+    """
+    Action probabilities of a policy on a regular (plot_size, location, road_width) grid.
+
+    `predict_actions` has the same contract as NumpyPolicy (one observation or a batch in;
+    actions and probabilities out), so it drops into main_pipeline.predict_rl_actions.
+    "linear" interpolates probabilities bilinearly over plot size and road width within the
+    location's slice; "nearest" returns the closest grid cell.
+    """
+    def __init__(self, plot_axis: np.ndarray, road_axis: np.ndarray, probabilities: np.ndarray,
+                 mode: str = "linear", version: str = None, fallback: NumpyPolicy = None):
+        if mode not in LOOKUP_MODES:
+            raise ValueError(f"Unknown lookup mode '{mode}', expected one of {LOOKUP_MODES}.")
+        self.plot_axis = plot_axis
+        self.road_axis = road_axis
+        # (plot_points, locations, road_points, n_actions); float16 on disk, float32 in memory
+        # so lookups do no per-call conversion
+        self.probabilities = probabilities.astype(np.float32)
+        self._plot_scale = (len(plot_axis) - 1) / float(plot_axis[-1] - plot_axis[0])
+        self._road_scale = (len(road_axis) - 1) / float(road_axis[-1] - road_axis[0])
+        self.mode = mode
+        self.version = version
+        self.fallback = fallback
+        self.n_actions = probabilities.shape[-1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.probabilities.nbytes + self.plot_axis.nbytes + self.road_axis.nbytes
+
+    # --- Build / persist ---
+    @classmethod
+    def build(cls, policy: NumpyPolicy, plot_points: int = 501, road_points: int = 201,
+              mode: str = "linear", chunk_size: int = 200000) -> "PolicyTable":
+        """Evaluates `policy` on every grid cell, in stacked batches of `chunk_size` observations."""
+        plot_axis = np.linspace(OBSERVATION_LOW[0], OBSERVATION_HIGH[0], plot_points, dtype=np.float32)
+        road_axis = np.linspace(OBSERVATION_LOW[2], OBSERVATION_HIGH[2], road_points, dtype=np.float32)
+        grid = np.stack(np.meshgrid(
+            plot_axis, np.arange(N_LOCATIONS, dtype=np.float32), road_axis, indexing="ij"
+        ), axis=-1).reshape(-1, 3)
+        probabilities = np.empty((len(grid), policy.n_actions), dtype=np.float16)
+        for start in range(0, len(grid), chunk_size):
+            probabilities[start:start + chunk_size] = policy.predict_actions(grid[start:start + chunk_size])[1]
+        probabilities = probabilities.reshape(plot_points, N_LOCATIONS, road_points, policy.n_actions)
+        return cls(plot_axis, road_axis, probabilities, mode=mode, version=policy.version, fallback=policy)
+
+    def save(self, path: str):
+        np.savez(path, plot_axis=self.plot_axis, road_axis=self.road_axis, probabilities=self.probabilities.astype(np.float16),
+                 mode=np.array(self.mode), source_fingerprint=np.array(self.version or ""))
+
+    @classmethod
+    def load(cls, checkpoint: str, mode: str = None, plot_points: int = None, road_points: int = None) -> "PolicyTable":
+        """
+        Loads <checkpoint>_table.npz, rebuilding it (and saving it if the filesystem allows) when it
+        is missing, was built for another checkpoint, or has a different grid than requested.
+        """
+        if plot_points is None:
+            plot_points = int(os.getenv("RL_TABLE_PLOT_POINTS", "501"))
+        if road_points is None:
+            road_points = int(os.getenv("RL_TABLE_ROAD_POINTS", "201"))
+        if mode is None:
+            mode = os.getenv("RL_TABLE_MODE", "linear")
+        policy = NumpyPolicy.load(checkpoint)
+        path = default_table_path(checkpoint)
+        if os.path.exists(path):
+            with np.load(path) as npz:
+                arrays = dict(npz)
+            if (str(arrays["source_fingerprint"]) == (policy.version or "")
+                    and arrays["probabilities"].shape[:3] == (plot_points, N_LOCATIONS, road_points)):
+                return cls(arrays["plot_axis"], arrays["road_axis"], arrays["probabilities"],
+                           mode=mode, version=policy.version, fallback=policy)
+        table = cls.build(policy, plot_points, road_points, mode=mode)
+        try:
+            table.save(path)
+        except OSError as e:
+            print(f"Warning: could not write {path}: {e}")
+        return table
+
+    # --- Lookup ---
+    def lookup_one(self, plot_size: float, location: float, road_width: float) -> np.ndarray:
+        """Probabilities (n_actions,) for one in-box observation; plain-float arithmetic for the per-case path."""
+        location = min(max(int(round(location)), 0), N_LOCATIONS - 1)
+        plot = (plot_size - OBSERVATION_LOW[0]) * self._plot_scale
+        road = (road_width - OBSERVATION_LOW[2]) * self._road_scale
+        if self.mode == "nearest":
+            return self.probabilities[int(plot + 0.5), location, int(road + 0.5)]
+        i = min(int(plot), len(self.plot_axis) - 2)
+        j = min(int(road), len(self.road_axis) - 2)
+        pw, rw = plot - i, road - j
+        corners = self.probabilities[i:i + 2, location, j:j + 2]
+        return (1 - pw) * ((1 - rw) * corners[0, 0] + rw * corners[0, 1]) + pw * ((1 - rw) * corners[1, 0] + rw * corners[1, 1])
+
+    def lookup(self, observations: np.ndarray) -> np.ndarray:
+        """Probabilities (n, n_actions) for in-box observations (n, 3)."""
+        plot = (observations[:, 0] - OBSERVATION_LOW[0]) * self._plot_scale
+        location = np.clip(np.rint(observations[:, 1]), 0, N_LOCATIONS - 1).astype(np.intp)
+        road = (observations[:, 2] - OBSERVATION_LOW[2]) * self._road_scale
+        if self.mode == "nearest":
+            return self.probabilities[np.rint(plot).astype(np.intp), location, np.rint(road).astype(np.intp)]
+
+        p0 = np.minimum(np.floor(plot).astype(np.intp), len(self.plot_axis) - 2)
+        r0 = np.minimum(np.floor(road).astype(np.intp), len(self.road_axis) - 2)
+        pw = (plot - p0)[:, None].astype(np.float32)
+        rw = (road - r0)[:, None].astype(np.float32)
+        table = self.probabilities
+        return (
+            (1 - pw) * ((1 - rw) * table[p0, location, r0] + rw * table[p0, location, r0 + 1])
+            + pw * ((1 - rw) * table[p0 + 1, location, r0] + rw * table[p0 + 1, location, r0 + 1])
+        )
+
+    def predict_actions(self, observations) -> Tuple[np.ndarray, np.ndarray]:
+        observations = np.asarray(observations, dtype=np.float32).reshape(-1, 3)
+        if len(observations) == 1:
+            plot_size, location, road_width = observations[0].tolist()
+            if (OBSERVATION_LOW[0] <= plot_size <= OBSERVATION_HIGH[0] and OBSERVATION_LOW[1] <= location <= OBSERVATION_HIGH[1]
+                    and OBSERVATION_LOW[2] <= road_width <= OBSERVATION_HIGH[2]):
+                probabilities = self.lookup_one(plot_size, location, road_width)[None, :]
+                return probabilities.argmax(axis=1), probabilities
+        inside = np.all((observations >= OBSERVATION_LOW) & (observations <= OBSERVATION_HIGH), axis=1)
+        if inside.all() or self.fallback is None:
+            clipped = np.clip(observations, OBSERVATION_LOW, OBSERVATION_HIGH)
+            probabilities = self.lookup(clipped)
+        else:
+            probabilities = np.empty((len(observations), self.n_actions), dtype=np.float32)
+            if inside.any():
+                probabilities[inside] = self.lookup(observations[inside])
+            probabilities[~inside] = self.fallback.predict_actions(observations[~inside])[1]
+        return probabilities.argmax(axis=1), probabilities
+
+
+# --- Evaluation ---
+def random_observations(samples: int, seed: int = 0) -> np.ndarray:
+    """Uniform in-box observations (integer locations)."""
+    rng = np.random.default_rng(seed)
+    return np.stack([
+        rng.uniform(OBSERVATION_LOW[0], OBSERVATION_HIGH[0], samples),
+        rng.integers(0, N_LOCATIONS, samples),
+        rng.uniform(OBSERVATION_LOW[2], OBSERVATION_HIGH[2], samples)
+    ], axis=1).astype(np.float32)
+
+
+def evaluate(table: PolicyTable, policy: NumpyPolicy, samples: int = 100000, iterations: int = 2000) -> Dict[str, float]:
+    """Agreement with the live network and lookup latency, against the network's own latency."""
+    observations = random_observations(samples)
+    table_actions, table_probabilities = table.predict_actions(observations)
+    network_actions, network_probabilities = policy.predict_actions(observations)
+
+    def latency_ms(fn, batch):
+        fn(batch)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn(batch)
+        return (time.perf_counter() - started) / iterations * 1e3
+
+    single, batch = observations[:1], observations[:256]
+    return {
+        "samples": samples,
+        "agreement": round(float((table_actions == network_actions).mean()), 5),
+        "mean_abs_prob_diff": round(float(np.abs(table_probabilities - network_probabilities).max(axis=1).mean()), 5),
+        "max_abs_prob_diff": round(float(np.abs(table_probabilities - network_probabilities).max()), 5),
+        "lookup_single_ms": round(latency_ms(table.predict_actions, single), 4),
+        "network_single_ms": round(latency_ms(policy.predict_actions, single), 4),
+        "lookup_batch_256_ms": round(latency_ms(table.predict_actions, batch), 4),
+        "network_batch_256_ms": round(latency_ms(policy.predict_actions, batch), 4)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the RL decision lookup table for a PPO checkpoint.")
+    parser.add_argument("--checkpoint", default="rl_env/ppo_hirl_agent.zip", help="SB3 PPO checkpoint zip.")
+    parser.add_argument("--plot-points", type=int, default=501, help="Grid points over plot size 0-10000 sq.m.")
+    parser.add_argument("--road-points", type=int, default=201, help="Grid points over road width 0-100 m.")
+    parser.add_argument("--mode", choices=LOOKUP_MODES, default="linear", help="Lookup between grid points.")
+    parser.add_argument("--samples", type=int, default=100000, help="Random observations for the agreement check.")
+    args = parser.parse_args()
+
+    policy = NumpyPolicy.load(args.checkpoint)
+    started = time.perf_counter()
+    table = PolicyTable.build(policy, args.plot_points, args.road_points, mode=args.mode)
+    build_s = time.perf_counter() - started
+    table.save(default_table_path(args.checkpoint))
+
+    report = {
+        "grid": [args.plot_points, N_LOCATIONS, args.road_points],
+        "mode": args.mode,
+        "table_bytes": table.nbytes,
+        "file_bytes": os.path.getsize(default_table_path(args.checkpoint)),
+        "build_s": round(build_s, 3)
+    }
+    report.update(evaluate(table, policy, samples=args.samples))
+    print(json.dumps(report, indent=2))
@@ -1,61 +1,97 @@
+import argparse
 import json
 import numpy as np
 import os
 from stable_baselines3 import PPO
 
 # --- Import our Human-in-the-Loop environment ---
-from complex_env import ComplexEnv
-
-# 1. Create the environment
-env = ComplexEnv()
-
-# 2. --- UPGRADE: Define a more powerful agent architecture ---
-# We'll give the agent a bigger "brain" with two hidden layers of 128 neurons each.
-policy_kwargs = dict(net_arch=dict(pi=[128, 128], vf=[128, 128]))
-
-# We create the agent with the new brain and encourage it to be more "curious"
-# The `ent_coef` parameter rewards the agent for exploring different actions.
-agent = PPO(
-    "MlpPolicy", 
-    env, 
-    policy_kwargs=policy_kwargs, 
-    ent_coef=0.01, # Entropy coefficient to encourage exploration
-    verbose=0
-) 
-
-# 3. Train the new, smarter agent
-print("\n--- Starting HIRL Training with Advanced Agent (100k steps)... ---")
-agent.learn(total_timesteps=100000)
-print("--- Training Complete. ---")
-
-# 4. Save the final, human-guided model
-output_path = "rl_env/ppo_hirl_agent.zip"
-agent.save(output_path)
-print(f"Human-in-the-Loop trained agent saved to {output_path}")
-
-# 5. Test the newly trained agent on the original "textbook" cases
-print("\n--- Testing Trained Agent on Original Oracle Cases ---")
-oracle_file = "rl_env/oracle_data.json"
-if os.path.exists(oracle_file):
-    with open(oracle_file, 'r') as f:
-        oracle_cases = json.load(f)
+from vec_envs import VEC_ENV_KINDS, make_complex_vec_env, timed_learn
+from complex_env import load_training_data
+from feedback_store import FeedbackSampleStore
+
+
+# Kept under a __main__ guard: SubprocVecEnv workers re-import this module when they start
+# (spawn / forkserver), and must not re-run the training.
+def main():
+    parser = argparse.ArgumentParser(description="Train the HIRL PPO agent on ComplexEnv.")
+    parser.add_argument("--n-envs", type=int, default=1, help="Parallel ComplexEnv copies.")
+    parser.add_argument("--vec-env", choices=VEC_ENV_KINDS, default="dummy",
+                        help="dummy (in-process), subproc (one process per env) or batch (NumPy-vectorized).")
+    parser.add_argument("--timesteps", type=int, default=100000, help="Total environment steps.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the envs and the agent.")
+    parser.add_argument("--output", default="rl_env/ppo_hirl_agent.zip", help="Where to save the trained agent.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Continue training the agent at --output on feedback rows it has not seen yet.")
+    args = parser.parse_args()
+
+    # 1. Create the environment (N seeded copies). The feedback store remembers how many rows
+    # each saved agent trained on, so an incremental run only loads the rows added since.
+    store = FeedbackSampleStore()
+    consumer = os.path.basename(args.output)
+    since_row = store.checkpoint(consumer) if args.incremental else 0
+    training_data = load_training_data(store, since_row=since_row)
+    if args.incremental and training_data.n_human == 0:
+        print(f"No new feedback since {args.output} was trained ({store.rows} rows). Nothing to do.")
+        return
+    env = make_complex_vec_env(args.n_envs, args.vec_env, seed=args.seed, training_data=training_data)
+
+    # 2. --- UPGRADE: Define a more powerful agent architecture ---
+    # We'll give the agent a bigger "brain" with two hidden layers of 128 neurons each.
+    policy_kwargs = dict(net_arch=dict(pi=[128, 128], vf=[128, 128]))
+
+    # We create the agent with the new brain and encourage it to be more "curious"
+    # The `ent_coef` parameter rewards the agent for exploring different actions.
+    if args.incremental:
+        agent = PPO.load(args.output, env=env, seed=args.seed)
+        print(f"Continuing {args.output} on feedback rows {since_row}-{store.rows}.")
+    else:
+        agent = PPO(
+            "MlpPolicy", 
+            env, 
+            policy_kwargs=policy_kwargs, 
+            ent_coef=0.01, # Entropy coefficient to encourage exploration
+            seed=args.seed,
+            verbose=0
+        ) 
+
+    # 3. Train the new, smarter agent
+    print(f"\n--- Starting HIRL Training with Advanced Agent ({args.timesteps} steps)... ---")
+    timed_learn(agent, args.timesteps)
+    print("--- Training Complete. ---")
+
+    # 4. Save the final, human-guided model
+    output_path = args.output
+    agent.save(output_path)
+    store.set_checkpoint(consumer, since_row + training_data.n_human)
+    print(f"Human-in-the-Loop trained agent saved to {output_path}")
+
+    # 5. Test the newly trained agent on the original "textbook" cases
+    print("\n--- Testing Trained Agent on Original Oracle Cases ---")
+    oracle_file = "rl_env/oracle_data.json"
+    if os.path.exists(oracle_file):
+        with open(oracle_file, 'r') as f:
+            oracle_cases = json.load(f)
     
-    correct_count = 0
-    test_cases = oracle_cases[:10] # Test on the first 10 cases
+        correct_count = 0
+        test_cases = oracle_cases[:10] # Test on the first 10 cases
 
-    for case in test_cases:
-        obs = np.array(case["state"]).astype(np.float32)
-        action, _ = agent.predict(obs, deterministic=True)
-        correct_action = case["correct_action"]
+        for case in test_cases:
+            obs = np.array(case["state"]).astype(np.float32)
+            action, _ = agent.predict(obs, deterministic=True)
+            correct_action = case["correct_action"]
         
-        if action == correct_action:
-            correct_count += 1
+            if action == correct_action:
+                correct_count += 1
         
-        print(f"  - For state={case['state']}, Agent chose: {action}, Correct was: {correct_action}")
+            print(f"  - For state={case['state']}, Agent chose: {action}, Correct was: {correct_action}")
     
-    if test_cases:
-        accuracy = (correct_count / len(test_cases)) * 100
-        print(f"\n>>> Agent Accuracy on Oracle Cases: {accuracy:.1f}% <<<")
-else:
-    print("Could not find oracle_data.json to run final tests.")
+        if test_cases:
+            accuracy = (correct_count / len(test_cases)) * 100
+            print(f"\n>>> Agent Accuracy on Oracle Cases: {accuracy:.1f}% <<<")
+    else:
+        print("Could not find oracle_data.json to run final tests.")
+
+
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import time
+
+import numpy as np
+from stable_baselines3.common.env_util import make_vec_env
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv, VecEnv, VecMonitor
+
+from complex_env import ComplexEnv, load_training_data
+
+VEC_ENV_KINDS = ("dummy", "subproc", "batch")
+
+
+class ComplexBatchEnv(VecEnv):
+    """
+    `n_envs` ComplexEnv copies stepped as one NumPy batch instead of N Python env objects.
+
+    Every ComplexEnv episode is a single step, so a batch step is: look up the reward of each
+    env's action for its current case (one TrainingData lookup), then draw the next `n_envs`
+    cases with one `integers` call. All envs finish every step; the finished observation is
+    reported as `terminal_observation`, as SB3's own VecEnvs do.
+    """
+    def __init__(self, n_envs: int, training_cases=None, seed: int = None, training_data=None):
+        template = ComplexEnv(training_cases, verbose=False, training_data=training_data)
+        self._template = template
+        self.data = template.data
+        self.render_mode = None
+        super().__init__(n_envs, template.observation_space, template.action_space)
+        self._rng = np.random.default_rng(seed)
+        self._indices = self._rng.integers(len(self.data), size=n_envs)
+        self._actions = None
+
+    def reset(self):
+        if self._seeds[0] is not None:
+            self._rng = np.random.default_rng(self._seeds[0])
+            self._reset_seeds()
+        self._indices = self._rng.integers(len(self.data), size=self.num_envs)
+        return self.data.observations(self._indices)
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self):
+        rewards = self.data.action_rewards(self._indices, self._actions)
+        terminal = self.data.observations(self._indices)
+        self._indices = self._rng.integers(len(self.data), size=self.num_envs)
+        dones = np.ones(self.num_envs, dtype=bool)
+        infos = [{"terminal_observation": observation} for observation in terminal]
+        return self.data.observations(self._indices), rewards, dones, infos
+
+    def close(self):
+        return
+
+    # --- VecEnv plumbing: there are no per-env objects to delegate to ---
+    # Attributes live on the batch env; methods are called on the one template ComplexEnv
+    # (the envs share its spaces, data and render_mode, but not its current case)
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name)] * len(self._get_indices(indices))
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        method = getattr(self._template, method_name)
+        return [method(*method_args, **method_kwargs) for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False] * len(self._get_indices(indices))
+
+
+def make_complex_vec_env(n_envs: int = 1, kind: str = "dummy", seed: int = None, training_data=None) -> VecEnv:
+    """
+    ComplexEnv vectorized `n_envs` ways: "dummy" (in-process loop), "subproc" (one process
+    per env) or "batch" (ComplexBatchEnv). The training data (load_training_data, unless given)
+    is loaded once and handed to every copy; subprocess workers receive only its feedback store
+    path and row range and memory-map the rows themselves. Episode rewards are still logged
+    (Monitor per env, VecMonitor for the batch).
+    """
+    if kind not in VEC_ENV_KINDS:
+        raise ValueError(f"Unknown vec env '{kind}', expected one of {VEC_ENV_KINDS}.")
+    if training_data is None:
+        training_data = load_training_data()
+    if kind == "batch":
+        env = VecMonitor(ComplexBatchEnv(n_envs, seed=seed, training_data=training_data))
+    else:
+        env = make_vec_env(
+            ComplexEnv, n_envs=n_envs, seed=seed,
+            env_kwargs={"training_data": training_data, "verbose": False},
+            vec_env_cls=SubprocVecEnv if kind == "subproc" else DummyVecEnv
+        )
+    print(f"ComplexEnv x{n_envs} ({kind}) over {len(training_data)} training cases "
+          f"({training_data.n_human} from human feedback).")
+    return env
+
+
+def timed_learn(agent, total_timesteps: int):
+    """Runs agent.learn and reports environment steps per second."""
+    started = time.perf_counter()
+    agent.learn(total_timesteps=total_timesteps)
+    elapsed = time.perf_counter() - started
+    print(f"--- Trained {agent.num_timesteps} steps in {elapsed:.1f}s "
+          f"({agent.num_timesteps / elapsed:,.0f} steps/sec, {agent.n_envs} envs) ---")
+    return elapsed
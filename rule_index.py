@@ -0,0 +1,133 @@
+import threading
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional, Tuple
+
+Range = Optional[Tuple[float, float]]
+
+
+class _CityIndex:
+    """
+    Sorted-endpoint index over the road-width and plot-area ranges of one city's rules.
+
+    Immutable once built: it holds its own copy of the entries, and RuleIntervalIndex swaps in
+    a new instance after a write instead of mutating this one, so readers need no lock.
+    """
+    def __init__(self, entries: Dict[str, Dict[str, Any]]):
+        self.entries = entries
+        by_width = sorted((e["road_width"][0], rid) for rid, e in entries.items() if e["road_width"])
+        by_area = sorted((e["plot_area"][0], rid) for rid, e in entries.items() if e["plot_area"])
+        self.road_width_mins = [m for m, _ in by_width]
+        self.road_width_ids = [rid for _, rid in by_width]
+        self.plot_area_mins = [m for m, _ in by_area]
+        self.plot_area_ids = [rid for _, rid in by_area]
+
+    def width_matches(self, width: float) -> set:
+        """Ids with road_width_min <= width < road_width_max."""
+        cut = bisect_right(self.road_width_mins, width)
+        return {rid for rid in self.road_width_ids[:cut] if width < self.entries[rid]["road_width"][1]}
+
+    def area_matches(self, area: float) -> set:
+        """Ids with plot_area_min <= area <= plot_area_max."""
+        cut = bisect_right(self.plot_area_mins, area)
+        return {rid for rid in self.plot_area_ids[:cut] if area <= self.entries[rid]["plot_area"][1]}
+
+
+class RuleIntervalIndex:
+    """
+    In-memory, per-city index of structured rules by their road-width and plot-area ranges.
+
+    Answers the structured phase of ChromaDBClient.query_rules with the same semantics as the
+    Chroma `$and` where clause it replaces (a rule must carry every range being filtered on),
+    plus the legacy DatabaseQueryAgent "union of width / area / location matches" semantics.
+    Lookups return rule ids; the decoded rules live in rule_store.RuleStore.
+
+    Writes (add / remove, e.g. the query path's backfill of rules ingested by another process)
+    only touch the per-city entry dicts under the lock and mark the city dirty; the next lookup
+    builds a fresh _CityIndex snapshot from a copy and swaps it in, so lookups never iterate a
+    dict that is being changed.
+    """
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._snapshots: Dict[str, _CityIndex] = {}
+        self._dirty = set()
+        self._city_of: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def add(self, rule_id: str, city: str, road_width: Range = None, plot_area: Range = None, location: Any = None):
+        """
+        Adds or replaces a rule. Ranges are (min, max) tuples, or None when the rule has no such
+        condition; `location` is the rule's `conditions.location` (a string or a list of strings).
+        """
+        with self._lock:
+            self._remove_locked(rule_id)
+            self._entries.setdefault(city, {})[rule_id] = {"road_width": road_width, "plot_area": plot_area, "location": location}
+            self._dirty.add(city)
+            self._city_of[rule_id] = city
+
+    def remove(self, rule_id: str):
+        with self._lock:
+            self._remove_locked(rule_id)
+
+    def _remove_locked(self, rule_id: str):
+        city = self._city_of.pop(rule_id, None)
+        if city is not None:
+            self._entries[city].pop(rule_id, None)
+            self._dirty.add(city)
+
+    def _city(self, city: str) -> Optional[_CityIndex]:
+        if city in self._dirty:
+            with self._lock:
+                if city in self._dirty:
+                    self._snapshots[city] = _CityIndex(dict(self._entries[city]))
+                    self._dirty.discard(city)
+        return self._snapshots.get(city)
+
+    def query(self, city: str, road_width: Optional[float] = None, plot_area: Optional[float] = None,
+              limit: Optional[int] = None) -> List[str]:
+        """Ids of rules of `city` matching ALL of the given parameters (structured-filter semantics)."""
+        city_index = self._city(city)
+        if city_index is None:
+            return []
+        ids = None
+        if road_width is not None:
+            ids = city_index.width_matches(float(road_width))
+        if plot_area is not None:
+            area_ids = city_index.area_matches(float(plot_area))
+            ids = area_ids if ids is None else ids & area_ids
+        return self._collect(city_index, ids, limit)
+
+    def match_any(self, city: str, road_width: Optional[float] = None, plot_area: Optional[float] = None,
+                  location: Optional[str] = None) -> List[str]:
+        """Ids of rules of `city` matching ANY of the given parameters (legacy DatabaseQueryAgent semantics)."""
+        city_index = self._city(city)
+        if city_index is None:
+            return []
+        ids = set()
+        if road_width is not None:
+            ids |= city_index.width_matches(float(road_width))
+        if plot_area is not None:
+            ids |= city_index.area_matches(float(plot_area))
+        if location is not None:
+            for rid, entry in city_index.entries.items():
+                allowed = entry["location"]
+                if allowed == location or (isinstance(allowed, list) and location in allowed):
+                    ids.add(rid)
+        return self._collect(city_index, ids, None)
+
+    def city_ids(self, city: str) -> List[str]:
+        city_index = self._city(city)
+        return self._collect(city_index, None, None) if city_index else []
+
+    @staticmethod
+    def _collect(city_index: _CityIndex, ids: Optional[set], limit: Optional[int]) -> List[str]:
+        # Insertion order keeps results stable between calls
+        results = []
+        for rid in city_index.entries:
+            if ids is None or rid in ids:
+                results.append(rid)
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+    def __len__(self):
+        return len(self._city_of)
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+
+def decode_rule(meta: Dict[str, Any], doc: Optional[str], body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Reconstructs a rule object from its body (RuleBodyStore) or, for collections written before
+    the compact layout, the `full_json` metadata field, plus its stored document text.
+    """
+    rule_obj = {}
+    if body is not None:
+        rule_obj = dict(body)
+    elif "full_json" in meta:
+        try:
+            rule_obj = json.loads(meta["full_json"])
+        except: pass
+
+    if doc:
+        # Only overwrite 'notes' if this is a RawText chunk (unstructured)
+        # For structured rules, we prefer the AI-generated 'notes' (summary),
+        # but we attach the full text as 'source_evidence' for reference.
+        if rule_obj.get("rule_type") == "RawText":
+            rule_obj["notes"] = doc
+        else:
+            rule_obj["source_evidence"] = doc
+
+    # Inject page_number from metadata if available
+    if rule_obj and "page_number" in meta:
+        rule_obj["page_number"] = meta["page_number"]
+    return rule_obj
+
+
+class RuleStore:
+    """
+    Decoded rule objects keyed by rule id.
+
+    Each rule is decoded once (at startup or on upsert) and kept as a read-only mapping;
+    queries resolve ids to rules here instead of re-parsing stored JSON per hit.
+    """
+    def __init__(self):
+        self._rules: Dict[str, Mapping[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, rule_id: str, meta: Dict[str, Any], doc: Optional[str],
+            body: Optional[Dict[str, Any]] = None) -> Optional[Mapping[str, Any]]:
+        rule_obj = decode_rule(meta, doc, body)
+        if not rule_obj:
+            return None
+        frozen = MappingProxyType(rule_obj)
+        with self._lock:
+            self._rules[rule_id] = frozen
+        return frozen
+
+    def remove(self, rule_id: str):
+        with self._lock:
+            self._rules.pop(rule_id, None)
+
+    def get(self, rule_id: str) -> Optional[Mapping[str, Any]]:
+        return self._rules.get(rule_id)
+
+    def missing(self, rule_ids: Iterable[str]) -> List[str]:
+        return [rid for rid in rule_ids if rid not in self._rules]
+
+    def materialize(self, rule_ids: Iterable[str], seen: Optional[set] = None) -> List[Dict[str, Any]]:
+        """
+        Mutable copies of the rules for `rule_ids`, in order, skipping unknown ids and ids
+        already in `seen` (which is updated, so successive calls de-duplicate in O(1) per id).
+        """
+        if seen is None:
+            seen = set()
+        rules = []
+        for rid in rule_ids:
+            if rid in seen:
+                continue
+            rule = self._rules.get(rid)
+            if rule is not None:
+                seen.add(rid)
+                rules.append(dict(rule))
+        return rules
+
+    def __len__(self):
+        return len(self._rules)
+
+    def __contains__(self, rule_id: str):
+        return rule_id in self._rules
+
+
+def connect_immutable(path: str) -> sqlite3.Connection:
+    """Opens a SQLite file that never changes: no locking or journal, so it can be served from a read-only image layer."""
+    uri = Path(path).resolve().as_uri() + "?immutable=1"
+    return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+
+class RuleBodyStore:
+    """
+    Rule bodies (the full rule JSON) and their document text, zlib-compressed, in a small SQLite
+    file next to the Chroma collection. Chroma then only holds embeddings and the scalars queries
+    filter on, instead of a second copy of every rule (`full_json`), its `notes` and the page
+    text (plus Chroma's full-text index over it). Documents are stored once per distinct text,
+    since structured rules from one chunk share it.
+    """
+    FILENAME = "rule_bodies.sqlite3"
+
+    def __init__(self, directory: str, read_only: bool = False):
+        self.path = os.path.join(directory, self.FILENAME)
+        self._lock = threading.Lock()
+        if read_only:
+            self._conn = connect_immutable(self.path)
+            return
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rule_bodies (id TEXT PRIMARY KEY, body BLOB NOT NULL, doc_hash TEXT)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS documents (doc_hash TEXT PRIMARY KEY, text BLOB NOT NULL)")
+
+    @staticmethod
+    def _compress(text: str) -> bytes:
+        return zlib.compress(text.encode("utf-8"))
+
+    @staticmethod
+    def _decompress(blob: bytes) -> str:
+        return zlib.decompress(blob).decode("utf-8")
+
+    def put_many(self, rules: Dict[str, Dict[str, Any]], documents: Optional[Dict[str, Optional[str]]] = None):
+        """Stores rule bodies by id, with the document text per id from `documents`."""
+        documents = documents or {}
+        rows, texts = [], {}
+        for rule_id, rule in rules.items():
+            document = documents.get(rule_id)
+            doc_hash = None
+            if document:
+                doc_hash = hashlib.sha1(document.encode("utf-8")).hexdigest()
+                texts[doc_hash] = document
+            rows.append((rule_id, self._compress(json.dumps(rule, separators=(",", ":"))), doc_hash))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO documents (doc_hash, text) VALUES (?, ?)",
+                [(doc_hash, self._compress(text)) for doc_hash, text in texts.items()]
+            )
+            self._conn.executemany("INSERT OR REPLACE INTO rule_bodies (id, body, doc_hash) VALUES (?, ?, ?)", rows)
+
+    def _rows(self, where: str = "", params: Iterable[Any] = ()) -> Dict[str, Tuple[Dict[str, Any], Optional[str]]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT b.id, b.body, d.text FROM rule_bodies b LEFT JOIN documents d ON d.doc_hash = b.doc_hash " + where,
+                list(params)
+            ).fetchall()
+        return {
+            rule_id: (json.loads(self._decompress(body)), self._decompress(text) if text is not None else None)
+            for rule_id, body, text in rows
+        }
+
+    def get_many(self, rule_ids: Iterable[str]) -> Dict[str, Tuple[Dict[str, Any], Optional[str]]]:
+        """{rule id: (rule, document text)} for the ids that have a stored body."""
+        rule_ids = list(rule_ids)
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(rule_ids), 500):
+            chunk = rule_ids[start:start + 500]
+            found.update(self._rows(f"WHERE b.id IN ({','.join('?' * len(chunk))})", chunk))
+        return found
+
+    def all(self) -> Dict[str, Tuple[Dict[str, Any], Optional[str]]]:
+        return self._rows()
+
+    def delete_many(self, rule_ids: Iterable[str]):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM rule_bodies WHERE id = ?", [(rule_id,) for rule_id in rule_ids])
+            self._conn.execute("DELETE FROM documents WHERE doc_hash NOT IN (SELECT doc_hash FROM rule_bodies WHERE doc_hash IS NOT NULL)")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rule_bodies").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
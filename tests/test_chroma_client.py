@@ -0,0 +1,59 @@
+import sys
+import os
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import chroma_client
+from chroma_client import ChromaDBClient
+from result_cache import ResultCache
+
+RULES = [
+    {"id": "MUM-W-1", "city": "Mumbai", "rule_type": "FSI", "conditions": {"road_width_m": {"min": 0, "max": 9}}},
+    {"id": "MUM-W-2", "city": "Mumbai", "rule_type": "FSI", "conditions": {"road_width_m": {"min": 9, "max": 18}}},
+    {"id": "MUM-A-1", "city": "Mumbai", "rule_type": "FSI", "conditions": {"plot_area_sqm": {"min": 0, "max": 1499.8}}},
+    {"id": "MUM-A-2", "city": "Mumbai", "rule_type": "FSI", "conditions": {"plot_area_sqm": {"min": 1500, "max": 4000}}},
+]
+
+@pytest.fixture(autouse=True)
+def result_cache_db(monkeypatch, tmp_path):
+    monkeypatch.setenv("RESULT_CACHE_DB", str(tmp_path / "result_cache.db"))
+    return str(tmp_path / "result_cache.db")
+
+def write_rules(db, rules):
+    db.bodies.put_many({rule["id"]: rule for rule in rules}, {rule["id"]: rule["rule_type"] for rule in rules})
+    db.collection.upsert(ids=[rule["id"] for rule in rules], metadatas=[db._rule_metadata(rule) for rule in rules],
+                         embeddings=[[float(i), 1.0, 0.0] for i in range(len(rules))])
+
+def rule_db(tmp_path):
+    # Explicit embeddings, so no embedding model is needed; the reopened client indexes them
+    write_rules(ChromaDBClient(persist_directory=str(tmp_path / "chroma")), RULES)
+    return ChromaDBClient(persist_directory=str(tmp_path / "chroma"))
+
+def matched_ids(db, **parameters):
+    # n_results=1: a structured match fills the result, so the semantic fallback never runs
+    return [rule["id"] for rule in db.query_rules("Mumbai", parameters, n_results=1)]
+
+def test_values_just_below_a_rule_boundary_do_not_match_the_rule_above(tmp_path):
+    db = rule_db(tmp_path)
+
+    assert matched_ids(db, road_width_m=9.0) == ["MUM-W-2"]
+    assert matched_ids(db, road_width_m=8.96) == ["MUM-W-1"]
+    assert matched_ids(db, road_width_m=8.999999) == ["MUM-W-1"]
+    assert matched_ids(db, plot_area_sqm=1499.7) == ["MUM-A-1"]
+    assert matched_ids(db, plot_area_sqm=1500) == ["MUM-A-2"]
+    # Cached results are keyed on what matched, so repeats still agree with the exact lookup
+    assert matched_ids(db, road_width_m=8.96) == ["MUM-W-1"] and matched_ids(db, road_width_m=9.04) == ["MUM-W-2"]
+
+def test_rules_committed_elsewhere_are_indexed_once_the_rules_version_changes(tmp_path, result_cache_db, monkeypatch):
+    monkeypatch.setattr(chroma_client, "RULES_VERSION_CHECK_SECONDS", 0.0)
+    server = ChromaDBClient(persist_directory=str(tmp_path / "chroma"))
+    write_rules(server, RULES[:1])
+    server = ChromaDBClient(persist_directory=str(tmp_path / "chroma"))
+    assert matched_ids(server, road_width_m=5) == ["MUM-W-1"]
+
+    # An ingestion run commits a rule through its own client, then invalidates the result cache
+    write_rules(ChromaDBClient(persist_directory=str(tmp_path / "chroma")), RULES[1:2])
+    ResultCache(db_path=result_cache_db).invalidate_rules()
+    assert matched_ids(server, road_width_m=12) == ["MUM-W-2"]
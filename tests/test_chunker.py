@@ -0,0 +1,55 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chunker import PageChunker
+
+PAGE = """12.1 Marginal Open Spaces
+(a) For plots up to 300 sq. m. the front margin shall be 3 m from the road boundary.
+(b) For plots above 300 sq. m. the front margin shall be 4.5 m from the road boundary.
+TABLE 7
+Road width   Base FSI    Premium FSI
+Up to 9 m    1.1         0.5
+9 to 12 m    1.1         0.6
+Section 13: Height
+The maximum height of a building shall be governed by the width of the abutting road,
+subject to a maximum as stated in Regulation No 15.3.1, shall apply in all zones."""
+
+def test_chunks_follow_clauses_and_tables():
+    chunks = PageChunker(max_chars=400, min_chars=20).chunk(PAGE, page_number=45)
+
+    assert [chunk["clause"] for chunk in chunks] == ["12.1", "12.1(a)", "12.1(b)", "12.1(b)", "13"]
+    assert all(chunk["page_number"] == 45 for chunk in chunks)
+    # The table keeps its caption and rows together
+    assert chunks[3]["text"].startswith("TABLE 7\nRoad width")
+    assert chunks[3]["text"].endswith("0.6")
+    # A wrapped cross-reference is not mistaken for a new clause
+    assert "Regulation No 15.3.1" in chunks[4]["text"]
+
+def test_long_clause_split_with_overlap():
+    sentence = "The owner shall provide amenity space of ten percent of the plot area. "
+    chunks = PageChunker(max_chars=300, overlap_chars=60, min_chars=20).chunk("15.4.1 Amenity Space\n" + sentence * 12)
+
+    assert len(chunks) > 2
+    assert all(chunk["clause"] == "15.4.1" for chunk in chunks)
+    assert all(len(chunk["text"]) <= 300 + 60 for chunk in chunks)
+    # Each continuation repeats the tail of the previous chunk
+    assert chunks[1]["text"][:40] in chunks[0]["text"]
+
+def test_document_items_expand_raw_text_and_pick_evidence():
+    chunker = PageChunker(max_chars=400, min_chars=20)
+    raw = {"id": "RAW-CHUNK-1", "city": "Pune", "rule_type": "RawText", "conditions": {}, "entitlements": {}}
+    fsi = {"id": "PUN-FSI-007", "city": "Pune", "rule_type": "FSI",
+           "conditions": {"road_width_m": {"min": 9, "max": 12}}, "entitlements": {"premium_fsi": 0.6},
+           "notes": "Premium FSI 0.6 for 9 to 12 m roads."}
+
+    items = chunker.document_items({"page": 45, "content": PAGE}, [raw, fsi])
+
+    raw_items = [item for item in items if item["rule"]["rule_type"] == "RawText"]
+    assert [item["rule"]["id"] for item in raw_items] == [f"RAW-CHUNK-1-c{i}" for i in range(1, 6)]
+    assert raw_items[1]["rule"]["clause"] == "12.1(a)"
+    fsi_item = items[-1]
+    assert fsi_item["rule"]["id"] == "PUN-FSI-007"
+    assert fsi_item["source_text"].startswith("TABLE 7")
+    assert fsi_item["page_number"] == 45
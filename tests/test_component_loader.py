@@ -0,0 +1,47 @@
+import sys
+import os
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from component_loader import ComponentLoader, FAILED, READY
+
+def slow(value, seconds):
+    def load():
+        time.sleep(seconds)
+        return value
+    return load
+
+def test_components_load_concurrently_and_report_readiness():
+    loaded = {}
+    loader = ComponentLoader()
+    loader.register("rule_db", slow("db", 0.05), on_ready=lambda value: loaded.update(rule_db=value))
+    loader.register("rl_agent", slow("agent", 0.4), on_ready=lambda value: loaded.update(rl_agent=value))
+
+    started = time.perf_counter()
+    loader.start()
+    # The fast component is usable before the slow one finishes
+    assert loader.wait(["rule_db"], timeout=1.0)
+    assert loader.is_ready("rule_db") and not loader.is_settled()
+    assert loader.wait(timeout=2.0)
+    assert time.perf_counter() - started < 0.4 + 0.3  # concurrent, not 0.45 s serial plus slack
+
+    assert loaded == {"rule_db": "db", "rl_agent": "agent"}
+    status = loader.status()
+    assert status["rl_agent"]["state"] == READY and status["rl_agent"]["load_seconds"] >= 0.4
+
+def test_failed_component_settles_with_error():
+    def broken():
+        raise RuntimeError("no checkpoint")
+
+    loader = ComponentLoader()
+    loader.register("rl_agent", broken)
+    loader.start()
+
+    assert loader.wait(timeout=1.0)
+    assert loader.state("rl_agent") == FAILED
+    assert loader.status()["rl_agent"]["error"] == "no checkpoint"
+
+    # e.g. the model registry hot-loading a checkpoint trained after startup
+    loader.mark_recovered("rl_agent")
+    assert loader.is_ready("rl_agent") and loader.status()["rl_agent"]["error"] is None
@@ -0,0 +1,31 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from extraction_cache import ExtractionCache
+
+RULES = [{"id": "MUM-FSI-001", "city": "Mumbai", "rule_type": "FSI", "entitlements": {"total_fsi": 2.4}}]
+
+def test_key_depends_on_prompt_version_and_model():
+    key = ExtractionCache.make_key("p1", "gemini-2.5-flash", "Mumbai", "page text")
+
+    assert key == ExtractionCache.make_key("p1", "gemini-2.5-flash", "Mumbai", "page text")
+    assert key != ExtractionCache.make_key("p2", "gemini-2.5-flash", "Mumbai", "page text")
+    assert key != ExtractionCache.make_key("p1", "gemini-2.5-pro", "Mumbai", "page text")
+
+def test_counters_eviction_and_export_import(tmp_path):
+    cache = ExtractionCache(db_path=str(tmp_path / "a.db"), max_entries=2)
+    for i in range(3):
+        cache.put(f"k{i}", RULES, "p1", "gemini-2.5-flash")
+
+    assert cache.get("k2") == RULES
+    assert cache.get("missing") is None
+    assert cache.stats()["entries"] == 2
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+    export_path = str(tmp_path / "cache.jsonl.gz")
+    assert cache.export(export_path) == 2
+    shipped = ExtractionCache(db_path=str(tmp_path / "b.db"))
+    assert shipped.import_file(export_path) == 2
+    assert shipped.get("k2") == RULES
@@ -0,0 +1,77 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from extraction_scheduler import AIMDLimiter, ExtractionScheduler
+
+class FakeAgent:
+    """Stands in for RuleExtractionAgent: one rule per page, optional 429s before succeeding."""
+    offline_mode = False
+
+    def __init__(self, throttles=0):
+        self.throttles = throttles
+        self.batches = []
+        self.stored = {}
+
+    def cached(self, text, city):
+        return self.stored.get(text)
+
+    def store(self, text, city, rules):
+        self.stored[text] = rules
+
+    def call_single(self, text, city):
+        return self.call_batch([{"page": 0, "content": text}], city)[0]
+
+    def call_batch(self, pages, city):
+        if self.throttles:
+            self.throttles -= 1
+            raise RuntimeError("429 Resource exhausted")
+        self.batches.append([page["page"] for page in pages])
+        return {page["page"]: [{"id": f"R-{page['page']}", "city": city}] for page in pages}
+
+    def fallback_rules(self, city):
+        return [{"id": "FALLBACK-CHUNK-x", "city": city}]
+
+def make_pages(n, chars=400):
+    return [{"page": i + 1, "content": f"page {i + 1} " + "x" * chars} for i in range(n)]
+
+def test_aimd_limiter_halves_on_throttle_and_grows_additively():
+    limiter = AIMDLimiter(initial=8, maximum=16)
+    limiter.on_throttle()
+    assert int(limiter.limit) == 4
+    # +1/limit per success: roughly one extra slot per window of `limit` calls
+    for _ in range(5):
+        limiter.on_success()
+    assert int(limiter.limit) == 5
+
+def test_pages_packed_by_token_budget_and_split_back():
+    agent = FakeAgent()
+    # ~100 tokens per page: three pages fit a 350-token budget
+    scheduler = ExtractionScheduler(agent, "Mumbai", token_budget=350, max_batch_pages=8, backoff_base=0)
+    pages = make_pages(5) + [{"page": 6, "content": "short"}]
+
+    results = scheduler.extract_pages(pages)
+
+    assert agent.batches == [[1, 2, 3], [4, 5]]
+    assert [r[0]["id"] for r in results[:5]] == ["R-1", "R-2", "R-3", "R-4", "R-5"]
+    assert results[5] == []
+    # Second pass is served from the cache
+    scheduler.extract_pages(pages[:5])
+    assert scheduler.stats()["cached_pages"] == 5
+
+def test_throttling_retries_before_fallback():
+    agent = FakeAgent(throttles=2)
+    scheduler = ExtractionScheduler(agent, "Mumbai", token_budget=1000, max_retries=3, backoff_base=0,
+                                    limiter=AIMDLimiter(initial=4))
+
+    results = scheduler.extract_pages(make_pages(2))
+
+    stats = scheduler.stats()
+    assert [r[0]["id"] for r in results] == ["R-1", "R-2"]
+    assert (stats["retries"], stats["throttled"], stats["fallback_pages"]) == (2, 2, 0)
+    # 4 -> 2 -> 1 on the two 429s, then +1 for the successful call
+    assert stats["concurrency_limit"] == 2
+
+    agent.throttles = 10
+    assert scheduler.extract_pages(make_pages(1, chars=500))[0][0]["id"] == "FALLBACK-CHUNK-x"
@@ -0,0 +1,54 @@
+import json
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rl_env.feedback_store import FeedbackSampleStore, VOTE_DOWN, VOTE_UP
+
+def feedback_line(plot_size, location, road_width, action, vote):
+    record = {
+        "input": {"parameters": {"plot_size": plot_size, "location": location, "road_width": road_width}},
+        "output": {"rl_optimal_action": action},
+        "user_feedback": vote
+    }
+    return json.dumps(record) + "\n"
+
+def test_sync_only_parses_new_lines_and_survives_a_torn_append(tmp_path):
+    log_file = tmp_path / "feedback.jsonl"
+    log_file.write_text(feedback_line(1000, "urban", 12, 3, "up") + "not json\n" + '{"input": {}}\n')
+    store = FeedbackSampleStore(str(tmp_path), str(log_file))
+
+    assert store.sync() == 1
+    with open(log_file, "a") as f:
+        f.write(feedback_line(800, "rural", 9, 1, "down") + '{"partial": ')
+    assert store.sync() == 1
+    assert store.sync() == 0
+
+    # Bytes appended to the samples file but never committed to the sidecar are dropped on open
+    with open(store.samples_path, "ab") as f:
+        f.write(b"\0" * 7)
+    reopened = FeedbackSampleStore(str(tmp_path), str(log_file))
+    samples = reopened.samples()
+    assert reopened.rows == 2
+    assert samples["state"].tolist() == [[1000, 0, 12], [800, 2, 9]]
+    assert samples["action_taken"].tolist() == [3, 1]
+    assert samples["vote"].tolist() == [VOTE_UP, VOTE_DOWN]
+
+def test_append_record_and_consumer_checkpoints(tmp_path):
+    log_file = tmp_path / "feedback.jsonl"
+    store = FeedbackSampleStore(str(tmp_path), str(log_file))
+    for action in range(3):
+        line = feedback_line(500 + action, "suburban", 10, action, "up")
+        start = log_file.stat().st_size if log_file.exists() else 0
+        with open(log_file, "a") as f:
+            f.write(line)
+        store.append_record(json.loads(line), start, start + len(line))
+
+    store.set_checkpoint("agent.zip", 2)
+    reopened = FeedbackSampleStore(str(tmp_path), str(log_file))
+    assert reopened.sync() == 0
+    assert reopened.checkpoint("agent.zip") == 2
+    assert np.array_equal(reopened.samples(reopened.checkpoint("agent.zip"))["action_taken"], [2])
@@ -0,0 +1,29 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ingestion_manifest import IngestionManifest, COMMITTED, EXTRACTED, PENDING
+
+def test_changed_text_sends_page_back_to_pending(tmp_path):
+    manifest = IngestionManifest(db_path=str(tmp_path / "manifest.db"))
+    manifest.record_extraction("Mumbai:dcpr.pdf", 1, "FSI 1.5", [{"id": "R1"}])
+    assert manifest.page_state("Mumbai:dcpr.pdf", 1)["status"] == EXTRACTED
+
+    manifest.record_commit("Mumbai:dcpr.pdf", 1, ["R1"])
+    manifest.record_text("Mumbai:dcpr.pdf", 1, "FSI 1.5")
+    assert manifest.page_state("Mumbai:dcpr.pdf", 1)["status"] == COMMITTED
+
+    manifest.record_text("Mumbai:dcpr.pdf", 1, "FSI 2.0 (amended)")
+    state = manifest.page_state("Mumbai:dcpr.pdf", 1)
+    # Committed rule ids are kept until the re-extracted page is committed, so they can be cleaned up
+    assert state["status"] == PENDING and state["rule_ids"] == ["R1"]
+
+def test_removed_pages_return_their_rule_ids(tmp_path):
+    manifest = IngestionManifest(db_path=str(tmp_path / "manifest.db"))
+    for page, rule_id in [(1, "R1"), (2, "R2")]:
+        manifest.record_extraction("Pune:dcr.pdf", page, f"page {page}", [{"id": rule_id}])
+        manifest.record_commit("Pune:dcr.pdf", page, [rule_id])
+
+    assert manifest.remove_pages("Pune:dcr.pdf", keep_pages=[1]) == {"R2"}
+    assert manifest.referenced_rule_ids() == {"R1"}
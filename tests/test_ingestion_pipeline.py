@@ -0,0 +1,79 @@
+import sys
+import os
+import threading
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ingestion_pipeline
+from ingestion_manifest import IngestionManifest, COMMITTED
+from ingestion_pipeline import StreamingIngestion
+
+DOC_ID = "Mumbai:dcpr.pdf"
+
+
+class FakeDBClient:
+    def __init__(self):
+        self.committed, self.deleted = [], []
+
+    def add_rules_bulk(self, rules, documents=None, page_numbers=None, batch_size=None):
+        self.committed.extend(rule["id"] for rule in rules)
+        return len(rules)
+
+    def delete_rules(self, rule_ids):
+        self.deleted.extend(rule_ids)
+        return len(rule_ids)
+
+
+@pytest.fixture
+def db_client(monkeypatch, tmp_path):
+    client = FakeDBClient()
+    monkeypatch.setattr(ingestion_pipeline, "ChromaDBClient", lambda: client)
+    monkeypatch.setenv("RESULT_CACHE_DB", str(tmp_path / "result_cache.db"))
+    return client
+
+def page(number):
+    return {"page": number, "content": f"Regulation text of page {number}."}
+
+def ingestion(manifest, extracted_pages, **kwargs):
+    def extract_pages(batch):
+        extracted_pages.extend(p["page"] for p in batch)
+        return [[{"id": f"R{p['page']}", "rule_type": "FSI"}] for p in batch]
+    return StreamingIngestion("Mumbai", DOC_ID, extract_pages, manifest=manifest, extraction_workers=2,
+                              flush_seconds=0.05, progress_seconds=60, **kwargs)
+
+def test_resumes_extracted_pages_and_deletes_rules_of_removed_pages(db_client, tmp_path):
+    manifest = IngestionManifest(db_path=str(tmp_path / "manifest.db"))
+    manifest.record_extraction(DOC_ID, 1, page(1)["content"], [{"id": "R1", "rule_type": "FSI"}])
+    extracted = []
+
+    counters = ingestion(manifest, extracted).run([page(1), page(2)])
+    assert extracted == [2]  # page 1 was already extracted: committed without another LLM call
+    assert counters["pages_resumed"] == 1 and sorted(db_client.committed) == ["R1", "R2"]
+    assert manifest.page_state(DOC_ID, 1)["status"] == COMMITTED
+
+    counters = ingestion(manifest, extracted).run([page(1)])
+    assert counters["pages_skipped"] == 1 and db_client.deleted == ["R2"]
+
+def test_writer_failure_is_raised_instead_of_hanging_the_producers(monkeypatch, tmp_path):
+    def broken_client():
+        raise ConnectionError("chroma unavailable")
+    monkeypatch.setattr(ingestion_pipeline, "ChromaDBClient", broken_client)
+    manifest = IngestionManifest(db_path=str(tmp_path / "manifest.db"))
+    # Tiny queues: a dead writer would block the workers and the reader almost immediately
+    pipeline = ingestion(manifest, [], queue_size=1)
+    outcome = {}
+
+    def run():
+        try:
+            pipeline.run(page(number) for number in range(1, 50))
+        except Exception as e:
+            outcome["error"] = e
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert isinstance(outcome["error"], ConnectionError)
+    assert manifest.stats(DOC_ID).get(COMMITTED, 0) == 0
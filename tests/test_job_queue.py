@@ -0,0 +1,96 @@
+import sys
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from job_queue import JobManager, JobQueueFullError, CANCELLED, COMPLETED, QUEUED, RUNNING, TERMINAL_STATES
+
+def wait_for(manager, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["status"] in TERMINAL_STATES:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish: {manager.get(job_id)}")
+
+def test_unfinished_jobs_are_requeued_after_a_restart(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    # No workers: both jobs are still pending when the "process" stops
+    first = JobManager(handler=lambda payload: {}, db_path=db_path, max_workers=0)
+    first.start()
+    queued = first.submit({"case_id": "c1"})["job_id"]
+    interrupted = first.submit({"case_id": "c2"})["job_id"]
+    first.stop()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE jobs SET status = ? WHERE id = ?", (RUNNING, interrupted))
+
+    second = JobManager(handler=lambda payload: {"report_for": payload["case_id"]}, db_path=db_path, max_workers=1)
+    second.start()
+    try:
+        assert wait_for(second, queued)["result"] == {"report_for": "c1"}
+        assert wait_for(second, interrupted)["status"] == COMPLETED
+    finally:
+        second.stop()
+
+def test_cancelled_queued_jobs_free_their_slot_and_position(tmp_path):
+    manager = JobManager(handler=lambda payload: {}, db_path=str(tmp_path / "jobs.db"), max_workers=0, max_queue_depth=2)
+    manager.start()
+    first = manager.submit({"case_id": "c1"})["job_id"]
+    second = manager.submit({"case_id": "c2"})["job_id"]
+    with pytest.raises(JobQueueFullError):
+        manager.submit({"case_id": "c3"})
+
+    assert manager.cancel(first)["status"] == CANCELLED
+    assert manager.queue_depth() == 1
+    assert manager.get(second)["queue_position"] == 0
+    third = manager.submit({"case_id": "c3"})
+    assert third["status"] == QUEUED and third["queue_position"] == 1
+    manager.stop()
+
+def test_cancelling_a_running_job_discards_its_result(tmp_path):
+    started, release = threading.Event(), threading.Event()
+
+    def handler(payload):
+        started.set()
+        release.wait(5)
+        return {"report": "late"}
+    manager = JobManager(handler=handler, db_path=str(tmp_path / "jobs.db"), max_workers=1)
+    manager.start()
+    try:
+        job_id = manager.submit({"case_id": "c1"})["job_id"]
+        assert started.wait(5)
+        assert manager.cancel(job_id)["cancel_requested"] is True
+        release.set()
+        job = wait_for(manager, job_id)
+        assert job["status"] == CANCELLED and job["result"] is None
+    finally:
+        release.set()
+        manager.stop()
+
+def test_stop_finishes_the_running_job_and_leaves_queued_jobs_queued(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    started, release = threading.Event(), threading.Event()
+
+    def handler(payload):
+        started.set()
+        release.wait(5)
+        return {"report_for": payload["case_id"]}
+    manager = JobManager(handler=handler, db_path=db_path, max_workers=1)
+    manager.start()
+    running = manager.submit({"case_id": "c1"})["job_id"]
+    queued = [manager.submit({"case_id": f"c{i}"})["job_id"] for i in (2, 3)]
+    assert started.wait(5)
+    threading.Timer(0.2, release.set).start()
+    manager.stop()
+
+    with sqlite3.connect(db_path) as conn:
+        status = dict(conn.execute("SELECT id, status FROM jobs").fetchall())
+    # The running job still recorded its result; the queued ones wait for the next start
+    assert status[running] == COMPLETED
+    assert [status[job_id] for job_id in queued] == [QUEUED, QUEUED]
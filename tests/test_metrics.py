@@ -0,0 +1,79 @@
+import sys
+import os
+import json
+import logging
+import concurrent.futures
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from logging_config import JsonFormatter, logger
+from metrics import Histogram, MetricsRegistry, span, submit_in_context, trace
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(JsonFormatter())
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(json.loads(self.format(record)))
+
+
+@pytest.fixture
+def log_records():
+    handler = RecordingHandler()
+    logger.addHandler(handler)
+    yield handler.records
+    logger.removeHandler(handler)
+
+def test_histogram_buckets_are_cumulative_and_quantiles_use_recent_values():
+    histogram = Histogram(buckets=(0.1, 1.0), reservoir_size=4)
+    for value in (0.05, 0.5, 0.5, 5.0, 0.2, 0.3):
+        histogram.observe(value)
+
+    assert histogram.bucket_counts == [1, 5] and histogram.count == 6
+    assert histogram.sum == pytest.approx(6.55)
+    # Only the last four observations are kept for the quantiles
+    assert histogram.quantiles((0.5,)) == {0.5: pytest.approx(0.4)}
+    assert Histogram().quantiles() == {0.5: 0.0, 0.95: 0.0, 0.99: 0.0}
+
+def test_prometheus_exposition_lists_buckets_quantiles_and_gauges():
+    registry = MetricsRegistry()
+    registry.observe("chroma.semantic", 0.02)
+    registry.observe("chroma.semantic", 0.2)
+    lines = registry.render_prometheus({"job_queue_depth": 3}).splitlines()
+
+    assert 'compliance_stage_duration_seconds_bucket{stage="chroma.semantic",le="0.025"} 1' in lines
+    assert 'compliance_stage_duration_seconds_bucket{stage="chroma.semantic",le="+Inf"} 2' in lines
+    assert 'compliance_stage_duration_seconds_count{stage="chroma.semantic"} 2' in lines
+    assert 'compliance_stage_duration_quantile_seconds{stage="chroma.semantic",quantile="0.5"} 0.110000' in lines
+    assert lines[-2:] == ["# TYPE job_queue_depth gauge", "job_queue_depth 3"]
+    assert registry.summary()["chroma.semantic"]["count"] == 2
+
+def test_spans_nest_under_the_case_trace_across_threads(log_records):
+    def embed():
+        with span("chroma.embed"):
+            pass
+    with trace("case-7") as trace_id:
+        with span("pipeline.total") as total_id:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+                submit_in_context(executor, embed).result()
+            with span("pipeline.geometry"):
+                logger.info("geometry done")
+    with span("index.build"):
+        pass
+
+    spans = {record["span"]["stage"]: record for record in log_records if "span" in record}
+    assert spans["pipeline.geometry"]["span"]["parent_span_id"] == total_id
+    assert spans["chroma.embed"]["span"]["parent_span_id"] == total_id
+    assert spans["pipeline.total"]["span"]["parent_span_id"] is None
+    assert {spans[stage]["span"]["trace_id"] for stage in ("pipeline.total", "pipeline.geometry", "chroma.embed")} == {trace_id}
+    # Spans that are not given the case id (here, in a worker thread too) still carry the trace's
+    assert spans["chroma.embed"]["case"] == spans["pipeline.geometry"]["case"] == {"case_id": "case-7"}
+    message = next(record for record in log_records if record["message"] == "geometry done")
+    assert message["case_id"] == "case-7" and message["trace_id"] == trace_id
+    # Outside the trace nothing is attached
+    assert spans["index.build"]["span"]["trace_id"] is None and "case" not in spans["index.build"]
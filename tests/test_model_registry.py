@@ -0,0 +1,51 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from model_registry import ModelRegistry
+
+def write_checkpoint(path, content, mtime_ns):
+    path.write_text(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_new_checkpoint_is_swapped_in_once_it_settles(tmp_path):
+    checkpoint = tmp_path / "agent.zip"
+    write_checkpoint(checkpoint, "weights-v1", 1_000_000_000)
+    swaps = []
+    registry = ModelRegistry(str(checkpoint), lambda path: open(path).read(), on_swap=swaps.append, interval=0)
+    first = registry.load()
+
+    assert registry.check() is False
+    write_checkpoint(checkpoint, "weights-v2", 2_000_000_000)
+    assert registry.check() is False  # changed: waits a poll for the write to finish
+    assert registry.check() is True
+    assert [model.agent for model in swaps] == ["weights-v1", "weights-v2"]
+    assert registry.active.version != first.version and registry.previous == first
+
+    # Same content re-saved (new mtime, same hash): no reload
+    write_checkpoint(checkpoint, "weights-v2", 3_000_000_000)
+    assert registry.check() is False and registry.check() is False
+    assert len(swaps) == 2
+
+def test_broken_checkpoint_keeps_the_active_model_and_rollback_restores_the_previous(tmp_path):
+    checkpoint = tmp_path / "agent.zip"
+    write_checkpoint(checkpoint, "weights-v1", 1_000_000_000)
+
+    def load(path):
+        content = open(path).read()
+        if content == "truncated":
+            raise ValueError("bad zip")
+        return content
+    registry = ModelRegistry(str(checkpoint), load, interval=0)
+    registry.load()
+    write_checkpoint(checkpoint, "weights-v2", 2_000_000_000)
+    registry.check(), registry.check()
+
+    write_checkpoint(checkpoint, "truncated", 3_000_000_000)
+    registry.check(), registry.check()
+    assert registry.active.agent == "weights-v2" and registry.status()["last_error"] == "bad zip"
+
+    assert registry.rollback().agent == "weights-v1"
+    assert registry.check() is False  # pinned until a new checkpoint is written
+    assert registry.status()["previous_version"] == registry.previous.version
@@ -0,0 +1,49 @@
+import sys
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rl_env.numpy_policy import NumpyPolicy, check_parity
+
+CHECKPOINT = os.path.join(os.path.dirname(__file__), '..', 'rl_env', 'ppo_hirl_agent.zip')
+
+def test_export_and_batched_inference(tmp_path):
+    checkpoint = str(tmp_path / "agent.zip")
+    shutil.copy(CHECKPOINT, checkpoint)
+    policy = NumpyPolicy.load(checkpoint)
+
+    assert os.path.exists(tmp_path / "agent.npz")
+    assert policy.obs_dim == 3 and policy.n_actions == 5 and policy.activation_name == "Tanh"
+    observations = np.array([[1000, 0, 12], [250, 2, 6], [8000, 1, 30]], dtype=np.float32)
+    actions, probabilities = policy.predict_actions(observations)
+    assert actions.shape == (3,) and probabilities.shape == (3, 5)
+    assert np.allclose(probabilities.sum(axis=1), 1.0)
+    assert (actions == probabilities.argmax(axis=1)).all()
+    # A single observation gives the same answer as its row in the batch
+    single_action, single_probabilities = policy.predict_actions(observations[1])
+    assert single_action[0] == actions[1]
+    assert np.allclose(single_probabilities[0], probabilities[1], atol=1e-6)
+
+def test_stale_export_is_replaced(tmp_path):
+    checkpoint = str(tmp_path / "agent.zip")
+    shutil.copy(CHECKPOINT, checkpoint)
+    NumpyPolicy.load(checkpoint)
+    # Simulate a retrained checkpoint: the recorded fingerprint no longer matches
+    with np.load(tmp_path / "agent.npz") as npz:
+        arrays = dict(npz)
+    arrays["source_fingerprint"] = np.array("outdated")
+    np.savez(tmp_path / "agent.npz", **arrays)
+
+    policy = NumpyPolicy.load(checkpoint)
+    assert policy.version != "outdated"
+
+def test_parity_with_stable_baselines3():
+    pytest.importorskip("stable_baselines3")
+    parity = check_parity(CHECKPOINT, samples=500)
+
+    assert parity["max_abs_prob_diff"] < 1e-5
+    assert parity["action_agreement"] == 1.0
@@ -0,0 +1,25 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import fitz  # PyMuPDF
+from ocr_engine import OCREngine, score_text_layer
+
+def test_score_text_layer_flags_garbage_and_empty_pages():
+    assert score_text_layer("FSI of 1.5 on roads above 12 m")["garbage_ratio"] == 0.0
+    assert score_text_layer("���ab")["garbage_ratio"] == 0.6
+    assert score_text_layer("   \n")["chars"] == 0
+
+def test_digitally_born_pages_skip_ocr_in_page_order(tmp_path):
+    pdf_path = str(tmp_path / "rules.pdf")
+    with fitz.open() as doc:
+        for i in range(5):
+            doc.new_page().insert_text((72, 72), f"Regulation {i + 1}: permissible FSI on roads wider than 12 m is 1.5.")
+        doc.save(pdf_path)
+
+    pages = OCREngine(workers=2, pages_per_task=2, tesseract_cmd="unused").ocr_pdf(pdf_path)
+
+    assert [page["page"] for page in pages] == [1, 2, 3, 4, 5]
+    assert {page["extraction_method"] for page in pages} == {"text_layer"}
+    assert "Regulation 3" in pages[2]["content"]
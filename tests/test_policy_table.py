@@ -0,0 +1,42 @@
+import sys
+import os
+import shutil
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rl_env.policy_table import PolicyTable, default_table_path, random_observations
+
+CHECKPOINT = os.path.join(os.path.dirname(__file__), '..', 'rl_env', 'ppo_hirl_agent.zip')
+
+def load_table(tmp_path, **kwargs):
+    checkpoint = str(tmp_path / "agent.zip")
+    shutil.copy(CHECKPOINT, checkpoint)
+    return PolicyTable.load(checkpoint, plot_points=201, road_points=101, **kwargs), checkpoint
+
+def test_table_agrees_with_network_and_is_cached(tmp_path):
+    table, checkpoint = load_table(tmp_path)
+    observations = random_observations(5000)
+
+    actions, probabilities = table.predict_actions(observations)
+    network_actions, _ = table.fallback.predict_actions(observations)
+    assert (actions == network_actions).mean() > 0.99
+    assert np.allclose(probabilities.sum(axis=1), 1.0, atol=1e-2)
+    assert os.path.exists(default_table_path(checkpoint))
+    # The saved table is reused for the same checkpoint and grid
+    reloaded, _ = load_table(tmp_path)
+    assert np.array_equal(reloaded.probabilities, table.probabilities)
+
+def test_single_lookup_matches_batch_and_out_of_box_uses_network(tmp_path):
+    for mode in ("linear", "nearest"):
+        table, _ = load_table(tmp_path, mode=mode)
+        observations = np.array([[1234, 1, 17.3], [9999, 2, 99.9], [0, 0, 0]], dtype=np.float32)
+        batch_actions, batch_probabilities = table.predict_actions(observations)
+        for i, observation in enumerate(observations):
+            action, probabilities = table.predict_actions(observation)
+            assert action[0] == batch_actions[i]
+            assert np.allclose(probabilities[0], batch_probabilities[i], atol=1e-5)
+
+    outside = np.array([[25000, 0, 12], [500, 1, 150]], dtype=np.float32)
+    assert np.array_equal(table.predict_actions(outside)[1], table.fallback.predict_actions(outside)[1])
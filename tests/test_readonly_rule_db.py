@@ -0,0 +1,42 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chroma_client import ChromaDBClient
+from readonly_rule_db import ReadOnlyRuleDB, export_snapshot
+
+RULES = [
+    {"id": "MUM-FSI-1", "city": "Mumbai", "rule_type": "FSI", "conditions": {"road_width_m": {"min": 9, "max": 18}},
+     "entitlements": {"base_fsi": 1.1}},
+    {"id": "MUM-HGT-1", "city": "Mumbai", "rule_type": "Height", "conditions": {}, "entitlements": {"max_height_m": 24}},
+    {"id": "PUN-FSI-1", "city": "Pune", "rule_type": "FSI", "conditions": {}, "entitlements": {"base_fsi": 1.0}},
+]
+EMBEDDINGS = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.9, 0.1, 0.0]]
+
+def build_snapshot(tmp_path):
+    # Explicit embeddings, so no embedding model is needed
+    db = ChromaDBClient(persist_directory=str(tmp_path / "chroma"))
+    db.bodies.put_many({rule["id"]: rule for rule in RULES}, {rule["id"]: rule["rule_type"] for rule in RULES})
+    db.collection.upsert(ids=[rule["id"] for rule in RULES],
+                         metadatas=[db._rule_metadata(rule) for rule in RULES], embeddings=EMBEDDINGS)
+    export_snapshot(str(tmp_path / "chroma"), str(tmp_path / "snapshot"))
+    return ReadOnlyRuleDB(str(tmp_path / "snapshot"))
+
+def test_snapshot_serves_same_rules_and_nearest_neighbours(tmp_path):
+    snapshot = build_snapshot(tmp_path)
+
+    assert snapshot.count() == 3
+    assert snapshot.rules.materialize(["MUM-FSI-1"])[0]["entitlements"] == {"base_fsi": 1.1}
+    # Exact L2 ranking within the city; Pune's near-identical vector is never returned for Mumbai
+    assert snapshot._semantic_search([0.8, 0.2, 0.0], "Mumbai", 5) == ["MUM-FSI-1", "MUM-HGT-1"]
+    assert snapshot._semantic_search([0.0, 1.0, 0.0], "Mumbai", 1) == ["MUM-HGT-1"]
+    assert snapshot._semantic_search([1.0, 0.0, 0.0], "Delhi", 5) == []
+
+def test_snapshot_rejects_writes(tmp_path):
+    snapshot = build_snapshot(tmp_path)
+
+    assert snapshot.add_rule({"id": "NEW-1", "city": "Mumbai"}) is False
+    assert snapshot.add_rules_bulk([{"id": "NEW-2", "city": "Mumbai"}]) == 0
+    assert snapshot.delete_rules(["MUM-FSI-1"]) == 0
+    assert snapshot.count() == 3
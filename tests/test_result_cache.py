@@ -0,0 +1,46 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from result_cache import ResultCache
+
+CASE = {
+    "project_id": "P1",
+    "case_id": "case_001",
+    "city": "Mumbai",
+    "parameters": {"plot_size": 1000, "location": "urban", "road_width": 12}
+}
+
+def test_key_ignores_case_ids_and_number_formatting(tmp_path):
+    """Re-running the same inputs under a new case id must hit the same cache entry."""
+    cache = ResultCache(db_path=str(tmp_path / "cache.db"))
+    rerun = dict(CASE, case_id="case_002", parameters={"plot_size": 1000.0, "location": " urban", "road_width": 12.0})
+
+    assert cache.make_key(CASE, "v1") == cache.make_key(rerun, "v1")
+    assert cache.make_key(CASE, "v1") != cache.make_key(CASE, "v2")
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    cache = ResultCache(db_path=db_path)
+    key = cache.make_key(CASE, "v1")
+    cache.put(key, {"case_id": "case_001"}, model_version="v1")
+
+    assert ResultCache(db_path=db_path).get(key) == {"case_id": "case_001"}
+
+def test_invalidate_rules_changes_keys_and_drops_entries(tmp_path):
+    cache = ResultCache(db_path=str(tmp_path / "cache.db"))
+    key = cache.make_key(CASE, "v1")
+    cache.put(key, {"case_id": "case_001"}, model_version="v1")
+
+    cache.invalidate_rules()
+
+    assert cache.get(key) is None
+    assert cache.make_key(CASE, "v1") != key
+
+def test_disk_size_limit_evicts_oldest(tmp_path):
+    cache = ResultCache(db_path=str(tmp_path / "cache.db"), max_memory_entries=1, max_disk_entries=2)
+    for i in range(3):
+        cache.put(f"k{i}", {"i": i})
+
+    assert cache.stats()["disk_entries"] == 2
@@ -0,0 +1,97 @@
+import sys
+import os
+import json
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rule_index import RuleIntervalIndex
+from rule_store import RuleStore, RuleBodyStore
+
+def build_index():
+    index = RuleIntervalIndex()
+    index.add("r1", "Mumbai", road_width=(0, 9), plot_area=(0, 500), location=["urban"])
+    index.add("r2", "Mumbai", road_width=(9, 18), plot_area=(0, 4000))
+    index.add("r3", "Mumbai")
+    index.add("r4", "Pune", road_width=(0, 30), plot_area=(0, 4000))
+    return index
+
+def test_query_matches_structured_filter_semantics():
+    index = build_index()
+
+    # Road width upper bound is exclusive, plot area upper bound inclusive
+    assert index.query("Mumbai", road_width=9, plot_area=500) == ["r2"]
+    assert index.query("Mumbai", road_width=8.9, plot_area=500) == ["r1"]
+    # Rules without range metadata only match an unfiltered query
+    assert index.query("Mumbai") == ["r1", "r2", "r3"]
+    assert index.query("Delhi", road_width=12) == []
+
+def test_add_replaces_existing_rule():
+    index = build_index()
+    index.add("r1", "Mumbai", road_width=(20, 40))
+
+    assert index.query("Mumbai", road_width=25) == ["r1"]
+    assert len(index) == 4
+
+def test_match_any_unions_width_area_and_location():
+    index = build_index()
+    ids = set(index.match_any("Mumbai", road_width=12, plot_area=10000, location="urban"))
+
+    assert ids == {"r1", "r2"}
+
+def test_rule_store_decodes_once_and_dedups_by_id():
+    store = RuleStore()
+    store.put("r1", {"id": "r1", "page_number": 4, "full_json": json.dumps({"id": "r1", "rule_type": "FSI"})}, "page text")
+
+    seen = set()
+    first = store.materialize(["r1", "r1", "unknown"], seen)
+    first[0]["notes"] = "annotated by a caller"
+
+    assert first == [{"id": "r1", "rule_type": "FSI", "source_evidence": "page text", "page_number": 4, "notes": "annotated by a caller"}]
+    assert store.materialize(["r1"], seen) == []
+    assert "notes" not in store.get("r1")
+
+def test_rule_body_store_round_trip_and_shared_documents(tmp_path):
+    bodies = RuleBodyStore(str(tmp_path))
+    fsi = {"id": "r1", "rule_type": "FSI", "notes": "FSI 2.4"}
+    setback = {"id": "r2", "rule_type": "Setback"}
+    bodies.put_many({"r1": fsi, "r2": setback}, {"r1": "clause text", "r2": "clause text"})
+
+    assert bodies.get_many(["r1", "missing"]) == {"r1": (fsi, "clause text")}
+    # One stored copy of a document shared by several rules, dropped with its last rule
+    assert bodies._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 1
+    bodies.delete_many(["r1", "r2"])
+    assert len(bodies) == 0
+    assert bodies._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 0
+
+    # Compact metadata carries no full_json: the stored body is decoded instead
+    store = RuleStore()
+    store.put("r1", {"id": "r1", "page_number": 2}, "clause text", body=fsi)
+    assert store.materialize(["r1"]) == [dict(fsi, source_evidence="clause text", page_number=2)]
+
+def test_lookups_are_safe_while_rules_are_added_and_removed():
+    index = build_index()
+    errors = []
+    stop = threading.Event()
+
+    def read():
+        try:
+            while not stop.is_set():
+                index.query("Mumbai", road_width=12, plot_area=300)
+                index.match_any("Mumbai", road_width=5, location="urban")
+                index.city_ids("Mumbai")
+        except Exception as e:
+            errors.append(e)
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for i in range(3000):
+        index.add(f"w{i}", "Mumbai", road_width=(0, 20), plot_area=(0, 1000), location="urban")
+        if i % 2:
+            index.remove(f"w{i - 1}")
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    assert "w2999" in index.query("Mumbai", road_width=12, plot_area=300)
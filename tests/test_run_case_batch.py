@@ -0,0 +1,87 @@
+import sys
+import os
+import json
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import main_pipeline
+from main_pipeline import run_case_batch
+from result_cache import ResultCache
+
+
+class FakeMCPClient:
+    def __init__(self):
+        self.queries = []
+
+    def query_rules(self, city, parameters):
+        self.queries.append((city, parameters["road_width_m"], parameters["plot_area_sqm"]))
+        return []
+
+
+class FakePolicy:
+    """NumpyPolicy-style agent: always picks action 2, recording each batch it is given."""
+    def __init__(self):
+        self.batches = []
+
+    def predict_actions(self, observations):
+        observations = np.asarray(observations, dtype=np.float32).reshape(-1, 3)
+        self.batches.append(len(observations))
+        probabilities = np.tile(np.array([0.1, 0.1, 0.6, 0.1, 0.1], dtype=np.float32), (len(observations), 1))
+        return probabilities.argmax(axis=1), probabilities
+
+
+class CountingCache(ResultCache):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lookups = 0
+
+    def get(self, key):
+        self.lookups += 1
+        return super().get(key)
+
+
+def case(case_id, plot_size, road_width=12):
+    return {"project_id": "p", "case_id": case_id, "city": "Mumbai",
+            "parameters": {"plot_size": plot_size, "location": "urban", "road_width": road_width, "asr_rate": 50000}}
+
+def system_state(tmp_path):
+    return SimpleNamespace(mcp_client=FakeMCPClient(), llm=object(), rl_model=None, rl_agent=FakePolicy(),
+                           rl_model_version="v1", result_cache=CountingCache(db_path=str(tmp_path / "result_cache.db")))
+
+def run_batch(cases, state):
+    return {line["case_id"]: line for line in map(json.loads, run_case_batch(cases, state, max_workers=2))}
+
+def test_batch_groups_retrieval_batches_rl_and_reports_case_errors(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def generate_analysis(llm_inputs, context_data, state, case_id):
+        if case_id == "broken":
+            raise RuntimeError("LLM exploded")
+        return f"analysis for {case_id}"
+    monkeypatch.setattr(main_pipeline, "generate_analysis", generate_analysis)
+    state = system_state(tmp_path)
+
+    lines = run_batch([case("a", 1000), case("b", 1000), case("c", 2000), case("broken", 3000)], state)
+
+    # Cases a and b share a retrieval key: three MCP queries for four cases, one RL forward pass
+    assert len(state.mcp_client.queries) == 3 and state.rl_agent.batches == [4]
+    assert lines["a"]["status"] == "success"
+    assert lines["a"]["report"]["rl_decision"] == {"optimal_action": 2, "confidence_score": 0.74, "model_version": "v1"}
+    assert lines["a"]["report"]["entitlements"]["analysis_summary"] == "analysis for a"
+    assert lines["broken"] == {"case_id": "broken", "status": "error", "detail": "LLM exploded"}
+    # Each case is looked up in the result cache exactly once
+    assert state.result_cache.lookups == 4
+
+def test_batch_serves_cached_reports_without_rerunning_them(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main_pipeline, "generate_analysis", lambda llm_inputs, context_data, state, case_id: "analysis")
+    state = system_state(tmp_path)
+    run_batch([case("a", 1000)], state)
+
+    lines = run_batch([case("a2", 1000), case("new", 5000)], state)
+    assert lines["a2"]["report"]["cache"]["hit"] is True and lines["a2"]["report"]["case_id"] == "a2"
+    assert lines["new"]["report"]["cache"]["hit"] is False
+    assert state.rl_agent.batches == [1, 1]
@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 import numpy as np
@@ -6,26 +7,27 @@ from stable_baselines3 import PPO
 
 # Ensure we can import from rl_env
 sys.path.append(os.path.join(os.path.dirname(__file__), "rl_env"))
-from complex_env import ComplexEnv
+from vec_envs import VEC_ENV_KINDS, make_complex_vec_env, timed_learn
 
-def train():
+def train(n_envs=1, vec_env="dummy", timesteps=5000, seed=None):
     print("--- Training RL Agent on Live RAG Data ---")
     
-    # 1. Initialize the Environment (loads oracle_data.json)
+    # 1. Initialize the Environment (loads oracle_data.json), n_envs seeded copies
     try:
-        env = ComplexEnv()
+        env = make_complex_vec_env(n_envs, vec_env, seed=seed)
     except Exception as e:
         print(f"[FAIL] Could not initialize environment: {e}")
         return
 
     # 2. Train PPO Agent
     # We use MlpPolicy because inputs are simple vector [Plot, Location, Road]
+    # n_steps is per env, so each rollout collects 128 * n_envs transitions
     print("Training PPO Agent (MlpPolicy)...")
-    model = PPO("MlpPolicy", env, verbose=1, learning_rate=0.0003, n_steps=128)
+    model = PPO("MlpPolicy", env, verbose=1, learning_rate=0.0003, n_steps=128, seed=seed)
     
     # Train for enough steps to see convergence on the small dataset
     # 20 samples * 50 epochs approx = 1000 steps
-    model.learn(total_timesteps=5000)
+    timed_learn(model, timesteps)
     
     # 3. Save the Model
     save_dir = "rl_env"
@@ -37,4 +39,11 @@ def train():
     print("DONE. Model saved.")
 
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Train the PPO agent on ComplexEnv.")
+    parser.add_argument("--n-envs", type=int, default=1, help="Parallel ComplexEnv copies.")
+    parser.add_argument("--vec-env", choices=VEC_ENV_KINDS, default="dummy",
+                        help="dummy (in-process), subproc (one process per env) or batch (NumPy-vectorized).")
+    parser.add_argument("--timesteps", type=int, default=5000, help="Total environment steps.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the envs and the agent.")
+    args = parser.parse_args()
+    train(args.n_envs, args.vec_env, args.timesteps, args.seed)